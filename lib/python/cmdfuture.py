@@ -0,0 +1,207 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""linuxcnc.command without blocking the GUI's main loop
+
+command.wait_complete() sleeps until the task has finished the last
+command, and nothing else runs in the meantime.  An AsyncCommand sends the
+same commands, but returns at once with a Future for each of them; the
+future is completed from the status that the GUI polls anyway:
+
+    cmd = cmdfuture.AsyncCommand()
+    f = cmd.state(linuxcnc.STATE_ON)
+    f.add_done_callback(self.machine_on_done)
+    ...
+    def machine_on_done(self, future):
+        if not future.ok(): ...
+
+Several commands can be in flight at once; each completes when the task
+echoes a later serial number, or reports its own as done or failed, just
+like wait_complete().  sequence() sends each of its commands only after
+the one before it succeeded:
+
+    cmd.sequence(("mode", linuxcnc.MODE_MDI), ("mdi", "G43"))
+
+By default the futures are checked from the stathub of the process, on
+the glib main loop.  Programs with a main loop of their own, like Tk,
+pass watch=False and call update(stat) after each poll of their stat.
+
+Sending a command still waits until the task has taken it, as
+linuxcnc.command always does; that is normally one task cycle.
+"""
+
+import linuxcnc
+import time
+import traceback
+
+# the status of a command that did not complete in time, like the -1 of
+# wait_complete()
+TIMEOUT = -1
+
+class Future:
+    def __init__(self, name, serial=None, deadline=None):
+        self.name = name
+        self.serial = serial
+        self.deadline = deadline
+        # None while the command runs, then RCS_DONE, RCS_ERROR or TIMEOUT
+        self.status = None
+        self.callbacks = []
+
+    def done(self):
+        return self.status is not None
+
+    def ok(self):
+        return self.status == linuxcnc.RCS_DONE
+
+    def add_done_callback(self, callback):
+        """Call callback(future) once the command is done, or now if it
+        already is"""
+        if self.done():
+            callback(self)
+        else:
+            self.callbacks.append(callback)
+        return self
+
+    def set_status(self, status):
+        if self.done(): return
+        self.status = status
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except:
+                # one broken callback must not stop the others
+                traceback.print_exc()
+
+    def __repr__(self):
+        return "<Future %s %s %s>" % (self.name, self.serial, self.status)
+
+class AsyncCommand:
+    """A linuxcnc.command whose methods return a Future"""
+    # seconds, like EMC_COMMAND_TIMEOUT of wait_complete()
+    timeout = 5.0
+    # milliseconds between checks of the status while commands are pending
+    interval = 20
+
+    def __init__(self, command=None, watch=True):
+        self.command = command or linuxcnc.command()
+        self.watching = watch
+        self.pending = []
+        self.subscription = None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError, name
+        attr = getattr(self.command, name)
+        if name == 'wait_complete' or not callable(attr):
+            return attr
+        def send(*args):
+            attr(*args)
+            return self.track(name, self.command.serial)
+        send.__name__ = name
+        return send
+
+    def track(self, name, serial):
+        """The future of the command with 'serial' that was just sent"""
+        future = Future(name, serial, time.time() + self.timeout)
+        self.pending.append(future)
+        self.watch()
+        return future
+
+    def sequence(self, *steps):
+        """Send each (method name, arg...) step once the one before it
+        succeeded.  The returned future completes with the last step, or
+        with the first one that failed"""
+        result = Future("sequence")
+        steps = list(steps)
+        def next_step(previous=None):
+            if previous is not None and not previous.ok():
+                result.set_status(previous.status)
+            elif not steps:
+                result.set_status(linuxcnc.RCS_DONE)
+            else:
+                step = steps.pop(0)
+                future = getattr(self, step[0])(*step[1:])
+                result.serial = future.serial
+                future.add_done_callback(next_step)
+        next_step()
+        return result
+
+    def update(self, stat):
+        """Complete the futures from a freshly polled stat (or stathub
+        snapshot); returns whether any are still pending"""
+        if not self.pending: return False
+        echo = stat.echo_serial_number
+        state = stat.state
+        now = time.time()
+        pending = []
+        finished = []
+        for future in self.pending:
+            if echo - future.serial > 0:
+                finished.append((future, linuxcnc.RCS_DONE))
+            elif echo == future.serial and state in (linuxcnc.RCS_DONE,
+                    linuxcnc.RCS_ERROR):
+                finished.append((future, state))
+            elif now > future.deadline:
+                finished.append((future, TIMEOUT))
+            else:
+                pending.append(future)
+        # callbacks may send more commands, which land in self.pending
+        self.pending = pending
+        for future, status in finished:
+            future.set_status(status)
+        return bool(self.pending)
+
+    def expire(self):
+        now = time.time()
+        for future in [f for f in self.pending if now > f.deadline]:
+            self.pending.remove(future)
+            future.set_status(TIMEOUT)
+
+    def watch(self):
+        if not self.watching or self.subscription is not None: return
+        import stathub
+        self.subscription = stathub.get_hub().subscribe(self.tick,
+            self.interval)
+
+    def tick(self, snapshot):
+        if snapshot is None:
+            # linuxcnc is not running, so nothing will complete
+            self.expire()
+            keep = bool(self.pending)
+        else:
+            keep = self.update(snapshot)
+        if not keep:
+            # the hub drops subscribers that return a false value
+            self.subscription = None
+        return keep
+
+    def wait(self, future, timeout=None):
+        """Block until 'future' is done, for code that must not go on
+        before; returns its status"""
+        import stathub
+        hub = stathub.get_hub()
+        if timeout is not None: end = time.time() + timeout
+        while not future.done():
+            if timeout is not None and time.time() > end: return TIMEOUT
+            try:
+                self.update(hub.poll())
+            except linuxcnc.error:
+                self.expire()
+            if not future.done(): time.sleep(.01)
+        return future.status
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -0,0 +1,156 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Keep an object in step with a file that other programs change
+
+A WatchedFile subclass reads its file in reload(), and calls notify() with
+what changed; listeners added with subscribe() are then called as
+callback(watched_file, changed).  watch() makes the glib main loop call
+reload() whenever the file changes.  On Linux the file's directory is
+watched with inotify, so nothing is done while the file does not change;
+elsewhere its size and time are checked every poll_interval milliseconds.
+"""
+
+import ctypes, ctypes.util
+import errno
+import os
+import struct
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = os.O_NONBLOCK
+_event = struct.Struct("iIII")
+
+class Inotify:
+    """An inotify instance watching one directory"""
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        if libc.inotify_add_watch(self.fd, directory, IN_CLOSE_WRITE
+                | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, os.strerror(err))
+
+    def names(self):
+        """The names of the files with pending events"""
+        names = set()
+        while 1:
+            try:
+                data = os.read(self.fd, 4096)
+            except OSError, detail:
+                if detail.errno == errno.EAGAIN: break
+                raise
+            pos = 0
+            while pos < len(data):
+                wd, mask, cookie, length = _event.unpack_from(data, pos)
+                pos += _event.size
+                names.add(data[pos:pos+length].rstrip("\0"))
+                pos += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+class WatchedFile:
+    poll_interval = 1000
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.listeners = []
+        self.stamp = None
+        self.inotify = None
+        self.source = None
+
+    def reload(self):
+        """Read the file again; subclasses set self.stamp = self.stat()
+        before reading, and call notify() if anything changed"""
+        raise NotImplementedError
+
+    def stat(self):
+        try:
+            st = os.stat(self.filename)
+        except OSError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime
+
+    def read(self):
+        """The contents of the file, or "" if it cannot be read"""
+        try:
+            f = open(self.filename, "r")
+        except IOError:
+            return ""
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def subscribe(self, callback):
+        """Call callback(self, changed) after each change of the file"""
+        self.listeners.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify(self, changed):
+        for callback in list(self.listeners):
+            callback(self, changed)
+
+    def watch(self):
+        """Start watching the file from the glib main loop"""
+        import glib
+        if self.source is not None: return
+        try:
+            self.inotify = Inotify(
+                os.path.dirname(os.path.abspath(self.filename)))
+        except (OSError, AttributeError):
+            # AttributeError: no inotify in this C library
+            self.inotify = None
+            self.source = glib.timeout_add(self.poll_interval, self.poll)
+        else:
+            self.source = glib.io_add_watch(self.inotify.fd, glib.IO_IN,
+                self.events)
+
+    def unwatch(self):
+        if self.source is None: return
+        import glib
+        glib.source_remove(self.source)
+        self.source = None
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def events(self, fd, condition):
+        if os.path.basename(self.filename) in self.inotify.names():
+            self.reload()
+        return True
+
+    def poll(self):
+        """Reload the file if its size or time changed"""
+        if self.stat() != self.stamp:
+            self.reload()
+        return True
+
+# vim:ts=8:sts=4:sw=4:et:
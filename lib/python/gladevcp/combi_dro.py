@@ -24,6 +24,7 @@ import sys
 import pango
 import math
 import linuxcnc
+import stathub
 from hal_glib import GStat
 
 # constants
@@ -101,7 +102,7 @@ class Combi_DRO(gtk.VBox):
         # get the necessary connections to linuxcnc
         self.joint_number = self.joint = joint_number
         self.linuxcnc = linuxcnc
-        self.status = linuxcnc.stat()
+        self.status = stathub.shared_stat()
         self.gstat = GStat()
 
         # set some default values'
@@ -192,8 +193,10 @@ class Combi_DRO(gtk.VBox):
         else:
             self.machine_units = _INCH
 
-        # add the timer at a period of 100 ms
-        gobject.timeout_add(self.cycle_time, self._periodic)
+        # have the status hub call us every cycle_time
+        hub = stathub.get_hub()
+        self._subscription = hub.subscribe(self._periodic, self.cycle_time)
+        self.connect("destroy", lambda w: hub.unsubscribe(self._subscription))
 
     # make an pango attribute to be used with several labels
     def _set_attributes(self, bgcolor, fgcolor, size, weight):
@@ -339,14 +342,9 @@ class Combi_DRO(gtk.VBox):
         return (int(r, 16), int(g, 16), int(b, 16))
 
     # periodic call to update the positions, every 100 ms
-    def _periodic(self):
-        # we do not want to throw errors if linuxcnc has been killed
-        # from external command
-        try:
-            self.status.poll()
-        except:
-            pass
-
+    # the hub has polled self.status; snapshot is None if linuxcnc has
+    # been killed from external command, then we show the last values
+    def _periodic(self, snapshot):
         if self.status.kinematics_type != linuxcnc.KINEMATICS_IDENTITY and not self.homed:
             self.main_dro.set_text("----.---")
             self.dro_left.set_text("----.---")
@@ -429,7 +427,6 @@ class Combi_DRO(gtk.VBox):
 
     def _not_all_homed(self, widget, data = None):
         if self.status.kinematics_type == linuxcnc.KINEMATICS_IDENTITY:
-            self.status.poll()
             self.homed = self.status.homed[self.joint]
         else:
             self.homed = False
@@ -446,7 +443,6 @@ class Combi_DRO(gtk.VBox):
         if self.status.kinematics_type != linuxcnc.KINEMATICS_IDENTITY:
             return
         else:
-            self.status.poll()
             self.homed = self.status.homed[self.joint]
             self._set_labels()
 
@@ -23,6 +23,7 @@ import linuxcnc
 from hal_glib import GStat
 from hal_actions import _EMC_ActionBase, _EMC_Action
 from hal_filechooser import _EMC_FileChooser
+from progtext import ProgramText
 
 import gtksourceview2 as gtksourceview
 
@@ -127,16 +128,18 @@ class EMC_SourceView(gtksourceview.View, _EMC_ActionBase):
         if not fn:
             self.buf.set_text('')
             return 
-        self.buf.set_text(open(fn).read())
+        # read the file once; its line index gives the length
+        text = ProgramText(fn)
+        try:
+            self.buf.set_text(text.read())
+            self.program_length = len(text)
+        finally:
+            text.close()
         self.buf.end_not_undoable_action()
         self.buf.set_modified(False)
         self.update_iter()
         self.highlight_line(self.gstat, self.gstat.stat.motion_line)
         self.offset = self.gstat.stat.motion_line
-        f = file(fn, 'r')
-        p = f.readlines()
-        f.close()
-        self.program_length = len(p)
 
     # This moves the highlight line to a lower numbered line.
     # useful for run-at-line selection
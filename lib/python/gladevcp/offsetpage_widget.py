@@ -22,6 +22,8 @@
 # set the text formatting for metric/imperial separately
 
 import sys, os, pango, linuxcnc
+import stathub
+import varfile
 from hal_glib import GStat
 datadir = os.path.abspath(os.path.dirname(__file__))
 AXISLIST = ['offset', 'X', 'Y', 'Z', 'A', 'B', 'C', 'U', 'V', 'W', 'name']
@@ -79,9 +81,11 @@ class OffsetPage(gtk.VBox):
     def __init__(self, filename = None, *a, **kw):
         super(OffsetPage, self).__init__()
         self.gstat = GStat()
-        self.filename = filename
+        self.filename = None
+        self.params = None
+        self.state = None
         self.linuxcnc = linuxcnc
-        self.status = linuxcnc.stat()
+        self.status = stathub.shared_stat()
         self.cmd = linuxcnc.command()
         self.hash_check = None
         self.display_units_mm = 0 # imperial
@@ -151,7 +155,14 @@ class OffsetPage(gtk.VBox):
             self.conversion = [25.4] * 3 + [1] * 3 + [25.4] * 3
 
         # check linuxcnc status every half second
-        gobject.timeout_add(500, self.periodic_check)
+        hub = stathub.get_hub()
+        self._subscription = hub.subscribe(self.periodic_check, 500)
+        self.connect("destroy", self.on_destroy)
+        if filename: self.set_filename(filename)
+
+    def on_destroy(self, widget):
+        stathub.get_hub().unsubscribe(self._subscription)
+        if self.params: self.params.unsubscribe(self.params_changed)
 
     # Reload the offsets into display
     def reload_offsets(self):
@@ -206,55 +217,27 @@ class OffsetPage(gtk.VBox):
                 self.store[row][12] = self.unselectable_color
 
     # This is for adding a filename path after the offsetpage is already loaded.
+    # The var file is read by a reader shared with the other widgets of this
+    # process, which tells us when the interpreter rewrites it
     def set_filename(self, filename):
+        if self.params: self.params.unsubscribe(self.params_changed)
         self.filename = filename
+        self.params = None
+        if filename:
+            self.params = varfile.get_varfile(filename)
+            self.params.subscribe(self.params_changed)
         self.reload_offsets()
 
-    # We read the var file directly
-    # and pull out the info we need
-    # if anything goes wrong we set all the info to 0
+    # the G54 to G59.3 offsets of the var file, all 0 if there is none
     def read_file(self):
-        try:
-            g54 = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-            g55 = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-            g56 = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-            g57 = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-            g58 = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-            g59 = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-            g59_1 = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-            g59_2 = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-            g59_3 = [0, 0, 0, 0, 0, 0, 0, 0, 0]
-            if self.filename == None:
-                return g54, g55, g56, g57, g58, g59, g59_1, g59_2, g59_3
-            if not os.path.exists(self.filename):
-                return g54, g55, g56, g57, g58, g59, g59_1, g59_2, g59_3
-            logfile = open(self.filename, "r").readlines()
-            for line in logfile:
-                temp = line.split()
-                param = int(temp[0])
-                data = float(temp[1])
-
-                if 5229 >= param >= 5221:
-                    g54[param - 5221] = data
-                elif 5249 >= param >= 5241:
-                    g55[param - 5241] = data
-                elif 5269 >= param >= 5261:
-                    g56[param - 5261] = data
-                elif 5289 >= param >= 5281:
-                    g57[param - 5281] = data
-                elif 5309 >= param >= 5301:
-                    g58[param - 5301] = data
-                elif 5329 >= param >= 5321:
-                    g59[param - 5321] = data
-                elif 5349 >= param >= 5341:
-                    g59_1[param - 5341] = data
-                elif 5369 >= param >= 5361:
-                    g59_2[param - 5361] = data
-                elif 5389 >= param >= 5381:
-                    g59_3[param - 5381] = data
-            return g54, g55, g56, g57, g58, g59, g59_1, g59_2, g59_3
-        except:
-            return None, None, None, None, None, None, None, None, None
+        if self.params == None:
+            return [[0] * 9 for i in range(9)]
+        return [self.params.g5x(i) for i in range(1, 10)]
+
+    # only the G54 to G59.3 offsets are shown from the var file
+    def params_changed(self, params, changed):
+        if any(5221 <= n <= 5389 for n in changed) and not self.editing_mode:
+            self.reload_offsets()
 
     # This allows hiding or showing columns from a text string of columnns
     # eg list ='ab'
@@ -292,6 +275,8 @@ class OffsetPage(gtk.VBox):
         state = widget.get_active()
         # stop updates from linuxcnc
         self.editing_mode = state
+        # and refresh everything on the next check once editing ends
+        self.state = None
         # highlight editable rows
         if state:
             color = self.highlight_color
@@ -416,10 +401,11 @@ class OffsetPage(gtk.VBox):
 
     # check for linnuxcnc ON and IDLE which is the only safe time to edit the tool file.
     # if in editing mode don't update else you can't actually edit
-    def periodic_check(self):
+    # snapshot is None if the status hub could not poll linuxcnc
+    def periodic_check(self, snapshot):
         convert = ("None", "G54", "G55", "G56", "G57", "G58", "G59", "G59.1", "G59.2", "G59.3")
         try:
-            self.status.poll()
+            if snapshot is None: raise linuxcnc.error
             on = self.status.task_state > linuxcnc.STATE_OFF
             idle = self.status.interp_state == linuxcnc.INTERP_IDLE
             self.edit_button.set_sensitive(bool(on and idle))
@@ -433,7 +419,16 @@ class OffsetPage(gtk.VBox):
             self.current_system = "G54"
             lncnc_running = False
 
-        if self.filename and not self.editing_mode:
+        if not self.filename or self.editing_mode: return True
+        # the var file's offsets come from params_changed, so only refresh
+        # when something read from the status or set on the widget changed
+        state = (self.status.g5x_offset, self.status.tool_offset,
+                self.status.g92_offset, self.status.rotation_xy,
+                self.current_system, self.display_units_mm,
+                self.mm_text_template, self.imperial_text_template,
+                str(self.foreground_color), self.selection_mask)
+        if state != self.state:
+            self.state = state
             self.reload_offsets()
         return True
 
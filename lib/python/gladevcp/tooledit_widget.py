@@ -14,7 +14,9 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 # GNU General Public License for more details.
 
-import sys, os, pango, linuxcnc, hashlib, glib
+import sys, os, pango, linuxcnc, glib
+import stathub
+import tooltable
 datadir = os.path.abspath(os.path.dirname(__file__))
 KEYWORDS = ['S','T', 'P', 'X', 'Y', 'Z', 'A', 'B', 'C', 'U', 'V', 'W', 'D', 'I', 'J', 'Q', ';']
 try:
@@ -36,6 +38,14 @@ try:
 except:
     INIPATH = None
 
+# a liststore row for a line of the tool table
+def tool_row(tool):
+    values = ['0'] * len(tool.values)
+    for i, v in enumerate(tool.values):
+        if v is not None:
+            values[i] = locale.format("%10.4f", v)
+    return [0, tool.tool or 0, tool.pocket or 0] + values + [tool.comment]
+
 class ToolEdit(gtk.VBox):
     __gtype_name__ = 'ToolEdit'
     __gproperties__ = {
@@ -50,8 +60,9 @@ class ToolEdit(gtk.VBox):
 
     def __init__(self,toolfile=None, *a, **kw):
         super(ToolEdit, self).__init__()
-        self.emcstat = linuxcnc.stat()
-        self.hash_check = None 
+        self.emcstat = stathub.shared_stat()
+        self.table = None
+        self._reloading = False
         self.lathe_display_type = True
         self.toolfile = toolfile
         self.num_of_col = 1
@@ -165,7 +176,14 @@ class ToolEdit(gtk.VBox):
             pass
 
         # check linuxcnc status every second
-        gobject.timeout_add(1000, self.periodic_check)
+        hub = stathub.get_hub()
+        self._subscription = hub.subscribe(self.periodic_check, 1000)
+        self.connect("destroy", self.on_destroy)
+
+    def on_destroy(self, widget):
+        stathub.get_hub().unsubscribe(self._subscription)
+        if self.table is not None:
+            self.table.unsubscribe(self.table_changed)
 
     # used to split tool and wear data by the tool number
     # if the tool number is above 10000 then its a wear offset (as per fanuc)
@@ -232,9 +250,18 @@ class ToolEdit(gtk.VBox):
         self.toolfile = filename
         self.reload(None)
 
+        # the shared, watched tool table of the current toolfile
+    def get_table(self):
+        if self.table is not None:
+            if self.table.filename == os.path.abspath(self.toolfile):
+                return self.table
+            self.table.unsubscribe(self.table_changed)
+        self.table = tooltable.get_table(self.toolfile)
+        self.table.subscribe(self.table_changed)
+        return self.table
+
         # Reload the tool file into display
     def reload(self,widget):
-        self.hash_code = self.md5sum(self.toolfile)
         # clear the current liststore, search the tool file, and add each tool
         if self.toolfile == None:return
         self.model.clear()
@@ -242,49 +269,34 @@ class ToolEdit(gtk.VBox):
         if not os.path.exists(self.toolfile):
             print "Toolfile does not exist"
             return
-        logfile = open(self.toolfile, "r").readlines()
-        self.toolinfo = []
-        for rawline in logfile:
-            # strip the comments from line and add directly to array
-            # if index = -1 the delimiter ; is missing - clear comments
-            index = rawline.find(";")
-            comment =''
-            if not index == -1:
-                comment = (rawline[index+1:])
-                comment = comment.rstrip("\n")
-                line = rawline.rstrip(comment)
-            else:
-                line = rawline
-            array = [0,0,0,'0','0','0','0','0','0','0','0','0','0','0','0','0',comment]
-            toolinfo_flag = False
-            # search beginning of each word for keyword letters
-            # offset 0 is the checkbutton so ignore it
-            # if i = ';' that is the comment and we have already added it
-            # offset 1 and 2 are integers the rest floats
-            # we strip leading and following spaces from the comments
-            for offset,i in enumerate(KEYWORDS):
-                if offset == 0 or i == ';': continue
-                for word in line.split():
-                    if word.startswith(';'): break
-                    if word.startswith(i):
-                        if offset == 1:
-                            if int(word.lstrip(i)) == self.toolinfo_num:
-                                toolinfo_flag = True
-                        if offset in(1,2):
-                            try:
-                                array[offset]= int(word.lstrip(i))
-                            except:
-                                print "Tooledit widget int error"
-                        else:
-                            try:
-                                array[offset]= locale.format("%10.4f", float(word.lstrip(i)))
-                            except:
-                                print "Tooledit_widget float error"
-                        break
-            if toolinfo_flag:
-                self.toolinfo = array
-            # add array line to liststore
-            self.add(None,array)
+        # only lines that changed since the last read are parsed again
+        self.read_table()
+        self.fill()
+
+        # read the file into the table without refilling the display
+    def read_table(self):
+        self._reloading = True
+        try:
+            self.get_table().reload()
+        finally:
+            self._reloading = False
+
+        # fill the liststore from the table
+    def fill(self):
+        self.model.clear()
+        table = self.get_table()
+        for tool in table.tools:
+            self.add(None, tool_row(tool))
+        tool = table.by_tool.get(self.toolinfo_num)
+        if tool is None:
+            self.toolinfo = []
+        else:
+            self.toolinfo = tool_row(tool)
+
+        # called by the table when the tool file changed
+    def table_changed(self, table, changed):
+        if not self._reloading:
+            self.toolfile_stale()
 
         # Note we have to save the float info with a decimal even if the locale uses a comma
     def save(self,widget):
@@ -312,6 +324,9 @@ class ToolEdit(gtk.VBox):
         # That would make linuxcnc and the widget to be out of synch leading to odd errors
         file.flush()
         os.fsync(file.fileno())
+        file.close()
+        # so lookups see the new table before the file watch reports it
+        self.read_table()
         # tell linuxcnc we changed the tool table entries
         try:
             linuxcnc.command().load_tool_table()
@@ -444,40 +459,23 @@ class ToolEdit(gtk.VBox):
         model[path][0] = not model[path][0]
 
         # check for linnuxcnc ON and IDLE which is the only safe time to edit the tool file.
-        # check to see if the tool file is current
-    def periodic_check(self):
-        try:
-            self.emcstat.poll()
+    def periodic_check(self, snapshot):
+        if snapshot is not None:
             on = self.emcstat.task_state > linuxcnc.STATE_OFF
             idle = self.emcstat.interp_state == linuxcnc.INTERP_IDLE
             self.apply.set_sensitive(bool(on and idle))
-        except:
-            pass
-        if self.toolfile:
-            self.file_current_check()
         return True
 
-        # create a hash code
-    def md5sum(self,filename):
-        try:
-            f = open(filename, "rb")
-        except IOError:
-            return None
-        else:
-            return hashlib.md5(f.read()).hexdigest()
-
-        # check the hash code on the toolfile against
-        # the saved hash code when last reloaded.
+        # check the toolfile now rather than waiting for the table to
+        # notice the change; toolfile_stale is called if it changed
     def file_current_check(self):
-        m = self.hash_code
-        m1 = self.md5sum(self.toolfile)
-        if m1 and m != m1:
-            self.toolfile_stale()
+        if self.toolfile:
+            self.get_table().poll()
 
         # you could overload this to do something else.
     def toolfile_stale(self):
         print "Tool file was modified since it was last read"
-        self.reload(None)
+        self.fill()
         self.set_selected_tool(self.toolinfo_num)
 
         # Returns the tool information array of the requested toolnumber
@@ -488,8 +486,12 @@ class ToolEdit(gtk.VBox):
             self.toolinfo_num = self.emcstat.tool_in_spindle
         else:
             self.toolinfo_num = toolnum
-        self.reload(None)
-        if self.toolinfo == []: return None
+        if self.toolfile == None: return None
+        tool = self.get_table().by_tool.get(self.toolinfo_num)
+        if tool is None:
+            self.toolinfo = []
+            return None
+        self.toolinfo = tool_row(tool)
         return self.toolinfo
 
         # 'convenience' method to hide buttons
@@ -69,3 +69,26 @@ class component(_hal.component):
 
     def getpin(self, *a, **kw): return Pin(_hal.component.getpin(self, *a, **kw))
     def getparam(self, *a, **kw): return Param(_hal.component.getparam(self, *a, **kw))
+
+class stream(_hal.stream):
+    # NumPy formats of the elements of a sample, by element type
+    _formats = {'b': '?', 'f': 'f8', 's': 'i4', 'u': 'u4'}
+
+    @property
+    def dtype(self):
+        """The NumPy dtype of one sample, with fields f0, f1, ... in the
+        layout used by readinto and write_many"""
+        import numpy
+        types = self.element_types
+        stride = self.record_size // len(types)
+        return numpy.dtype({
+            'names': ['f%d' % i for i in range(len(types))],
+            'formats': [self._formats.get(t, 'V%d' % stride) for t in types],
+            'offsets': [i * stride for i in range(len(types))],
+            'itemsize': self.record_size})
+
+    def read_many(self, n, timeout=0):
+        """Read up to n samples into a NumPy array of self.dtype"""
+        import numpy
+        a = numpy.empty(n, self.dtype)
+        return a[:self.readinto(a, timeout)]
@@ -5,6 +5,7 @@ import _hal, hal, gobject
 import linuxcnc
 import os
 import math
+import stathub
 
 # constants
 JOGJOINT  = 1
@@ -159,7 +160,7 @@ class _GStat(gobject.GObject):
 
     def __init__(self, stat = None):
         gobject.GObject.__init__(self)
-        self.stat = stat or linuxcnc.stat()
+        self.stat = stat or stathub.shared_stat()
         self.cmd = linuxcnc.command()
         self.old = {}
         try:
@@ -167,7 +168,13 @@ class _GStat(gobject.GObject):
             self.merge()
         except:
             pass
-        gobject.timeout_add(100, self.update)
+        if isinstance(self.stat, stathub.SharedStat):
+            # GStat() runs this again for each user of the singleton
+            if not getattr(self, '_subscription', None):
+                self._subscription = stathub.get_hub().subscribe(
+                    self.hub_update, 100)
+        else:
+            gobject.timeout_add(100, self.update)
         self._current_jog_rate = 15
         self._is_all_homed = False
 
@@ -243,12 +250,21 @@ class _GStat(gobject.GObject):
             #active_mcodes.append("M%s "%i)
         self.old['m-code'] = active_mcodes
 
+    def hub_update(self, snapshot):
+        # the hub has just polled self.stat
+        if snapshot is None:
+            return True
+        return self.emit_changes()
+
     def update(self):
         try:
             self.stat.poll()
         except:
             # Reschedule
             return True
+        return self.emit_changes()
+
+    def emit_changes(self):
         old = dict(self.old)
         self.merge()
 
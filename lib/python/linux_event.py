@@ -110,12 +110,15 @@ class Event:
     format = "llHHi"
     size = struct.calcsize(format)
 
-    def __init__(self, buf):
-	data = struct.unpack(self.format, buf)
-	self.time = data[0] + data[1] * 1e-9
-	self.type = EV_invert[data[2]]
-	self.code = data[3]
-	self.value = data[4]
+    def __init__(self, *args):
+	if len(args) == 1:
+	    data = struct.unpack(self.format, args[0])
+	    self.time = data[0] + data[1] * 1e-9
+	    self.type = EV_invert[data[2]]
+	    self.code = data[3]
+	    self.value = data[4]
+	else:
+	    self.time, self.type, self.code, self.value = args
 
     @classmethod
     def read(cls, f):
@@ -870,5 +873,50 @@ class InputDevice:
 	elif e.type == 'EV_LED': e.code = decode(LED_invert, 'LED', e.code)
 	return e
 
+    # the most events read_events reads at once
+    max_events = 256
+    _struct = struct.Struct(Event.format)
+    _codemaps = {
+	'EV_KEY': (KEYBTN_invert, 'KEY'), 'EV_ABS': (ABS_invert, 'ABS'),
+	'EV_REL': (REL_invert, 'REL'), 'EV_LED': (LED_invert, 'LED'),
+    }
+
+    def read_events(self, coalesce=False):
+	"""Read all pending events, up to max_events, with one read.
+	Return [] if there are none.
+
+	With coalesce, EV_SYN events are left out, and an EV_REL or EV_ABS
+	event is merged into the previous one for the same code, unless
+	another type of event came in between: relative values are added,
+	absolute values replace the older one."""
+	if not self.readable(): return []
+	unpack_from = self._struct.unpack_from
+	size = self._struct.size
+	buf = os.read(self.f, size * self.max_events)
+	events = []
+	# (type, code) -> event to merge into
+	pending = {}
+	for offset in range(0, len(buf) - size + 1, size):
+	    sec, usec, type, code, value = unpack_from(buf, offset)
+	    type = EV_invert[type]
+	    codemap = self._codemaps.get(type)
+	    if codemap: code = decode(codemap[0], codemap[1], code)
+	    t = sec + usec * 1e-9
+	    if not coalesce:
+		events.append(Event(t, type, code, value))
+	    elif type == 'EV_REL' or type == 'EV_ABS':
+		e = pending.get((type, code))
+		if e is None:
+		    e = pending[type, code] = Event(t, type, code, value)
+		    events.append(e)
+		else:
+		    if type == 'EV_REL': e.value += value
+		    else: e.value = value
+		    e.time = t
+	    elif type != 'EV_SYN':
+		pending.clear()
+		events.append(Event(t, type, code, value))
+	return events
+
     def write_event(self, *args):
 	Event.write(self.f, *args)
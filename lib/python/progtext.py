@@ -0,0 +1,117 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Line access to a program file without reading all of it
+
+A ProgramText maps the file into memory and indexes the start of each line
+once, so a viewer can fetch just the lines it shows:
+
+    text = ProgramText("part.ngc")
+    print len(text)                 # number of lines
+    for l in text[100:120]:         # like f.readlines()[100:120]
+        show(l.rstrip())
+
+Lines are zero-based and keep their line ending, like the result of
+readlines(); line(n) returns the one-based program line n without it.
+Opening and indexing a file reads it once; fetching lines only touches the
+pages that hold them.
+
+The file should not be rewritten in place while it is open.  Editors that
+save to a new file and rename it over the old one are fine, as the mapping
+keeps the old contents.  Reading a mapped page that a truncation removed
+would kill the process, so the size is checked before each access and
+IOError raised if the file became shorter.
+"""
+
+import mmap
+import numpy
+import os
+
+class ProgramText:
+    # bytes searched for line ends at a time, to bound the temporary arrays
+    chunk_size = 1 << 24
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        if self.size:
+            self.data = mmap.mmap(self.file.fileno(), 0,
+                access=mmap.ACCESS_READ)
+        else:
+            # an empty file cannot be mapped
+            self.data = ""
+        self.starts = self._index()
+
+    def _check(self):
+        if self.size and os.fstat(self.file.fileno()).st_size < self.size:
+            raise IOError, "%s was truncated" % self.filename
+
+    def _index(self):
+        """Return the offset of the start of each line, followed by the
+        size of the file"""
+        size = self.size
+        dtype = numpy.uint32 if size < 1 << 32 else numpy.uint64
+        parts = [numpy.zeros(1, dtype)]
+        for pos in xrange(0, size, self.chunk_size):
+            chunk = numpy.frombuffer(self.data, numpy.uint8,
+                min(self.chunk_size, size - pos), pos)
+            parts.append((numpy.flatnonzero(chunk == 10) + (pos + 1))
+                .astype(dtype))
+        starts = numpy.concatenate(parts)
+        # a last line without a newline still counts as a line
+        if starts[-1] != size:
+            starts = numpy.append(starts, numpy.array([size], dtype))
+        return starts
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+        self.data = ""
+        self.size = 0
+        self.starts = numpy.zeros(1, self.starts.dtype)
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in xrange(start, stop, step)]
+            if start >= stop: return []
+            self._check()
+            starts = self.starts[start:stop+1].tolist()
+            text = self.data[starts[0]:starts[-1]]
+            base = starts[0]
+            return [text[a-base:b-base] for a, b in zip(starts, starts[1:])]
+        if index < 0: index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError, "line index out of range"
+        self._check()
+        return self.data[int(self.starts[index]):int(self.starts[index+1])]
+
+    def line(self, lineno):
+        """Program line 'lineno' (one-based) without its line ending"""
+        return self[lineno-1].rstrip("\r\n")
+
+    def read(self):
+        """The whole text"""
+        self._check()
+        return self.data[:self.size]
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -0,0 +1,272 @@
+#    This is a component of AXIS, a front-end for emc
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Run time estimate of a program from the moves of its preview.
+#
+# Dividing each length by the feed rate leaves out the time spent speeding
+# up and slowing down, which is most of the run time of programs made of
+# many short moves.  Here the moves of a GLCanon are taken in program order
+# (the seq column of the stores) and given a trapezoidal velocity profile:
+#
+#   - each move has a top speed, from its feed rate (none for rapids) and
+#     the MAX_VELOCITY of each axis it moves, and an acceleration, from the
+#     MAX_ACCELERATION of each axis it moves; [TRAJ]MAX_LINEAR_VELOCITY,
+#     MAX_LINEAR_ACCEL and MAX_ANGULAR_VELOCITY cap them
+#   - the speed at the corner between two moves is that of a circular
+#     blend with at most half of the shorter move on each side, and no
+#     further from the corner than 'tolerance' (like G64 P) if one is
+#     given.  Reversals, gaps, tool changes and the ends of the program
+#     stop the machine
+#   - a forward and a backward pass lower the corner speeds to what the
+#     acceleration allows over the moves between them
+#
+# The passes are recurrences, w[k+1] = min(c[k+1], w[k] + b[k]) on the
+# squared speeds, but their solution is a running minimum,
+# w[k] = B[k] + min(c[j] - B[j] for j <= k) with B the running sum of b, so
+# the whole estimate is a few NumPy operations on whole columns.  The running
+# sums are restarted every 'chunk' moves, so that they stay small next to the
+# squared speeds.
+#
+# This is still an estimate: the trajectory planner of the machine blends
+# differently, and overrides, spindle synchronized moves, probing and
+# inverse time feeds are not modelled.
+
+import numpy
+
+# the axes in the columns of the segment stores
+AXES = "XYZABCUVW"
+XYZ = [0, 1, 2]
+ABC = [3, 4, 5]
+UVW = [6, 7, 8]
+
+# moves shorter than this (inches or degrees) are left out
+EPSILON = 1e-9
+
+# [TRAJ]LINEAR_UNITS and ANGULAR_UNITS, in units per mm and per degree, as
+# in src/emc/ini/emcIniFile.cc
+LINEAR_UNITS = {'mm': 1.0, 'metric': 1.0, 'in': 1/25.4, 'inch': 1/25.4,
+    'imperial': 1/25.4}
+ANGULAR_UNITS = {'deg': 1.0, 'degree': 1.0, 'grad': 0.9, 'gon': 0.9,
+    'rad': numpy.pi / 180, 'radian': numpy.pi / 180}
+
+class Limits:
+    """The velocity and acceleration limits of a machine in the units of
+    the preview, inches or degrees per second (squared).  'velocity' and
+    'acceleration' hold one value for each of AXES"""
+    def __init__(self, velocity, acceleration, linear_velocity=numpy.inf,
+            linear_acceleration=numpy.inf, angular_velocity=numpy.inf):
+        self.velocity = numpy.array(velocity, dtype=numpy.float64)
+        self.acceleration = numpy.array(acceleration, dtype=numpy.float64)
+        self.linear_velocity = linear_velocity
+        self.linear_acceleration = linear_acceleration
+        self.angular_velocity = angular_velocity
+
+# Missing and malformed entries both give the default, so that a bad INI file
+# costs the estimate rather than the preview
+
+def _units(inifile, name, table):
+    value = inifile.find("TRAJ", name)
+    if value is None: return 1.0
+    value = value.strip()
+    if value.lower() in table: return table[value.lower()]
+    try:
+        value = float(value)
+    except ValueError:
+        return 1.0
+    if value <= 0: return 1.0
+    return value
+
+def _find(inifile, section, name, default):
+    value = inifile.find(section, name)
+    if value is None: return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+def limits_from_ini(inifile):
+    """The Limits of the machine of 'inifile', from the [AXIS_*] and [TRAJ]
+    sections and with LinuxCNC's defaults for missing entries"""
+    linear = 1 / (_units(inifile, "LINEAR_UNITS", LINEAR_UNITS) * 25.4)
+    angular = 1 / _units(inifile, "ANGULAR_UNITS", ANGULAR_UNITS)
+    velocity = []
+    acceleration = []
+    for i, axis in enumerate(AXES):
+        scale = angular if i in ABC else linear
+        section = "AXIS_" + axis
+        velocity.append(_find(inifile, section, "MAX_VELOCITY", 1.0) * scale)
+        acceleration.append(
+            _find(inifile, section, "MAX_ACCELERATION", 1.0) * scale)
+    return Limits(velocity, acceleration,
+        _find(inifile, "TRAJ", "MAX_LINEAR_VELOCITY", numpy.inf) * linear,
+        _find(inifile, "TRAJ", "MAX_LINEAR_ACCEL", numpy.inf) * linear,
+        _find(inifile, "TRAJ", "MAX_ANGULAR_VELOCITY", numpy.inf) * angular)
+
+class Estimate:
+    """The result of estimate().  Times are in seconds:
+
+    total       motion and dwells
+    motion      all moves
+    rapid       the rapid moves
+    dwell       the dwells (G4)
+    lines       an array of the motion time of each line number
+    tools       [(tool number, motion time), ...] in the order the tools
+                are first used
+    """
+    def __init__(self, times, rapid, lineno, tool, dwell):
+        self.motion = float(times.sum())
+        self.rapid = float(times[rapid].sum())
+        self.dwell = dwell
+        self.total = self.motion + dwell
+        self.lines = numpy.bincount(lineno, times) if len(times) \
+            else numpy.zeros(0)
+        self.tools = []
+        if len(times):
+            numbers, first, index = numpy.unique(tool, True, True)
+            sums = numpy.bincount(index, times)
+            for i in numpy.argsort(first, kind='mergesort'):
+                self.tools.append((int(numbers[i]), float(sums[i])))
+
+    def line_time(self, lineno):
+        if 0 <= lineno < len(self.lines): return float(self.lines[lineno])
+        return 0.0
+
+def _moves(canon):
+    """The columns of the moves of all three stores, in program order"""
+    stores = canon.traverse, canon.feed, canon.arcfeed
+    seq = numpy.concatenate([s.seq for s in stores])
+    order = numpy.argsort(seq, kind='mergesort')
+    rapid = numpy.zeros(len(seq), dtype=bool)
+    rapid[:len(canon.traverse)] = True
+    # the traverse store has no feed rates
+    feedrate = numpy.concatenate([numpy.full(len(canon.traverse), numpy.inf),
+        canon.feed.feedrate, canon.arcfeed.feedrate])
+    return (seq[order],
+        numpy.concatenate([s.lineno for s in stores])[order],
+        numpy.concatenate([s.start for s in stores])[order],
+        numpy.concatenate([s.end for s in stores])[order],
+        feedrate[order], rapid[order])
+
+def _norm(d):
+    return numpy.sqrt(numpy.einsum('ij,ij->i', d, d))
+
+def _axis_limit(limit, ratio):
+    """The path limit from the limit of each axis, with 'ratio' the axis
+    distance per unit of path length"""
+    with numpy.errstate(divide='ignore'):
+        return (limit / ratio).min(axis=1)
+
+def _profile(c, b, chunk):
+    """The squared speeds w with w[0] = c[0] and w[k] = min(c[k], w[k-1]
+    + b[k]); b[0] is not used"""
+    w = numpy.empty_like(c)
+    carry = numpy.inf
+    for i in range(0, len(c), chunk):
+        cc = c[i:i+chunk]
+        bb = b[i:i+chunk].copy()
+        if i == 0: bb[0] = 0
+        B = numpy.cumsum(bb)
+        best = numpy.minimum.accumulate(cc - B)
+        w[i:i+chunk] = B + numpy.minimum(best, carry)
+        carry = w[i+len(cc)-1]
+    return w
+
+def estimate(canon, limits, tolerance=None, initial_tool=0, chunk=65536):
+    """Estimate the run time of the program whose moves are in 'canon'.
+    'tolerance' is the greatest distance of a blend from its corner, in
+    inches; 'initial_tool' is the tool in the spindle before the first
+    tool change"""
+    seq, lineno, start, end, feedrate, rapid = _moves(canon)
+    d = end - start
+    xyz = _norm(d[:, XYZ])
+    uvw = _norm(d[:, UVW])
+    abc = _norm(d[:, ABC])
+    # the length the feed rate applies to, like the interpreter's
+    linear = (xyz > EPSILON) | (uvw > EPSILON)
+    length = numpy.where(xyz > EPSILON, xyz, numpy.where(uvw > EPSILON, uvw,
+        abc))
+    keep = length > EPSILON
+    if not keep.all():
+        seq, lineno, start, end, feedrate, rapid, d, length, linear = [
+            a[keep] for a in (seq, lineno, start, end, feedrate, rapid, d,
+                length, linear)]
+    n = len(length)
+
+    ratio = numpy.abs(d) / length[:, None]
+    vmax = _axis_limit(limits.velocity, ratio)
+    amax = _axis_limit(limits.acceleration, ratio)
+    vmax = numpy.minimum(vmax, numpy.where(linear, limits.linear_velocity,
+        limits.angular_velocity))
+    amax = numpy.where(linear, numpy.minimum(amax,
+        limits.linear_acceleration), amax)
+    feed = ~rapid & (feedrate > 0)
+    vmax[feed] = numpy.minimum(vmax[feed], feedrate[feed])
+
+    # c[k] - the squared speed limit where move k starts; c[n] at the end
+    c = numpy.zeros(n + 1)
+    if n > 1:
+        u = d / _norm(d)[:, None]
+        cos = numpy.einsum('ij,ij->i', u[:-1], u[1:]).clip(-1, 1)
+        # half of the angle between the moves, with 90 degrees for straight on
+        sin_half = numpy.sqrt((1 + cos) / 2)
+        cos_half = numpy.sqrt((1 - cos) / 2)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            radius = (numpy.minimum(length[:-1], length[1:]) / 2
+                * sin_half / cos_half)
+            if tolerance is not None:
+                radius = numpy.minimum(radius,
+                    tolerance * sin_half / (1 - sin_half))
+        corner = numpy.minimum(amax[:-1], amax[1:]) * radius
+        corner = numpy.minimum(corner, numpy.minimum(vmax[:-1],
+            vmax[1:]) ** 2)
+        # stop where the moves do not join up
+        gap = numpy.abs(start[1:] - end[:-1]).max(axis=1) > EPSILON
+        corner[gap] = 0
+        c[1:-1] = corner
+    # and at tool changes
+    changes = numpy.array([s for s, t in canon.tool_changes], dtype=numpy.int64)
+    stops = numpy.searchsorted(seq, changes)
+    c[stops[stops < n]] = 0
+
+    # b[k] - the squared speed gained over move k-1
+    b = numpy.empty(n + 1)
+    b[0] = 0
+    b[1:] = 2 * amax * length
+    w = _profile(c, b, chunk)
+    # the backward pass is the forward one, from the end
+    b = numpy.empty(n + 1)
+    b[0] = 0
+    b[1:] = (2 * amax * length)[::-1]
+    w = _profile(w[::-1].copy(), b, chunk)[::-1]
+
+    w0 = w[:-1]
+    w1 = w[1:]
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        peak = numpy.minimum(vmax ** 2, (w0 + w1) / 2 + amax * length)
+        vpeak = numpy.sqrt(peak)
+        ramps = (2 * vpeak - numpy.sqrt(w0) - numpy.sqrt(w1)) / amax
+        ramps[numpy.isinf(amax)] = 0
+        cruise = length - (2 * peak - w0 - w1) / (2 * amax)
+        cruise = numpy.where(numpy.isinf(amax), length,
+            numpy.maximum(cruise, 0))
+        times = ramps + cruise / vpeak
+
+    tools = numpy.array([initial_tool] + [t for s, t in canon.tool_changes],
+        dtype=numpy.intc)
+    tool = tools[numpy.searchsorted(changes, seq, 'right')]
+    return Estimate(times, rapid, lineno, tool, canon.dwell_time)
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -16,15 +16,25 @@
 #    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 from rs274 import Translated, ArcsToSegmentsMixin, OpenGLTk
+from rs274.segments import SegmentStore, calc_extents
+from rs274.vbo import ProgramBuffers
+from rs274.picking import SegmentPicker
+from rs274.progcache import ProgramCache, default_directory
 from minigl import *
+from minigl import error as GLError
 import math
 import glnav
 import hershey
 import linuxcnc
 import array
+import numpy
 import gcode
 import os
 import re
+import time
+
+# Kinds of buffered moves
+NO_SEGMENT, TRAVERSE, FEED = range(3)
 
 def minmax(*args):
     return min(*args), max(*args)
@@ -78,15 +88,43 @@ limiticon = array.array('B',
 
 class GLCanon(Translated, ArcsToSegmentsMixin):
     lineno = -1
+    aborted = False
+    # While loading progressively, next_line calls chunk_callback(canon)
+    # about every chunk_interval seconds
+    chunk_callback = None
+    chunk_interval = .25
+    # Straight moves are buffered untransformed, and transformed and stored
+    # by flush_moves; batches smaller than batch_min are done one at a time
+    batch_max = 4096
+    batch_min = 16
     def __init__(self, colors, geometry, is_foam=0):
-        # traverse list - [line number, [start position], [end position], [tlo x, tlo y, tlo z]]
-        self.traverse = []; self.traverse_append = self.traverse.append
-        # feed list - [line number, [start position], [end position], feedrate, [tlo x, tlo y, tlo z]]
-        self.feed = []; self.feed_append = self.feed.append
-        # arcfeed list - [line number, [start position], [end position], feedrate, [tlo x, tlo y, tlo z]]
-        self.arcfeed = []; self.arcfeed_append = self.arcfeed.append
+        # tool offset table - [(tlo x, tlo y, tlo z), ...], indexed by the
+        # tool column of the segment stores
+        self.tool_offsets = [(0, 0, 0)]
+        self.tool_index = 0
+        # traverse store - line number, start position, end position, tool offset
+        self.traverse = SegmentStore(self.tool_offsets, False)
+        self.traverse_append = self.traverse.append
+        # feed store - line number, start position, end position, feedrate, tool offset
+        self.feed = SegmentStore(self.tool_offsets)
+        self.feed_append = self.feed.append
+        # arcfeed store - line number, start position, end position, feedrate, tool offset
+        self.arcfeed = SegmentStore(self.tool_offsets)
+        self.arcfeed_append = self.arcfeed.append
         # dwell list - [line number, color, pos x, pos y, pos z, plane]
         self.dwells = []; self.dwells_append = self.dwells.append
+        # number of the next move, for the seq column of the stores
+        self.move_count = 0
+        # tool changes - [(number of the first move with the tool, tool
+        # number), ...]
+        self.tool_changes = []
+        # dwell index - {line number: [index into dwells, ...]}
+        self.dwell_index = {}
+        self.dwell_index_count = 0
+        # buffered moves - [(x, y, z, a, b, c, u, v, w), ...] in program
+        # coordinates, and [(kind, line number, feedrate, tool, seq), ...]
+        self.pending = []
+        self.pending_moves = []
         self.choice = None
         self.feedrate = 1
         self.lo = (0,) * 9
@@ -160,12 +198,64 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
 
     def check_abort(self): pass
 
+    def flush_moves(self):
+        """Transform the buffered moves and add them to the stores; this
+        must be done before self.lo or the stores are used"""
+        pending = self.pending
+        if not pending: return
+        moves = self.pending_moves
+        if len(pending) < self.batch_min:
+            lo = self.lo
+            for args, (kind, lineno, feedrate, tool, seq) in zip(pending, moves):
+                l = self.rotate_and_translate(*args)
+                if kind == TRAVERSE:
+                    self.traverse_append(lineno, lo, l, 0, tool, seq)
+                elif kind == FEED:
+                    self.feed_append(lineno, lo, l, feedrate, tool, seq)
+                lo = l
+        else:
+            end = self.rotate_and_translate_many(
+                numpy.array(pending, dtype=numpy.float64))
+            start = numpy.empty_like(end)
+            start[0] = self.lo
+            start[1:] = end[:-1]
+            info = numpy.array(moves, dtype=numpy.float64)
+            kind = info[:, 0]
+            for store, k in (self.traverse, TRAVERSE), (self.feed, FEED):
+                sel = kind == k
+                store.append_many(info[sel, 1], start[sel], end[sel],
+                    info[sel, 2], info[sel, 3], info[sel, 4])
+            lo = end[-1].tolist()
+        self.lo = lo
+        del pending[:]
+        del moves[:]
+
+    def set_g5x_offset(self, *args):
+        self.flush_moves()
+        Translated.set_g5x_offset(self, *args)
+
+    def set_g92_offset(self, *args):
+        self.flush_moves()
+        Translated.set_g92_offset(self, *args)
+
+    def set_xy_rotation(self, theta):
+        self.flush_moves()
+        Translated.set_xy_rotation(self, theta)
+
     def next_line(self, st):
         self.state = st
         self.lineno = self.state.sequence_number
+        if self.chunk_callback is not None:
+            t = time.time()
+            if t >= self.next_chunk:
+                self.flush_moves()
+                self.chunk_callback(self)
+                self.next_chunk = time.time() + self.chunk_interval
+                if self.aborted: raise KeyboardInterrupt
 
     def draw_lines(self, lines, for_selection, j=0, geometry=None):
-        return linuxcnc.draw_lines(geometry or self.geometry, lines, for_selection)
+        return linuxcnc.draw_segments(geometry or self.geometry,
+            lines.lineno, lines.start, lines.end, for_selection)
 
     def colored_lines(self, color, lines, for_selection, j=0):
         if self.is_foam:
@@ -190,7 +280,7 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
         return linuxcnc.draw_dwells(self.geometry, dwells, alpha, for_selection, self.is_lathe())
 
     def calc_extents(self):
-        self.min_extents, self.max_extents, self.min_extents_notool, self.max_extents_notool = gcode.calc_extents(self.arcfeed, self.feed, self.traverse)
+        self.min_extents, self.max_extents, self.min_extents_notool, self.max_extents_notool = calc_extents(self.arcfeed, self.feed, self.traverse)
         if self.is_foam:
             min_z = min(self.foam_z, self.foam_w)
             max_z = max(self.foam_z, self.foam_w)
@@ -201,6 +291,7 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
             self.max_extents_notool = \
                 self.max_extents_notool[0], self.max_extents_notool[1], max_z
     def tool_offset(self, xo, yo, zo, ao, bo, co, uo, vo, wo):
+        self.flush_moves()
         self.first_move = True
         x, y, z, a, b, c, u, v, w = self.lo
         self.lo = (x - xo + self.xo, y - yo + self.yo, z - zo + self.zo, a - ao + self.ao, b - bo + self.bo, c - bo + self.bo,
@@ -214,6 +305,8 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
         self.uo = uo
         self.vo = vo
         self.wo = wo
+        self.tool_offsets.append((xo, yo, zo))
+        self.tool_index = len(self.tool_offsets) - 1
 
     def set_spindle_rate(self, arg): pass
     def set_feed_rate(self, arg): self.feedrate = arg / 60.
@@ -221,26 +314,45 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
 
     def change_tool(self, arg):
         self.first_move = True
+        self.tool_changes.append((self.move_count, self.loaded_tool(arg)))
+
+    def loaded_tool(self, pocket):
+        """The number of the tool that change_tool(pocket) loads, or the
+        pocket if the canon has no tool table"""
+        if not hasattr(self, 'get_tool'): return pocket
+        # 0 unloads the spindle, unless the tool changer is random
+        if pocket == 0 and not getattr(self, 'random', 0): return 0
+        return self.get_tool(pocket)[0]
 
-    def straight_traverse(self, x,y,z, a,b,c, u, v, w):
+    def straight_traverse(self, *args):
         if self.suppress > 0: return
-        l = self.rotate_and_translate(x,y,z,a,b,c,u,v,w)
-        if not self.first_move:
-                self.traverse_append((self.lineno, self.lo, l, [self.xo, self.yo, self.zo]))
-        self.lo = l
+        self.pending.append(args)
+        if self.first_move:
+            self.pending_moves.append((NO_SEGMENT, self.lineno, 0, 0,
+                self.move_count))
+        else:
+            self.pending_moves.append((TRAVERSE, self.lineno, 0,
+                self.tool_index, self.move_count))
+        self.move_count += 1
+        if len(self.pending) >= self.batch_max: self.flush_moves()
 
     def rigid_tap(self, x, y, z):
         if self.suppress > 0: return
+        self.flush_moves()
         self.first_move = False
         l = self.rotate_and_translate(x,y,z,0,0,0,0,0,0)[:3]
         l += [self.lo[3], self.lo[4], self.lo[5],
                self.lo[6], self.lo[7], self.lo[8]]
-        self.feed_append((self.lineno, self.lo, l, self.feedrate, [self.xo, self.yo, self.zo]))
+        self.feed_append(self.lineno, self.lo, l, self.feedrate, self.tool_index,
+            self.move_count)
 #        self.dwells_append((self.lineno, self.colors['dwell'], x + self.offset_x, y + self.offset_y, z + self.offset_z, 0))
-        self.feed_append((self.lineno, l, self.lo, self.feedrate, [self.xo, self.yo, self.zo]))
+        self.feed_append(self.lineno, l, self.lo, self.feedrate, self.tool_index,
+            self.move_count + 1)
+        self.move_count += 2
 
     def arc_feed(self, *args):
         if self.suppress > 0: return
+        self.flush_moves()
         self.first_move = False
         self.in_arc = True
         try:
@@ -250,67 +362,84 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
 
     def straight_arcsegments(self, segs):
         self.first_move = False
-        lo = self.lo
-        lineno = self.lineno
-        feedrate = self.feedrate
-        to = [self.xo, self.yo, self.zo]
-        append = self.arcfeed_append
-        for l in segs:
-            append((lineno, lo, l, feedrate, to))
-            lo = l
-        self.lo = lo
+        if not segs: return
+        self.arcfeed.extend(self.lineno, self.lo, segs, self.feedrate,
+            self.tool_index, self.move_count)
+        self.move_count += len(segs)
+        self.lo = segs[-1]
 
-    def straight_feed(self, x,y,z, a,b,c, u, v, w):
+    def straight_feed(self, *args):
         if self.suppress > 0: return
         self.first_move = False
-        l = self.rotate_and_translate(x,y,z,a,b,c,u,v,w)
-        self.feed_append((self.lineno, self.lo, l, self.feedrate, [self.xo, self.yo, self.zo]))
-        self.lo = l
+        self.pending.append(args)
+        self.pending_moves.append((FEED, self.lineno, self.feedrate,
+            self.tool_index, self.move_count))
+        self.move_count += 1
+        if len(self.pending) >= self.batch_max: self.flush_moves()
     straight_probe = straight_feed
 
     def user_defined_function(self, i, p, q):
         if self.suppress > 0: return
+        self.flush_moves()
         color = self.colors['m1xx']
         self.dwells_append((self.lineno, color, self.lo[0], self.lo[1], self.lo[2], self.state.plane/10-17))
 
     def dwell(self, arg):
         if self.suppress > 0: return
+        self.flush_moves()
         self.dwell_time += arg
         color = self.colors['dwell']
         self.dwells_append((self.lineno, color, self.lo[0], self.lo[1], self.lo[2], self.state.plane/10-17))
 
 
+    def cache_settings(self):
+        """The settings besides the program and the arguments to
+        gcode.parse that the moves depend on, for ProgramCache keys"""
+        settings = [self.arcdivision, self.arc_tolerance, self.is_foam]
+        for name in ('get_external_length_units', 'get_external_angular_units',
+                'get_axis_mask', 'get_block_delete'):
+            if hasattr(self, name):
+                settings.append(getattr(self, name)())
+        if hasattr(self, 'tools'):
+            settings.append([tuple(t) for t in self.tools])
+        return settings
+
+    def index_dwells(self):
+        self.dwell_index = index = {}
+        for i, line in enumerate(self.dwells):
+            index.setdefault(line[0], []).append(i)
+        self.dwell_index_count = len(self.dwells)
+
+    def index_lines(self):
+        for store in self.traverse, self.feed, self.arcfeed:
+            store.index_lines()
+        self.index_dwells()
+
     def highlight(self, lineno, geometry):
         glLineWidth(3)
         c = self.colors['selected']
         glColor3f(*c)
         glBegin(GL_LINES)
         coords = []
-        for line in self.traverse:
-            if line[0] != lineno: continue
-            linuxcnc.line9(geometry, line[1], line[2])
-            coords.append(line[1][:3])
-            coords.append(line[2][:3])
-        for line in self.arcfeed:
-            if line[0] != lineno: continue
-            linuxcnc.line9(geometry, line[1], line[2])
-            coords.append(line[1][:3])
-            coords.append(line[2][:3])
-        for line in self.feed:
-            if line[0] != lineno: continue
-            linuxcnc.line9(geometry, line[1], line[2])
-            coords.append(line[1][:3])
-            coords.append(line[2][:3])
+        for store in self.traverse, self.arcfeed, self.feed:
+            selected = store.select(lineno)
+            if not len(selected): continue
+            start = store.start[selected]
+            end = store.end[selected]
+            for p1, p2 in zip(start.tolist(), end.tolist()):
+                linuxcnc.line9(geometry, p1, p2)
+            coords.append(start[:, :3])
+            coords.append(end[:, :3])
         glEnd()
-        for line in self.dwells:
-            if line[0] != lineno: continue
+        if self.dwell_index_count != len(self.dwells):
+            self.index_dwells()
+        for i in self.dwell_index.get(lineno, ()):
+            line = self.dwells[i]
             self.draw_dwells([(line[0], c) + line[2:]], 2, 0)
-            coords.append(line[2:5])
+            coords.append([line[2:5]])
         glLineWidth(1)
         if coords:
-            x = reduce(lambda x,y:x+y, [c[0] for c in coords]) / len(coords)
-            y = reduce(lambda x,y:x+y, [c[1] for c in coords]) / len(coords)
-            z = reduce(lambda x,y:x+y, [c[2] for c in coords]) / len(coords)
+            x, y, z = numpy.concatenate(coords).mean(axis=0).tolist()
         else:
             x = (self.min_extents[0] + self.max_extents[0])/2
             y = (self.min_extents[1] + self.max_extents[1])/2
@@ -322,18 +451,23 @@ class GLCanon(Translated, ArcsToSegmentsMixin):
     def color(self, name):
         glColor3f(*self.colors[name])
 
-    def draw(self, for_selection=0, no_traverse=True):
+    def chunk_counts(self):
+        return len(self.traverse), len(self.feed), len(self.arcfeed), len(self.dwells)
+
+    def draw(self, for_selection=0, no_traverse=True, since=(0, 0, 0, 0)):
+        # since - counts from chunk_counts; only moves added after them are drawn
+        t0, f0, a0, d0 = since
         if not no_traverse:
             glEnable(GL_LINE_STIPPLE)
-            self.colored_lines('traverse', self.traverse, for_selection)
+            self.colored_lines('traverse', self.traverse.since(t0), for_selection)
             glDisable(GL_LINE_STIPPLE)
         else:
-            self.colored_lines('straight_feed', self.feed, for_selection, len(self.traverse))
+            self.colored_lines('straight_feed', self.feed.since(f0), for_selection, len(self.traverse))
 
-            self.colored_lines('arc_feed', self.arcfeed, for_selection, len(self.traverse) + len(self.feed))
+            self.colored_lines('arc_feed', self.arcfeed.since(a0), for_selection, len(self.traverse) + len(self.feed))
 
             glLineWidth(2)
-            self.draw_dwells(self.dwells, self.colors.get('dwell_alpha', 1/3.), for_selection, len(self.traverse) + len(self.feed) + len(self.arcfeed))
+            self.draw_dwells(self.dwells[d0:], self.colors.get('dwell_alpha', 1/3.), for_selection, len(self.traverse) + len(self.feed) + len(self.arcfeed))
             glLineWidth(1)
 
 def with_context(f):
@@ -355,6 +489,96 @@ def with_context_swap(f):
             self.deactivate()
     return inner
 
+class StaticLayer:
+    """An offscreen copy, color and depth, of the parts of the preview that
+    only change with the view or the program: the grid, the program and its
+    extents.  A frame in which only the tool, the live plot or the readout
+    changed copies it to the window instead of drawing the program again.
+    Framebuffer objects come with OpenGL 3.0 or ARB_framebuffer_object"""
+    def __init__(self):
+        self.framebuffer = None
+        self.renderbuffers = []
+        self.size = None
+        self.key = None
+        # the window's depth buffer may hold stencil bits too, and a depth
+        # blit needs the same format on both sides
+        self.depth_formats = [(GL_DEPTH_COMPONENT24, GL_DEPTH_ATTACHMENT),
+            (GL_DEPTH24_STENCIL8, GL_DEPTH_STENCIL_ATTACHMENT)]
+        self.supported = None
+
+    def check_support(self):
+        if self.supported is None:
+            version = glGetString(GL_VERSION)
+            try:
+                major = int(version.split(".")[0])
+            except ValueError:
+                major = 0
+            self.supported = major >= 3 or \
+                "GL_ARB_framebuffer_object" in glGetString(GL_EXTENSIONS).split()
+        return self.supported
+
+    def allocate(self, w, h):
+        if self.size == (w, h): return
+        self.delete()
+        depth_format, depth_attachment = self.depth_formats[0]
+        self.framebuffer = glGenFramebuffers(1)[0]
+        self.renderbuffers = glGenRenderbuffers(2)
+        color, depth = self.renderbuffers
+        glBindRenderbuffer(GL_RENDERBUFFER, color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, w, h)
+        glBindRenderbuffer(GL_RENDERBUFFER, depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, depth_format, w, h)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0,
+            GL_RENDERBUFFER, color)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, depth_attachment,
+            GL_RENDERBUFFER, depth)
+        status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            raise GLError(status, "static layer framebuffer incomplete")
+        self.size = w, h
+
+    def delete(self):
+        if self.framebuffer is not None:
+            glDeleteFramebuffers([self.framebuffer])
+            glDeleteRenderbuffers(self.renderbuffers)
+        self.framebuffer = None
+        self.renderbuffers = []
+        self.size = None
+        self.key = None
+
+    def draw(self, key, w, h, render):
+        """Copy the layer to the window, first calling render() to draw it
+        again if 'key' changed.  Returns False if the copy failed but
+        another depth format is left to try, so the caller draws directly
+        this time; raises GLError if the layer cannot be used at all"""
+        window = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+        self.allocate(w, h)
+        if key != self.key:
+            self.key = None
+            glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+            try:
+                glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+                render()
+            finally:
+                glBindFramebuffer(GL_FRAMEBUFFER, window)
+            self.key = key
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.framebuffer)
+        try:
+            glBlitFramebuffer(0, 0, w, h, 0, 0, w, h,
+                GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT, GL_NEAREST)
+        except GLError:
+            if len(self.depth_formats) < 2: raise
+            # try the next depth format from scratch in the next frame
+            glBindFramebuffer(GL_FRAMEBUFFER, window)
+            self.depth_formats.pop(0)
+            self.delete()
+            return False
+        glBindFramebuffer(GL_FRAMEBUFFER, window)
+        return True
+
 
 class GlCanonDraw:
     colors = {
@@ -411,12 +635,17 @@ class GlCanonDraw:
         'axis_y': (1.00, 0.20, 0.20),
         'grid': (0.15, 0.15, 0.15),
     }
+    # With [DISPLAY]ARC_LOD, arcs are divided to within this many pixels at
+    # the zoom the preview is loaded at, and the preview is loaded again
+    # when the zoom changes this many times
+    arc_lod_pixels = .5
+    arc_lod_ratio = 4
+
     def __init__(self, s, lp, g=None):
         self.stat = s
         self.lp = lp
         self.canon = g
         self._dlists = {}
-        self.select_buffer_size = 100
         self.cached_tool = -1
         self.initialised = 0
         self.no_joint_display = False
@@ -424,6 +653,26 @@ class GlCanonDraw:
         self.trajcoordinates = "unknown"
         self.dro_in = "% 9.4f"
         self.dro_mm = "% 9.3f"
+        self.progressive_preview = False
+        self.preview_chunks = []
+        self.preview_chunk_since = None
+        self.preview_renderer = "dlist"
+        # list of ProgramBuffers drawing the program, or None to rebuild
+        self.program_buffers = None
+        self.picker = None
+        # chord tolerance of arcs in the preview, in machine units
+        self.arc_tolerance = 0
+        self.arc_lod = False
+        # chord tolerance, in internal units, the preview was loaded with
+        self.loaded_arc_tolerance = 0
+        self.program_cache = None
+        # bytes of memory for the live plot, or 0 for the default
+        self.live_plot_memory = 0
+        # the offscreen copy of the grid, program and extents, or None to
+        # draw them in every frame
+        self.static_layer = StaticLayer()
+        # changed whenever the program or highlight lists are rebuilt
+        self.static_generation = 0
         if os.environ["INI_FILE_NAME"]:
             self.inifile = linuxcnc.ini(os.environ["INI_FILE_NAME"])
             if self.inifile.find("DISPLAY", "DRO_FORMAT_IN"):
@@ -442,6 +691,45 @@ class GlCanonDraw:
                     print "Error: invalid [DISPLAY] DRO_FORMAT_MM in INI file"
                 else:
                     self.dro_mm = temp
+            self.progressive_preview = bool(int(
+                self.inifile.find("DISPLAY", "PROGRESSIVE_PREVIEW") or 0))
+            temp = self.inifile.find("DISPLAY", "PREVIEW_RENDERER")
+            if temp:
+                if temp.lower() in ("dlist", "vbo"):
+                    self.preview_renderer = temp.lower()
+                else:
+                    print "Error: invalid [DISPLAY] PREVIEW_RENDERER in INI file"
+            temp = self.inifile.find("DISPLAY", "ARC_TOLERANCE")
+            if temp:
+                try:
+                    self.arc_tolerance = float(temp)
+                except ValueError:
+                    print "Error: invalid [DISPLAY] ARC_TOLERANCE in INI file"
+            self.arc_lod = bool(int(
+                self.inifile.find("DISPLAY", "ARC_LOD") or 0))
+            size = float(self.inifile.find("DISPLAY", "PREVIEW_CACHE_SIZE") or 0)
+            if size > 0:
+                directory = self.inifile.find("DISPLAY", "PREVIEW_CACHE_DIR")
+                if directory:
+                    directory = os.path.expanduser(directory)
+                else:
+                    directory = default_directory()
+                self.program_cache = ProgramCache(directory,
+                    int(size * 1024 * 1024), self.inifile,
+                    os.environ["INI_FILE_NAME"])
+            temp = self.inifile.find("DISPLAY", "STATIC_LAYER")
+            if temp:
+                try:
+                    if not int(temp):
+                        self.static_layer = None
+                except ValueError:
+                    print "Error: invalid [DISPLAY] STATIC_LAYER in INI file"
+            temp = self.inifile.find("DISPLAY", "LIVE_PLOT_MEMORY")
+            if temp:
+                try:
+                    self.live_plot_memory = int(float(temp) * 1024 * 1024)
+                except ValueError:
+                    print "Error: invalid [DISPLAY] LIVE_PLOT_MEMORY in INI file"
 
     def init_glcanondraw(self,trajcoordinates="XYZABCUVW",kinsmodule="trivkins",msg=""):
         self.trajcoordinates = trajcoordinates.upper().replace(" ","")
@@ -459,6 +747,7 @@ class GlCanonDraw:
 
     def set_canon(self, canon):
         self.canon = canon
+        self.invalidate_static_layer()
 
     @with_context
     def basic_lighting(self):
@@ -475,41 +764,18 @@ class GlCanonDraw:
 
     def select(self, x, y):
         if self.canon is None: return
-        pmatrix = glGetDoublev(GL_PROJECTION_MATRIX)
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
+        if self.picker is None:
+            if self.is_foam():
+                foam = self.get_foam_z(), self.get_foam_w()
+            else:
+                foam = None
+            self.picker = SegmentPicker(self.canon, self.get_geometry(), foam)
         vport = glGetIntegerv(GL_VIEWPORT)
-        gluPickMatrix(x, vport[3]-y, 5, 5, vport)
-        glMultMatrixd(pmatrix)
-        glMatrixMode(GL_MODELVIEW)
-
-        while 1:
-            glSelectBuffer(self.select_buffer_size)
-            glRenderMode(GL_SELECT)
-            glInitNames()
-            glPushName(0)
-
-            if self.get_show_rapids():
-                glCallList(self.dlist('select_rapids', gen=self.make_selection_list))
-            glCallList(self.dlist('select_norapids', gen=self.make_selection_list))
-
-            try:
-                buffer = list(glRenderMode(GL_RENDER))
-            except OverflowError:
-                self.select_buffer_size *= 2
-                continue
-            break
-
-        if buffer:
-            min_depth, max_depth, names = min(buffer)
-            self.set_highlight_line(names[0])
-        else:
-            self.set_highlight_line(None)
-
-        glMatrixMode(GL_PROJECTION)
-        glPopMatrix()
-        glMatrixMode(GL_MODELVIEW)
+        line = self.picker.pick(x, vport[3]-y,
+            glGetDoublev(GL_MODELVIEW_MATRIX),
+            glGetDoublev(GL_PROJECTION_MATRIX),
+            vport, self.get_show_rapids())
+        self.set_highlight_line(line)
 
     def dlist(self, name, n=1, gen=lambda n: None):
         if name not in self._dlists:
@@ -519,13 +785,24 @@ class GlCanonDraw:
         return self._dlists[name][0]
 
     def stale_dlist(self, name):
+        self.invalidate_static_layer()
         if name not in self._dlists: return
         base, count = self._dlists.pop(name)
         glDeleteLists(base, count)
 
+    def invalidate_static_layer(self):
+        """Draw the grid, program and extents again in the next frame; GUIs
+        call this after changing anything those show that static_key()
+        does not cover"""
+        self.static_generation += 1
+
     def __del__(self):
         for base, count in self._dlists.values():
             glDeleteLists(base, count)
+        if self.static_layer is not None:
+            self.static_layer.delete()
+        self.clear_preview_chunks()
+        self.stale_program_buffers()
 
     def update_highlight_variable(self,line):
         self.highlight_line = line
@@ -534,6 +811,7 @@ class GlCanonDraw:
     def set_highlight_line(self, line):
         if line == self.get_highlight_line(): return
         self.update_highlight_variable(line)
+        self.invalidate_static_layer()
         highlight = self.dlist('highlight')
         glNewList(highlight, GL_COMPILE)
         if line is not None and self.canon is not None:
@@ -1061,14 +1339,22 @@ class GlCanonDraw:
             glBitmap(width,height,xorig,yorig,xmove,ymove,limiticon)
             return
 
-    def redraw(self):
+    def static_key(self):
+        """Everything the grid, program and extents depend on"""
         s = self.stat
-        s.poll()
-
-        machine_limit_min, machine_limit_max = self.soft_limits()
-
-        glDisable(GL_LIGHTING)
-        glMatrixMode(GL_MODELVIEW)
+        return (self.static_generation, id(self.canon),
+            tuple(glGetDoublev(GL_MODELVIEW_MATRIX)),
+            tuple(glGetDoublev(GL_PROJECTION_MATRIX)),
+            self.winfo_width(), self.winfo_height(), self.get_view(),
+            self.get_show_program(), self.get_show_rapids(),
+            self.get_program_alpha(), self.get_show_extents(),
+            self.get_show_metric(), self.get_show_relative(),
+            self.get_grid_size(), self.get_highlight_line(),
+            self.soft_limits(), s.tool_offset, s.g5x_offset, s.g92_offset,
+            s.rotation_xy, s.linear_units, sorted(self.colors.items()))
+
+    def draw_static(self):
+        """Draw the grid, the program and its extents"""
         self.draw_grid()
         if self.get_show_program():
             if self.get_program_alpha():
@@ -1076,9 +1362,7 @@ class GlCanonDraw:
                 glEnable(GL_BLEND)
                 glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
-            if self.get_show_rapids():
-                glCallList(self.dlist('program_rapids', gen=self.make_main_list))
-            glCallList(self.dlist('program_norapids', gen=self.make_main_list))
+            self.draw_program()
             glCallList(self.dlist('highlight'))
 
             if self.get_program_alpha():
@@ -1088,6 +1372,38 @@ class GlCanonDraw:
             if self.get_show_extents():
                 self.show_extents()
 
+    def draw_static_layer(self):
+        """Draw the grid, program and extents from the static layer; returns
+        False if they must be drawn directly"""
+        layer = self.static_layer
+        if layer is None: return False
+        w = self.winfo_width()
+        h = self.winfo_height()
+        if w < 1 or h < 1: return False
+        try:
+            if not layer.check_support():
+                self.static_layer = None
+                return False
+            return layer.draw(self.static_key(), w, h, self.draw_static)
+        except GLError, detail:
+            # e.g. a multisampled window, which cannot be blitted to
+            print "Static preview layer not available:", detail
+            layer.delete()
+            self.static_layer = None
+            return False
+
+    def redraw(self):
+        s = self.stat
+        s.poll()
+        self.check_arc_lod()
+
+        machine_limit_min, machine_limit_max = self.soft_limits()
+
+        glDisable(GL_LIGHTING)
+        glMatrixMode(GL_MODELVIEW)
+        if not self.draw_static_layer():
+            self.draw_static()
+
         if self.get_show_live_plot() or self.get_show_program():
     
             alist = self.dlist(('axes', self.get_view()), gen=self.draw_axes)
@@ -1783,19 +2099,20 @@ class GlCanonDraw:
             size = [3, 3, 3]
         return mid, size
 
-    def make_selection_list(self, unused=None):
-        select_rapids = self.dlist('select_rapids')
-        select_program = self.dlist('select_norapids')
-        glNewList(select_rapids, GL_COMPILE)
-        if self.canon: self.canon.draw(1, False)
-        glEndList()
-        glNewList(select_program, GL_COMPILE)
-        if self.canon: self.canon.draw(1, True)
-        glEndList()
-
     def make_main_list(self, unused=None):
         program = self.dlist('program_norapids')
         rapids = self.dlist('program_rapids')
+        if self.preview_chunks:
+            # The program was loaded progressively, and is already compiled
+            # in pieces
+            glNewList(program, GL_COMPILE)
+            for chunk in self.preview_chunks: glCallList(chunk)
+            glEndList()
+            glNewList(rapids, GL_COMPILE)
+            for chunk in self.preview_chunks: glCallList(chunk+1)
+            glEndList()
+            return
+
         glNewList(program, GL_COMPILE)
         if self.canon: self.canon.draw(0, True)
         glEndList()
@@ -1804,18 +2121,164 @@ class GlCanonDraw:
         if self.canon: self.canon.draw(0, False)
         glEndList()
 
+    def use_program_buffers(self):
+        # foam previews draw each move twice, which only the display lists do
+        return self.preview_renderer == "vbo" and not self.is_foam()
+
+    def stale_program_buffers(self):
+        for b in self.program_buffers or ():
+            b.delete()
+        self.program_buffers = None
+        self.invalidate_static_layer()
+
+    def draw_program(self):
+        if not self.use_program_buffers():
+            if self.get_show_rapids():
+                glCallList(self.dlist('program_rapids', gen=self.make_main_list))
+            glCallList(self.dlist('program_norapids', gen=self.make_main_list))
+            return
+        if self.program_buffers is None:
+            self.program_buffers = []
+            if self.canon:
+                self.program_buffers.append(
+                    ProgramBuffers(self.canon, self.get_geometry()))
+        for b in self.program_buffers:
+            b.draw(self.colors, self.get_show_rapids())
+
+    def clear_preview_chunks(self):
+        for chunk in self.preview_chunks:
+            glDeleteLists(chunk, 2)
+        self.preview_chunks = []
+
+    def add_preview_chunk(self, canon):
+        """Compile the moves parsed since the last chunk, and show them"""
+        since = self.preview_chunk_since
+        counts = canon.chunk_counts()
+        if counts == since: return
+        self.preview_chunk_since = counts
+        if self.use_program_buffers():
+            if self.program_buffers is None: self.program_buffers = []
+            self.program_buffers.append(
+                ProgramBuffers(canon, self.get_geometry(), since))
+            self.invalidate_static_layer()
+            self.preview_chunk_ready()
+            return
+        chunk = glGenLists(2)
+        glNewList(chunk, GL_COMPILE)
+        canon.draw(0, True, since)
+        glEndList()
+        glNewList(chunk+1, GL_COMPILE)
+        canon.draw(0, False, since)
+        glEndList()
+        self.preview_chunks.append(chunk)
+        self.stale_dlist('program_rapids')
+        self.stale_dlist('program_norapids')
+        self.preview_chunk_ready()
+
+    def preview_chunk_ready(self):
+        """Called after each chunk of a progressive load; GUIs redraw the
+        preview and process pending events here"""
+        pass
+
+    def view_pixel_size(self):
+        """Size of a pixel at the center of the view, in internal units"""
+        w = self.winfo_width()
+        h = self.winfo_height()
+        if w < 2 or h < 2: return None
+        if self.perspective:
+            return 2 * self.distance * math.tan(math.radians(self.fovy / 2)) / h
+        k = abs(self.distance or 1) ** .55555
+        return 2 * k / w
+
+    def get_arc_tolerance(self):
+        """Chord tolerance for loading the preview, in internal units; 0 to
+        divide arcs by ARCDIVISION"""
+        tolerance = 0
+        if self.arc_tolerance:
+            tolerance = self.to_internal_linear_unit(self.arc_tolerance)
+        if self.arc_lod:
+            pixel = self.view_pixel_size()
+            if pixel: tolerance = max(tolerance, pixel * self.arc_lod_pixels)
+        return tolerance
+
+    def check_arc_lod(self):
+        if not self.arc_lod or not self.loaded_arc_tolerance: return
+        ratio = self.get_arc_tolerance() / self.loaded_arc_tolerance
+        if ratio > self.arc_lod_ratio or ratio * self.arc_lod_ratio < 1:
+            # not called again until the zoom changes as much once more,
+            # whether or not the GUI reloads
+            self.loaded_arc_tolerance *= ratio
+            self.arc_lod_changed()
+
+    def arc_lod_changed(self):
+        """Called when the view was zoomed so far that the preview should
+        be loaded again for the new level of detail; GUIs schedule a reload
+        here"""
+        pass
+
+    def export_live_plot(self, filename):
+        """Write the live plot to 'filename', one point per line, oldest
+        first.  The motion type is 0 for jogs, and otherwise a
+        linuxcnc.MOTION_TYPE_ constant"""
+        f = open(filename, "w")
+        try:
+            f.write("# x y z rx ry rz motion_type\n")
+            for p in self.lp.points():
+                f.write("%.6f %.6f %.6f %.6f %.6f %.6f %d\n" % p)
+        finally:
+            f.close()
+
     def load_preview(self, f, canon, *args):
         self.set_canon(canon)
-        result, seq = gcode.parse(f, canon, *args)
+        canon.arc_tolerance = self.loaded_arc_tolerance = \
+            self.get_arc_tolerance()
+        self.clear_preview_chunks()
+        self.stale_program_buffers()
+        self.picker = None
+        key = cached = None
+        if self.program_cache is not None:
+            key = self.program_cache.key(f, canon, args)
+            cached = self.program_cache.load(key, canon)
+        if cached is not None:
+            result, seq = cached
+        else:
+            result, seq = self.parse_preview(f, canon, *args)
+            if key is not None:
+                self.program_cache.save(key, canon, result, seq)
+        for store in canon.traverse, canon.feed, canon.arcfeed:
+            store.trim()
+        canon.index_lines()
 
         if result <= gcode.MIN_ERROR:
             self.canon.progress.nextphase(1)
             canon.calc_extents()
             self.stale_dlist('program_rapids')
             self.stale_dlist('program_norapids')
-            self.stale_dlist('select_rapids')
-            self.stale_dlist('select_norapids')
+            self.picker = None
+
+        return result, seq
 
+    def start_preview_chunks(self, canon):
+        """Prepare to show the moves of 'canon' as they are loaded"""
+        self.stale_dlist('program_rapids')
+        self.stale_dlist('program_norapids')
+        self.program_buffers = []
+        self.preview_chunk_since = canon.chunk_counts()
+
+    def parse_preview(self, f, canon, *args):
+        """Run gcode.parse on 'f' into 'canon'; GUIs may do this elsewhere,
+        such as in a worker process"""
+        if self.progressive_preview:
+            self.start_preview_chunks(canon)
+            canon.next_chunk = time.time() + canon.chunk_interval
+            canon.chunk_callback = self.add_preview_chunk
+        try:
+            result, seq = gcode.parse(f, canon, *args)
+        finally:
+            canon.flush_moves()
+            if canon.chunk_callback is not None:
+                canon.chunk_callback = None
+                self.add_preview_chunk(canon)
         return result, seq
 
     def from_internal_units(self, pos, unit=None):
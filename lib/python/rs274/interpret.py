@@ -15,6 +15,7 @@
 #    along with this program; if not, write to the Free Software
 #    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 import math, gcode
+import numpy
 
 class Translated:
     g92_offset_x = g92_offset_y = g92_offset_z = 0
@@ -53,6 +54,25 @@ class Translated:
 
         return [x, y, z, a, b, c, u, v, w]
 
+    def rotate_and_translate_many(self, pts):
+        """Transform the rows of the (n, 9) float64 array 'pts' in place,
+        like rotate_and_translate does each point.  The operations are
+        the same and in the same order, so the results are identical."""
+        pts += [self.g92_offset_x, self.g92_offset_y, self.g92_offset_z,
+                self.g92_offset_a, self.g92_offset_b, self.g92_offset_c,
+                self.g92_offset_u, self.g92_offset_v, self.g92_offset_w]
+
+        if self.rotation_xy:
+            x = pts[:, 0].copy()
+            y = pts[:, 1]
+            pts[:, 0] = x * self.rotation_cos - y * self.rotation_sin
+            pts[:, 1] = x * self.rotation_sin + y * self.rotation_cos
+
+        pts += [self.g5x_offset_x, self.g5x_offset_y, self.g5x_offset_z,
+                self.g5x_offset_a, self.g5x_offset_b, self.g5x_offset_c,
+                self.g5x_offset_u, self.g5x_offset_v, self.g5x_offset_w]
+        return pts
+
     def straight_traverse(self, *args):
         self.straight_traverse_translated(*self.rotate_and_translate(*args))
     def straight_feed(self, *args):
@@ -87,13 +107,16 @@ class Translated:
 class ArcsToSegmentsMixin:
     plane = 1
     arcdivision = 64
+    # If nonzero, arcs are divided so that no segment strays further than
+    # this from the arc, and arcdivision is not used
+    arc_tolerance = 0
 
     def set_plane(self, plane):
         self.plane = plane
 
     def arc_feed(self, x1, y1, cx, cy, rot, z1, a, b, c, u, v, w):
         self.lo = tuple(self.lo)
-        segs = gcode.arc_to_segments(self, x1, y1, cx, cy, rot, z1, a, b, c, u, v, w, self.arcdivision)
+        segs = gcode.arc_to_segments(self, x1, y1, cx, cy, rot, z1, a, b, c, u, v, w, self.arcdivision, self.arc_tolerance)
         self.straight_arcsegments(segs)
 
 class PrintCanon:
@@ -0,0 +1,177 @@
+#    This is a component of AXIS, a front-end for emc
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Parsing of the preview in a worker process.
+#
+# The worker is forked from the GUI, so it starts with a copy of all its
+# state; make_canon() builds a GLCanon there that must not touch the GUI
+# toolkit.  While gcode.parse runs, the worker sends back over a pipe
+#
+#   ('chunk', stores, tool_offsets, dwells, tool_changes)
+#                                            the moves added since the
+#                                            last chunk
+#   ('progress', lineno)
+#   ('notify', message)                      an (AXIS,notify) comment
+#   ('done', result, seq, totals)
+#   ('stopped', totals)                      the program stopped the
+#                                            preview, e.g. (AXIS,stop)
+#   ('error', text)
+#
+# where the stores are (lineno, start, end, feedrate, tool, seq) arrays for the
+# traverse, feed and arcfeed stores.  In the GUI, parse() adds the chunks to
+# its own canon as they arrive and calls pump() between them, so the GUI
+# keeps running.  The worker is killed if the load is cancelled.
+
+import multiprocessing
+import time
+import traceback
+import gcode
+
+class _Sender:
+    """Progress and chunk callbacks for the canon in the worker"""
+    progress_interval = .1
+
+    def __init__(self, conn, canon):
+        self.conn = conn
+        self.counts = canon.chunk_counts()
+        self.tool_count = len(canon.tool_offsets)
+        self.change_count = len(canon.tool_changes)
+        self.next_progress = 0
+
+    def chunk(self, canon):
+        t0, f0, a0, d0 = self.counts
+        stores = []
+        for store, first in zip((canon.traverse, canon.feed, canon.arcfeed),
+                (t0, f0, a0)):
+            s = store.since(first)
+            stores.append((s.lineno.copy(), s.start.copy(), s.end.copy(),
+                s.feedrate.copy(), s.tool.copy(), s.seq.copy()))
+        self.conn.send(('chunk', stores, canon.tool_offsets[self.tool_count:],
+            canon.dwells[d0:], canon.tool_changes[self.change_count:]))
+        self.counts = canon.chunk_counts()
+        self.tool_count = len(canon.tool_offsets)
+        self.change_count = len(canon.tool_changes)
+
+    def update(self, count, force=False):
+        t = time.time()
+        if force or t >= self.next_progress:
+            self.conn.send(('progress', count))
+            self.next_progress = t + self.progress_interval
+
+    def nextphase(self, total): pass
+
+    def notify(self, message):
+        self.conn.send(('notify', message))
+
+def _totals(canon):
+    return canon.dwell_time, canon.foam_z, canon.foam_w
+
+def _run(conn, make_canon, f, args):
+    try:
+        canon = make_canon()
+        sender = _Sender(conn, canon)
+        canon.progress = sender
+        canon.chunk_callback = sender.chunk
+        canon.next_chunk = time.time() + canon.chunk_interval
+        try:
+            result, seq = gcode.parse(f, canon, *args)
+        except KeyboardInterrupt:
+            canon.flush_moves()
+            sender.chunk(canon)
+            conn.send(('stopped', _totals(canon)))
+        else:
+            canon.flush_moves()
+            sender.chunk(canon)
+            conn.send(('done', result, seq, _totals(canon)))
+    except:
+        conn.send(('error', traceback.format_exc()))
+    conn.close()
+
+class ParseWorker:
+    def __init__(self, make_canon, f, args):
+        self.conn, child_conn = multiprocessing.Pipe(False)
+        self.process = multiprocessing.Process(target=_run,
+            args=(child_conn, make_canon, f, args))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+    def receive(self, timeout):
+        """Return the messages that arrive within 'timeout' seconds"""
+        messages = []
+        if self.conn.poll(timeout):
+            messages.append(self.conn.recv())
+            try:
+                while self.conn.poll(0):
+                    messages.append(self.conn.recv())
+            except EOFError:
+                # the worker has finished; the next call raises EOFError
+                # if the messages did not include the last one
+                pass
+        return messages
+
+    def close(self):
+        """Stop the worker, if it is still running"""
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+def add_chunk(canon, stores, tool_offsets, dwells, tool_changes):
+    for store, columns in zip((canon.traverse, canon.feed, canon.arcfeed),
+            stores):
+        store.append_many(*columns)
+    if tool_offsets:
+        canon.tool_offsets.extend(tool_offsets)
+        canon.tool_index = len(canon.tool_offsets) - 1
+    canon.dwells.extend(dwells)
+    canon.tool_changes.extend(tool_changes)
+
+def parse(f, canon, args, make_canon, pump, interval=.02, chunk=None,
+        notify=None):
+    """Parse 'f' into 'canon' in a worker process, like gcode.parse(f,
+    canon, *args).  pump() is called about every 'interval' seconds while
+    waiting, chunk(canon) after each chunk of moves is added, and
+    notify(message) for notify comments.  Raise KeyboardInterrupt if
+    canon.aborted is set or the program stops the preview."""
+    worker = ParseWorker(make_canon, f, args)
+    try:
+        while 1:
+            if canon.aborted: raise KeyboardInterrupt
+            try:
+                messages = worker.receive(interval)
+            except EOFError:
+                raise RuntimeError, "The preview parser exited unexpectedly"
+            for message in messages:
+                kind = message[0]
+                if kind == 'chunk':
+                    add_chunk(canon, *message[1:])
+                    if chunk is not None: chunk(canon)
+                elif kind == 'progress':
+                    canon.progress.update(message[1])
+                elif kind == 'notify':
+                    if notify is not None: notify(message[1])
+                elif kind == 'error':
+                    raise RuntimeError, message[1]
+                else:
+                    canon.dwell_time, canon.foam_z, canon.foam_w = message[-1]
+                    if kind == 'stopped': raise KeyboardInterrupt
+                    return message[1], message[2]
+            pump()
+    finally:
+        worker.close()
+
+# vim:ts=8:sts=4:sw=4:et:
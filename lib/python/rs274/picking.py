@@ -0,0 +1,127 @@
+#    This is a component of AXIS, a front-end for emc
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Picking of preview lines on the CPU, in place of GL_SELECT.
+#
+# The picker keeps the lines of the preview, in the same form they are
+# drawn, with the program line number of each.  For a given view the
+# lines are projected to window coordinates once; each pick then clips the
+# projected lines against the pick box, like gluPickMatrix, and returns the
+# line number of the nearest hit.  Everything is done with NumPy on whole
+# arrays, so no GL selection mode (which most drivers emulate in software)
+# is involved.
+
+import numpy
+from rs274.vbo import subdivisions, line_vertices, dwell_vertices
+
+class SegmentPicker:
+    def __init__(self, canon, geometry, foam=None):
+        # foam - None, or (foam_z, foam_w) to pick from the two planes of
+        # a foam cutter preview
+        if foam is None:
+            planes = [(geometry, 0)]
+        else:
+            planes = [('XY', foam[0]), ('UV', foam[1])]
+        vertices = []
+        lineno = []
+        rapid = []
+        for geometry, z in planes:
+            for store, is_rapid in (canon.feed, False), (canon.arcfeed, False), (canon.traverse, True):
+                steps = subdivisions(store.start, store.end)
+                v = numpy.empty((2 * steps.sum(), 3), dtype=numpy.float32)
+                line_vertices(geometry, store.start, store.end, v)
+                v[:, 2] += z
+                vertices.append(v)
+                lineno.append(numpy.repeat(store.lineno, steps))
+                rapid.append(numpy.zeros(steps.sum(), dtype=bool) + is_rapid)
+        if canon.dwells:
+            vertices.append(dwell_vertices(canon.dwells, canon.is_lathe()))
+            n = numpy.array([d[0] for d in canon.dwells], dtype=numpy.intc)
+            lineno.append(numpy.repeat(n, 4))
+            rapid.append(numpy.zeros(4 * len(n), dtype=bool))
+        if vertices:
+            self.vertices = numpy.concatenate(vertices).astype(numpy.float32)
+            self.lineno = numpy.concatenate(lineno)
+            self.rapid = numpy.concatenate(rapid)
+        else:
+            self.vertices = numpy.zeros((0, 3), dtype=numpy.float32)
+            self.lineno = numpy.zeros(0, dtype=numpy.intc)
+            self.rapid = numpy.zeros(0, dtype=bool)
+        self.view = None
+
+    def project(self, modelview, projection, viewport):
+        """Project the lines to window coordinates, as GL would"""
+        view = tuple(modelview), tuple(projection), tuple(viewport)
+        if view == self.view: return
+        # The GL matrices are column major, so this multiplies row vectors
+        m = numpy.dot(numpy.array(modelview, dtype=numpy.float64).reshape(4, 4),
+                      numpy.array(projection, dtype=numpy.float64).reshape(4, 4))
+        clip = numpy.dot(self.vertices, m[:3]) + m[3]
+        w = clip[:, 3]
+        valid = w > 0
+        w = numpy.where(valid, w, 1)
+        x0, y0, width, height = viewport
+        win = numpy.empty((len(clip), 3))
+        win[:, 0] = x0 + (clip[:, 0] / w + 1) * width / 2.
+        win[:, 1] = y0 + (clip[:, 1] / w + 1) * height / 2.
+        win[:, 2] = (clip[:, 2] / w + 1) / 2.
+        self.p0 = win[0::2]
+        self.p1 = win[1::2]
+        self.valid = valid[0::2] & valid[1::2]
+        self.view = view
+
+    def pick(self, x, y, modelview, projection, viewport, show_rapids=True,
+            size=5):
+        """Return the line number of the nearest line passing through the
+        size x size pixel box centred on window position x, y, or None"""
+        self.project(modelview, projection, viewport)
+        h = size / 2.
+        p0, p1 = self.p0, self.p1
+        cand = self.valid.copy()
+        if not show_rapids: cand &= ~self.rapid
+        cand &= numpy.minimum(p0[:, 0], p1[:, 0]) <= x + h
+        cand &= numpy.maximum(p0[:, 0], p1[:, 0]) >= x - h
+        cand &= numpy.minimum(p0[:, 1], p1[:, 1]) <= y + h
+        cand &= numpy.maximum(p0[:, 1], p1[:, 1]) >= y - h
+        idx = numpy.flatnonzero(cand)
+        if not len(idx): return None
+
+        # Clip the candidates against the box (Liang-Barsky)
+        a = p0[idx]
+        d = p1[idx] - a
+        tmin = numpy.zeros(len(idx))
+        tmax = numpy.ones(len(idx))
+        inside = numpy.ones(len(idx), dtype=bool)
+        for axis, c in (0, x), (1, y):
+            lo = c - h - a[:, axis]
+            hi = c + h - a[:, axis]
+            da = d[:, axis]
+            moving = da != 0
+            inside &= moving | ((lo <= 0) & (hi >= 0))
+            da = numpy.where(moving, da, 1)
+            ta = numpy.where(moving, lo / da, -numpy.inf)
+            tb = numpy.where(moving, hi / da, numpy.inf)
+            tmin = numpy.maximum(tmin, numpy.minimum(ta, tb))
+            tmax = numpy.minimum(tmax, numpy.maximum(ta, tb))
+        hit = inside & (tmin <= tmax)
+        if not hit.any(): return None
+        # window depth is linear along a projected line
+        z0 = a[:, 2] + tmin * d[:, 2]
+        z1 = a[:, 2] + tmax * d[:, 2]
+        depth = numpy.where(hit, numpy.minimum(z0, z1), numpy.inf)
+        return int(self.lineno[idx[depth.argmin()]])
+
+# vim:ts=8:sts=4:sw=4:et:
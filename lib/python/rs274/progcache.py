@@ -0,0 +1,218 @@
+#    This is a component of AXIS, a front-end for emc
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# On-disk cache of parsed programs.
+#
+# Parsing a large program for the preview can take minutes, yet most
+# reloads parse the very same input again.  The cache keeps what a GLCanon
+# collected during gcode.parse (the segment stores, tool offsets, tool
+# changes, dwells and a few totals), keyed by a hash of everything that can change it:
+#
+#   - the program text and location
+#   - the arguments to gcode.parse (startup codes, interpreter name)
+#   - the INI file and the files in [RS274NGC]SUBROUTINE_PATH
+#   - the parameter (var) file, which holds the work offsets
+#   - the tool table and the canon settings (units, axis mask, block
+#     delete, arc division)
+#
+# Each entry is one .npz file.  The total size is kept under a limit by
+# removing the least recently used entries; a hit touches its file, so the
+# modification time is the time of last use.
+
+import errno
+import hashlib
+import json
+import numpy
+import os
+import tempfile
+
+# Changed whenever the contents of the cache files change
+VERSION = 2
+
+def _update_file(h, filename):
+    try:
+        f = open(filename, "rb")
+    except IOError:
+        h.update("-")
+        return
+    try:
+        while 1:
+            data = f.read(1 << 20)
+            if not data: break
+            h.update(data)
+    finally:
+        f.close()
+
+class ProgramCache:
+    def __init__(self, directory, max_bytes, inifile=None, ininame=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.inifile = inifile
+        self.ininame = ininame
+
+    def subroutine_dirs(self):
+        if self.inifile is None: return []
+        path = self.inifile.find("RS274NGC", "SUBROUTINE_PATH")
+        if not path: return []
+        base = os.path.dirname(self.ininame or "")
+        return [os.path.join(base, os.path.expanduser(d))
+            for d in path.split(":") if d]
+
+    def key(self, f, canon, args):
+        """Return the cache key for parsing 'f' with 'canon' and 'args'"""
+        h = hashlib.sha1()
+        h.update("%d\0%s\0%r\0" % (VERSION, os.path.abspath(f), args))
+        _update_file(h, f)
+        if self.ininame:
+            _update_file(h, self.ininame)
+        for d in self.subroutine_dirs():
+            try:
+                names = sorted(os.listdir(d))
+            except OSError:
+                continue
+            for n in names:
+                try:
+                    st = os.stat(os.path.join(d, n))
+                except OSError:
+                    continue
+                h.update("%s\0%s\0%d\0%r\0" % (d, n, st.st_size, st.st_mtime))
+        parameter_file = getattr(canon, "parameter_file", None)
+        if parameter_file:
+            _update_file(h, parameter_file)
+        h.update(repr(canon.cache_settings()))
+        return h.hexdigest()
+
+    def filename(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def load(self, key, canon):
+        """Restore the parse results for 'key' into the new 'canon'.
+        Return (result, seq), or None if the program is not cached"""
+        fn = self.filename(key)
+        try:
+            data = numpy.load(fn)
+        except (IOError, OSError, ValueError):
+            return None
+        try:
+            try:
+                info = json.loads(str(data['info']))
+                if info['version'] != VERSION: return None
+                columns = dict((name, data[name]) for name in data.files)
+            finally:
+                data.close()
+        except (KeyError, ValueError, IOError):
+            return None
+
+        for name in 'traverse', 'feed', 'arcfeed':
+            getattr(canon, name).append_many(columns[name + '_lineno'],
+                columns[name + '_start'], columns[name + '_end'],
+                columns[name + '_feedrate'], columns[name + '_tool'],
+                columns[name + '_seq'])
+        canon.tool_offsets[:] = [tuple(o) for o in info['tool_offsets']]
+        canon.tool_index = len(canon.tool_offsets) - 1
+        canon.tool_changes[:] = [tuple(c) for c in info['tool_changes']]
+        canon.dwells[:] = [(n, tuple(c), p[0], p[1], p[2], plane)
+            for n, c, p, plane in zip(columns['dwell_lineno'].tolist(),
+                columns['dwell_color'].tolist(), columns['dwell_pos'].tolist(),
+                columns['dwell_plane'].tolist())]
+        canon.dwell_time = info['dwell_time']
+        canon.foam_z = info['foam_z']
+        canon.foam_w = info['foam_w']
+        try:
+            os.utime(fn, None)
+        except OSError:
+            pass
+        return info['result'], info['seq']
+
+    def save(self, key, canon, result, seq):
+        """Store the parse results of 'canon' under 'key'"""
+        if not self.max_bytes: return
+        try:
+            os.makedirs(self.directory)
+        except OSError, detail:
+            if detail.errno != errno.EEXIST: return
+        info = {
+            'version': VERSION, 'result': result, 'seq': seq,
+            'tool_offsets': canon.tool_offsets,
+            'tool_changes': canon.tool_changes, 'dwell_time': canon.dwell_time,
+            'foam_z': canon.foam_z, 'foam_w': canon.foam_w,
+        }
+        arrays = {'info': numpy.array(json.dumps(info))}
+        for name in 'traverse', 'feed', 'arcfeed':
+            store = getattr(canon, name)
+            arrays[name + '_lineno'] = store.lineno
+            arrays[name + '_start'] = store.start
+            arrays[name + '_end'] = store.end
+            arrays[name + '_feedrate'] = store.feedrate
+            arrays[name + '_tool'] = store.tool
+            arrays[name + '_seq'] = store.seq
+        dwells = canon.dwells
+        arrays['dwell_lineno'] = numpy.array([d[0] for d in dwells],
+            dtype=numpy.intc)
+        arrays['dwell_color'] = numpy.array([d[1] for d in dwells],
+            dtype=numpy.float64).reshape(-1, 3)
+        arrays['dwell_pos'] = numpy.array([d[2:5] for d in dwells],
+            dtype=numpy.float64).reshape(-1, 3)
+        arrays['dwell_plane'] = numpy.array([d[5] for d in dwells],
+            dtype=numpy.intc)
+
+        # Write under a temporary name, so a reader never sees part of a file
+        try:
+            fd, tmp = tempfile.mkstemp(".tmp", "", self.directory)
+        except OSError:
+            return
+        try:
+            f = os.fdopen(fd, "wb")
+            try:
+                numpy.savez(f, **arrays)
+            finally:
+                f.close()
+            os.rename(tmp, self.filename(key))
+        except (IOError, OSError):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits"""
+        entries = []
+        total = 0
+        for n in os.listdir(self.directory):
+            if not n.endswith(".npz"): continue
+            fn = os.path.join(self.directory, n)
+            try:
+                st = os.stat(fn)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, fn))
+            total += st.st_size
+        entries.sort()
+        for mtime, size, fn in entries:
+            if total <= self.max_bytes: break
+            try:
+                os.unlink(fn)
+            except OSError:
+                continue
+            total -= size
+
+def default_directory():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "linuxcnc", "preview")
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -0,0 +1,230 @@
+#    This is a component of AXIS, a front-end for emc
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Columnar storage for the moves collected by rs274.glcanon.GLCanon.
+#
+# Each move used to be kept as a tuple holding two fresh 9-element lists and
+# a tool offset list, which costs about a kilobyte per segment.  Here the
+# same information lives in a handful of growable typed arrays:
+#
+#   lineno    int    line number of the move
+#   start     9 x double  start position (x y z a b c u v w)
+#   end       9 x double  end position
+#   feedrate  double
+#   tool      int    index into a tool offset table shared by the stores
+#   seq       int    number of the move in the whole program, which gives
+#                    the order of the moves across the stores
+#
+# The column properties return views of the filled part of each array.  A
+# view is only valid until the next append, since growing the store
+# reallocates the arrays.
+#
+# select() finds the segments of one line through a line number index: the
+# segment numbers sorted by line number, searched with a binary search.  It
+# is built by index_lines() and rebuilt if segments were added since.
+
+import numpy
+
+class SegmentStore:
+    def __init__(self, offsets, has_feedrate=True, capacity=1024):
+        # offsets - tool offset table, a list of (tlo x, tlo y, tlo z)
+        self.offsets = offsets
+        self.has_feedrate = has_feedrate
+        self.count = 0
+        self._alloc(capacity)
+        self._order = self._sorted = None
+        self._indexed = -1
+
+    def _alloc(self, capacity):
+        self._lineno = numpy.empty(capacity, dtype=numpy.intc)
+        self._start = numpy.empty((capacity, 9), dtype=numpy.float64)
+        self._end = numpy.empty((capacity, 9), dtype=numpy.float64)
+        self._feedrate = numpy.empty(capacity, dtype=numpy.float64)
+        self._tool = numpy.empty(capacity, dtype=numpy.intc)
+        self._seq = numpy.empty(capacity, dtype=numpy.int64)
+        self.capacity = capacity
+
+    def _grow(self, need):
+        capacity = max(self.capacity, 1024)
+        while capacity < need: capacity *= 2
+        n = self.count
+        old = (self._lineno, self._start, self._end, self._feedrate,
+            self._tool, self._seq)
+        self._alloc(capacity)
+        self._lineno[:n] = old[0][:n]
+        self._start[:n] = old[1][:n]
+        self._end[:n] = old[2][:n]
+        self._feedrate[:n] = old[3][:n]
+        self._tool[:n] = old[4][:n]
+        self._seq[:n] = old[5][:n]
+
+    def append(self, lineno, start, end, feedrate, tool, seq):
+        n = self.count
+        if n == self.capacity: self._grow(n + 1)
+        self._lineno[n] = lineno
+        self._start[n] = start
+        self._end[n] = end
+        self._feedrate[n] = feedrate
+        self._tool[n] = tool
+        self._seq[n] = seq
+        self.count = n + 1
+
+    def extend(self, lineno, start, ends, feedrate, tool, seq):
+        """Append a polyline that begins at 'start' and visits each
+        point in 'ends' in turn; its moves are numbered from 'seq'"""
+        k = len(ends)
+        if not k: return
+        n = self.count
+        if n + k > self.capacity: self._grow(n + k)
+        m = n + k
+        self._lineno[n:m] = lineno
+        self._end[n:m] = ends
+        self._start[n] = start
+        self._start[n+1:m] = self._end[n:m-1]
+        self._feedrate[n:m] = feedrate
+        self._tool[n:m] = tool
+        self._seq[n:m] = numpy.arange(seq, seq + k)
+        self.count = m
+
+    def append_many(self, lineno, start, end, feedrate, tool, seq):
+        """Append a block of segments; the arguments are arrays, or scalars
+        shared by the whole block"""
+        k = len(start)
+        if not k: return
+        n = self.count
+        if n + k > self.capacity: self._grow(n + k)
+        m = n + k
+        self._lineno[n:m] = lineno
+        self._start[n:m] = start
+        self._end[n:m] = end
+        self._feedrate[n:m] = feedrate
+        self._tool[n:m] = tool
+        self._seq[n:m] = seq
+        self.count = m
+
+    def trim(self):
+        """Release the unused capacity once no more segments will be added"""
+        if self.capacity > self.count:
+            n = self.count
+            self._lineno = self._lineno[:n].copy()
+            self._start = self._start[:n].copy()
+            self._end = self._end[:n].copy()
+            self._feedrate = self._feedrate[:n].copy()
+            self._tool = self._tool[:n].copy()
+            self._seq = self._seq[:n].copy()
+            self.capacity = n
+
+    def index_lines(self):
+        """Build the line number index used by select"""
+        lineno = self.lineno
+        self._order = numpy.argsort(lineno, kind='mergesort').astype(numpy.intc)
+        self._sorted = lineno[self._order]
+        self._indexed = self.count
+
+    def select(self, lineno):
+        """Return the indices of the segments of line 'lineno', in the
+        order they were added"""
+        if self._indexed != self.count: self.index_lines()
+        lo = numpy.searchsorted(self._sorted, lineno, 'left')
+        hi = numpy.searchsorted(self._sorted, lineno, 'right')
+        return self._order[lo:hi]
+
+    def since(self, first):
+        """Return the segments added after the first 'first' ones"""
+        return SegmentSlice(self, first)
+
+    lineno = property(lambda self: self._lineno[:self.count])
+    start = property(lambda self: self._start[:self.count])
+    end = property(lambda self: self._end[:self.count])
+    feedrate = property(lambda self: self._feedrate[:self.count])
+    tool = property(lambda self: self._tool[:self.count])
+    seq = property(lambda self: self._seq[:self.count])
+
+    @property
+    def tlo(self):
+        """The (tlo x, tlo y, tlo z) offset of each segment"""
+        offsets = numpy.array(self.offsets, dtype=numpy.float64).reshape(-1, 3)
+        return offsets[self.tool]
+
+    def nbytes(self):
+        return (self._lineno.nbytes + self._start.nbytes + self._end.nbytes
+            + self._feedrate.nbytes + self._tool.nbytes + self._seq.nbytes)
+
+    def __len__(self):
+        return self.count
+
+    def __nonzero__(self):
+        return self.count > 0
+
+    def __getitem__(self, i):
+        if i < 0: i += self.count
+        if i < 0 or i >= self.count: raise IndexError, i
+        tlo = list(self.offsets[self._tool[i]])
+        if self.has_feedrate:
+            return (int(self._lineno[i]), self._start[i].tolist(),
+                self._end[i].tolist(), float(self._feedrate[i]), tlo)
+        return (int(self._lineno[i]), self._start[i].tolist(),
+            self._end[i].tolist(), tlo)
+
+    def __iter__(self):
+        # Compatibility with the old list-of-tuples format; slow, so code
+        # in this package uses the column properties instead
+        for i in xrange(self.count):
+            yield self[i]
+
+class SegmentSlice:
+    """The columns of a SegmentStore from one segment to the end, for
+    drawing part of a store"""
+    def __init__(self, store, first):
+        n = store.count
+        self.lineno = store._lineno[first:n]
+        self.start = store._start[first:n]
+        self.end = store._end[first:n]
+        self.feedrate = store._feedrate[first:n]
+        self.tool = store._tool[first:n]
+        self.seq = store._seq[first:n]
+
+    def __len__(self):
+        return len(self.lineno)
+
+def calc_extents(*stores):
+    """Vectorised equivalent of gcode.calc_extents.
+
+    Like the C version, the extents take in the start point of every
+    segment and the end point of the last segment of each store, and the
+    second pair of extents adds the tool length offset to those points."""
+    points = []
+    tlos = []
+    for store in stores:
+        if not len(store): continue
+        tlo = store.tlo
+        points.append(store.start[:, :3])
+        tlos.append(tlo)
+        points.append(store.end[-1:, :3])
+        tlos.append(tlo[-1:])
+    if not points:
+        return [9e99] * 3, [-9e99] * 3, [9e99] * 3, [-9e99] * 3
+    points = numpy.concatenate(points)
+    withtool = points + numpy.concatenate(tlos)
+    return (points.min(axis=0).tolist(), points.max(axis=0).tolist(),
+        withtool.min(axis=0).tolist(), withtool.max(axis=0).tolist())
+
+def dist_xyz(store):
+    """Length of each segment in the xyz subspace"""
+    d = store.end[:, :3] - store.start[:, :3]
+    return numpy.sqrt((d * d).sum(axis=1))
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -0,0 +1,190 @@
+#    This is a component of AXIS, a front-end for emc
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# Vertex buffer rendering of the program preview.
+#
+# The moves of a GLCanon are converted once to GL_LINES vertices, following
+# the same [DISPLAY]GEOMETRY transformation and rotary subdivision as
+# linuxcnc.draw_lines, and uploaded into a single buffer object laid out as
+#
+#   feeds | arcs | rapids | dwells (grouped by color)
+#
+# Drawing is then one glDrawArrays per kind of move.  The colors are set at
+# draw time, so changing them or hiding the rapids needs no rebuild.  Only
+# buffer objects and client-side vertex arrays (OpenGL 1.5) are used, which
+# any Mesa driver including llvmpipe provides.
+
+from minigl import *
+import math
+import numpy
+
+# Segments converted to vertices at once, to bound the temporary memory
+BLOCK = 65536
+
+# Half size of the cross drawn for a dwell, as in linuxcnc.draw_dwells
+DWELL_SIZE = 0.015625
+
+def vertex9(geometry, pts):
+    """Vectorised linuxcnc.vertex9: map (n, 9) positions to (n, 3) points"""
+    p = numpy.zeros((len(pts), 3))
+    sign = 1
+    for c in geometry:
+        if c == '-':
+            sign = -1
+        elif c in 'XYZ':
+            i = 'XYZ'.index(c)
+            p[:, i] += pts[:, i] * sign
+            sign = 1
+        elif c in 'UVW':
+            i = 'UVW'.index(c)
+            p[:, i] += pts[:, i + 6] * sign
+            sign = 1
+        elif c in 'ABC':
+            # rotation about x, y or z, applied to the other two coordinates
+            j, k = {'A': (1, 2), 'B': (0, 2), 'C': (0, 1)}[c]
+            theta = pts[:, 'ABC'.index(c) + 3] * sign * math.pi / 180
+            cos, sin = numpy.cos(theta), numpy.sin(theta)
+            pj = p[:, j] * cos - p[:, k] * sin
+            pk = p[:, j] * sin + p[:, k] * cos
+            p[:, j] = pj
+            p[:, k] = pk
+            sign = 1
+    return p
+
+def subdivisions(start, end):
+    """Number of straight pieces drawn for each segment; moves of the
+    rotary axes are split like line9 in emcmodule.cc"""
+    dc = abs(end[:, 3:6] - start[:, 3:6]).max(axis=1)
+    steps = numpy.ceil(numpy.maximum(10, dc / 10))
+    return numpy.where(dc != 0, steps, 1).astype(numpy.intp)
+
+def line_vertices(geometry, start, end, out):
+    """Write the GL_LINES vertices for segments from 'start' to 'end' into
+    'out', which must hold 2*subdivisions(start, end).sum() rows"""
+    pos = 0
+    for b in range(0, len(start), BLOCK):
+        s = start[b:b+BLOCK]
+        e = end[b:b+BLOCK]
+        steps = subdivisions(s, e)
+        seg = numpy.repeat(numpy.arange(len(s)), steps)
+        first = numpy.cumsum(steps) - steps
+        i = numpy.arange(len(seg)) - first[seg]
+        st = steps[seg].astype(numpy.float64)[:, None]
+        t0 = i[:, None] / st
+        t1 = (i[:, None] + 1) / st
+        p0 = vertex9(geometry, t0 * e[seg] + (1.0 - t0) * s[seg])
+        p1 = vertex9(geometry, t1 * e[seg] + (1.0 - t1) * s[seg])
+        n = len(seg)
+        out[pos:pos+2*n:2] = p0
+        out[pos+1:pos+2*n:2] = p1
+        pos += 2*n
+    return pos
+
+_dwell_cross = numpy.array([
+    # dwells in the XY plane
+    [(-1, -1, 0), (1, 1, 0), (-1, 1, 0), (1, -1, 0),
+     (1, 1, 0), (-1, -1, 0), (1, -1, 0), (-1, 1, 0)],
+    # XZ plane
+    [(-1, 0, -1), (1, 0, 1), (-1, 0, 1), (1, 0, -1),
+     (1, 0, 1), (-1, 0, -1), (1, 0, -1), (-1, 0, 1)],
+    # YZ plane
+    [(0, -1, -1), (0, 1, 1), (0, 1, -1), (0, -1, 1),
+     (0, 1, 1), (0, -1, -1), (0, -1, 1), (0, 1, -1)],
+], dtype=numpy.float64) * DWELL_SIZE
+
+def dwell_vertices(dwells, is_lathe):
+    """GL_LINES vertices for dwells in the glcanon format"""
+    if not dwells:
+        return numpy.zeros((0, 3))
+    pos = numpy.array([d[2:5] for d in dwells], dtype=numpy.float64)
+    plane = numpy.array([d[5] for d in dwells], dtype=numpy.intp)
+    if is_lathe: plane[:] = 1
+    v = pos[:, None, :] + _dwell_cross[plane]
+    return v.reshape(-1, 3)
+
+class ProgramBuffers:
+    def __init__(self, canon, geometry, since=(0, 0, 0, 0)):
+        # since - counts from GLCanon.chunk_counts; only moves added after
+        # them are uploaded
+        t0, f0, a0, d0 = since
+        stores = [('straight_feed', canon.feed.since(f0)),
+                  ('arc_feed', canon.arcfeed.since(a0)),
+                  ('traverse', canon.traverse.since(t0))]
+
+        dwells = canon.dwells[d0:]
+        colors = []
+        for d in dwells:
+            if d[1] not in colors: colors.append(d[1])
+        dwells_by_color = [[d for d in dwells if d[1] == c] for c in colors]
+
+        total = sum(2 * subdivisions(s.start, s.end).sum() for n, s in stores)
+        total += 8 * len(dwells)
+        vertices = numpy.empty((total, 3), dtype=numpy.float32)
+
+        self.ranges = {}
+        pos = 0
+        for name, store in stores:
+            n = line_vertices(geometry, store.start, store.end, vertices[pos:])
+            self.ranges[name] = pos, n
+            pos += n
+        self.dwells = []
+        for color, group in zip(colors, dwells_by_color):
+            v = dwell_vertices(group, canon.is_lathe())
+            vertices[pos:pos+len(v)] = v
+            self.dwells.append((color, pos, len(v)))
+            pos += len(v)
+
+        self.count = total
+        self.buffer = glGenBuffers(1)[0]
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glBufferData(GL_ARRAY_BUFFER, vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def delete(self):
+        if self.buffer:
+            glDeleteBuffers([self.buffer])
+            self.buffer = 0
+
+    def draw_range(self, name, colors):
+        first, count = self.ranges[name]
+        if not count: return
+        glColor4f(*(colors[name] + (colors.get(name+'_alpha', 1/3.),)))
+        glDrawArrays(GL_LINES, first, count)
+
+    def draw(self, colors, show_rapids=True):
+        if not self.count: return
+        glBindBuffer(GL_ARRAY_BUFFER, self.buffer)
+        glVertexPointer(3, GL_FLOAT, 0, 0)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        try:
+            if show_rapids:
+                glEnable(GL_LINE_STIPPLE)
+                self.draw_range('traverse', colors)
+                glDisable(GL_LINE_STIPPLE)
+            self.draw_range('straight_feed', colors)
+            self.draw_range('arc_feed', colors)
+            if self.dwells:
+                glLineWidth(2)
+                alpha = colors.get('dwell_alpha', 1/3.)
+                for color, first, count in self.dwells:
+                    glColor4f(*(tuple(color) + (alpha,)))
+                    glDrawArrays(GL_LINES, first, count)
+                glLineWidth(1)
+        finally:
+            glDisableClientState(GL_VERTEX_ARRAY)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+# vim:ts=8:sts=4:sw=4:et:
@@ -0,0 +1,196 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""One linuxcnc.stat poller shared by all the widgets of a GUI
+
+Instead of each widget polling its own linuxcnc.stat on its own timer, the
+widgets subscribe to the hub of the process, which polls once per cycle
+and hands the same snapshot to every subscriber that is due:
+
+    hub = stathub.get_hub()
+    sub = hub.subscribe(self.update, 500)
+    ...
+    def update(self, snapshot):
+        if snapshot is None: return True    # linuxcnc is not running
+        self.label.set_text(str(snapshot.g5x_index))
+        return True
+
+The hub's timer runs at the shortest interval asked for; a subscriber is
+called at most once per its own interval, so adding a slow widget adds no
+polls.  Like a gobject timeout, a callback that returns a false value is
+unsubscribed.  With 'fields', the callback is instead called as
+callback(snapshot, changed), and only when one of the fields changed since
+its last call; 'fields' are as for stattrack.StatTracker.
+
+A snapshot holds the stat fields of one poll.  Each field is read from the
+stat object when first used, and then kept, so every subscriber shares the
+same Python objects; fields that nobody read before the next poll are no
+longer available.
+
+Code written for a plain linuxcnc.stat can use shared_stat() in its place.
+Its poll() reads the status from the task, like linuxcnc.stat.poll, and its
+fields are those of the latest snapshot of the hub.
+"""
+
+import gobject
+import linuxcnc
+import time
+import traceback
+from stattrack import StatTracker
+
+class Snapshot(object):
+    def __init__(self, stat, generation, time):
+        d = self.__dict__
+        d['_stat'] = stat
+        d['generation'] = generation
+        d['time'] = time
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name == 'poll':
+            raise AttributeError, name
+        stat = self._stat
+        if stat is None:
+            raise AttributeError, "%s was not read before the next poll" % name
+        value = getattr(stat, name)
+        # later lookups find it in __dict__ and do not come here
+        self.__dict__[name] = value
+        return value
+
+    def __setattr__(self, name, value):
+        raise AttributeError, "stat snapshots are read-only"
+
+    def seal(self):
+        """Detach from the stat object, which is about to be polled again"""
+        self.__dict__['_stat'] = None
+
+class Subscription:
+    def __init__(self, callback, interval, fields):
+        self.callback = callback
+        self.interval = interval
+        self.tracker = fields and StatTracker(None, fields)
+        self.due = 0
+
+class StatHub:
+    def __init__(self, stat=None):
+        self.stat = stat or linuxcnc.stat()
+        self.snapshot = None
+        self.generation = 0
+        self.subscriptions = []
+        self.period = None
+        self.timer = None
+
+    def poll(self, max_age=0):
+        """Poll the stat object, unless the latest snapshot is at most
+        'max_age' seconds old, and return the latest snapshot.  Raises
+        linuxcnc.error like linuxcnc.stat.poll"""
+        now = time.time()
+        snapshot = self.snapshot
+        if snapshot is not None and now - snapshot.time <= max_age:
+            return snapshot
+        if snapshot is not None: snapshot.seal()
+        self.snapshot = None
+        self.stat.poll()
+        self.generation += 1
+        self.snapshot = Snapshot(self.stat, self.generation, now)
+        return self.snapshot
+
+    def subscribe(self, callback, interval=100, fields=None):
+        """Call callback(snapshot) about every 'interval' milliseconds;
+        snapshot is None if the status could not be polled"""
+        sub = Subscription(callback, interval, fields)
+        self.subscriptions.append(sub)
+        self.schedule()
+        return sub
+
+    def unsubscribe(self, sub):
+        if sub in self.subscriptions:
+            self.subscriptions.remove(sub)
+            self.schedule()
+
+    def schedule(self):
+        """(Re)start the timer at the shortest interval of the subscribers"""
+        period = None
+        if self.subscriptions:
+            period = min(sub.interval for sub in self.subscriptions)
+        if period == self.period: return
+        if self.timer is not None:
+            gobject.source_remove(self.timer)
+            self.timer = None
+        self.period = period
+        if period is not None:
+            self.timer = gobject.timeout_add(period, self.tick)
+
+    def tick(self):
+        # a poll made by shared_stat users since the last tick will do
+        try:
+            snapshot = self.poll(self.period / 2000.)
+        except linuxcnc.error:
+            snapshot = None
+        now = time.time()
+        # half a period of slack, so timer jitter does not make a
+        # subscriber wait a whole extra period
+        slack = self.period / 2000.
+        for sub in list(self.subscriptions):
+            if now + slack < sub.due: continue
+            sub.due = max(sub.due + sub.interval / 1000.,
+                now + sub.interval / 1000. - slack)
+            try:
+                if sub.tracker:
+                    if snapshot is None: continue
+                    sub.tracker.stat = snapshot
+                    changed = sub.tracker.changes()
+                    if not changed: continue
+                    keep = sub.callback(snapshot, changed)
+                else:
+                    keep = sub.callback(snapshot)
+            except:
+                # one broken widget must not stop the others
+                traceback.print_exc()
+                continue
+            if not keep:
+                self.unsubscribe(sub)
+        # schedule() may have replaced or removed this timer
+        return self.timer is not None
+
+class SharedStat(object):
+    """A stand-in for linuxcnc.stat that reads the hub's snapshots"""
+    def __init__(self, hub):
+        self._hub = hub
+
+    def poll(self):
+        self._hub.poll()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError, name
+        snapshot = self._hub.snapshot
+        if snapshot is None:
+            return getattr(self._hub.stat, name)
+        return getattr(snapshot, name)
+
+_hub = None
+
+def get_hub():
+    """The hub of this process"""
+    global _hub
+    if _hub is None:
+        _hub = StatHub()
+    return _hub
+
+def shared_stat():
+    return SharedStat(get_hub())
+
+# vim:ts=8:sts=4:sw=4:et:
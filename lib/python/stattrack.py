@@ -0,0 +1,75 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Change tracking for linuxcnc.stat
+
+A StatTracker remembers the last value of a set of stat fields and reports
+which of them changed, so a GUI can update only the widgets that depend on
+them instead of rewriting every widget on every poll:
+
+    tracker = StatTracker(linuxcnc.stat(), ('task_mode', 'file',
+        ('tool', lambda s: s.tool_table[0])))
+    ...
+    changed = tracker.poll()
+    if 'file' in changed: load(changed['file'])
+
+A field is either the name of a stat attribute, or a (name, function)
+pair; the function is called with the stat object and its result is
+tracked under the name.
+"""
+
+class StatTracker:
+    def __init__(self, stat, fields):
+        self.stat = stat
+        self.fields = []
+        for field in fields:
+            if isinstance(field, tuple):
+                self.fields.append(field)
+            else:
+                self.fields.append((field, None))
+        self.values = {}
+
+    def poll(self):
+        """Poll the stat object and return the changes"""
+        self.stat.poll()
+        return self.changes()
+
+    def changes(self):
+        """Return {name: value} for the fields that changed since the last
+        call.  Each field is reported the first time, and after forget()"""
+        stat = self.stat
+        values = self.values
+        changed = {}
+        for name, get in self.fields:
+            if get is None:
+                value = getattr(stat, name)
+            else:
+                value = get(stat)
+            if name not in values or values[name] != value:
+                values[name] = changed[name] = value
+        return changed
+
+    def forget(self, *names):
+        """Report the named fields, or all of them, as changed next time"""
+        if names:
+            for name in names:
+                self.values.pop(name, None)
+        else:
+            self.values.clear()
+
+    def __getitem__(self, name):
+        """The value of a field as of the last call to changes()"""
+        return self.values[name]
@@ -0,0 +1,126 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""The tool table file, read once and kept up to date
+
+A ToolTable holds the parsed lines of a tool table file, indexed by tool
+and by pocket number, and re-reads the file when it changes:
+
+    table = tooltable.get_table(filename)
+    table.subscribe(self.tools_changed)
+    ...
+    tool = table.by_tool.get(5)
+    if tool: print tool.pocket, tool.value('Z'), tool.comment
+
+    def tools_changed(self, table, changed):
+        # 'changed' holds the tool numbers whose lines changed, were added
+        # or were removed
+        ...
+
+On Linux the file's directory is watched with inotify from the glib main
+loop, so nothing is done while the file does not change; elsewhere its
+size and time are checked every second.  When the file changes, only the
+lines whose text changed are parsed again.
+"""
+
+import os
+import sys
+from filewatch import WatchedFile
+
+# the letters of the values after T and P, in the order of the file format
+VALUE_LETTERS = 'XYZABCUVWDIJQ'
+
+class Tool(object):
+    """One line of the tool table.  'tool' and 'pocket' are None if the
+    line does not give them; 'values' holds a float, or None, for each of
+    VALUE_LETTERS"""
+    __slots__ = 'tool', 'pocket', 'values', 'comment', 'line'
+
+    def __init__(self, line):
+        self.line = line
+        self.tool = self.pocket = None
+        self.values = [None] * len(VALUE_LETTERS)
+        index = line.find(";")
+        if index == -1:
+            self.comment = ''
+        else:
+            self.comment = line[index+1:].rstrip("\n")
+        seen = set()
+        for word in line.split():
+            if word.startswith(';'): break
+            letter = word[0]
+            # the first word with a letter counts
+            if letter in seen: continue
+            seen.add(letter)
+            number = word.lstrip(word[0])
+            try:
+                if letter == 'T':
+                    self.tool = int(number)
+                elif letter == 'P':
+                    self.pocket = int(number)
+                elif letter in VALUE_LETTERS:
+                    self.values[VALUE_LETTERS.index(letter)] = float(number)
+            except ValueError:
+                print >>sys.stderr, "tooltable: bad number %r in %r" % (
+                    word, line.rstrip("\n"))
+
+    def value(self, letter):
+        return self.values[VALUE_LETTERS.index(letter)]
+
+    def __repr__(self):
+        return "<Tool %s %r>" % (self.tool, self.line.rstrip("\n"))
+
+class ToolTable(WatchedFile):
+    def __init__(self, filename):
+        WatchedFile.__init__(self, filename)
+        self.tools = []
+        self.by_tool = {}
+        self.by_pocket = {}
+        self.reload()
+
+    def reload(self):
+        """Read the file again, and tell the listeners if it changed"""
+        self.stamp = self.stat()
+        lines = self.read().splitlines(True)
+        old = dict((t.line, t) for t in self.tools)
+        tools = [old.get(l) or Tool(l) for l in lines]
+        if [t.line for t in tools] == [t.line for t in self.tools]:
+            return
+        by_tool = {}
+        by_pocket = {}
+        for t in tools:
+            # a later line for the same tool wins
+            if t.tool is not None: by_tool[t.tool] = t
+            if t.pocket is not None: by_pocket[t.pocket] = t
+        changed = set(n for n in set(by_tool) | set(self.by_tool)
+            if by_tool.get(n) is not self.by_tool.get(n))
+        self.tools = tools
+        self.by_tool = by_tool
+        self.by_pocket = by_pocket
+        self.notify(changed)
+
+_tables = {}
+
+def get_table(filename):
+    """The watched table of 'filename' in this process"""
+    filename = os.path.abspath(filename)
+    table = _tables.get(filename)
+    if table is None:
+        table = _tables[filename] = ToolTable(filename)
+        table.watch()
+    return table
+
+# vim:ts=8:sts=4:sw=4:et:
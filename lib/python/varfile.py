@@ -0,0 +1,114 @@
+#    This is a component of LinuxCNC
+#
+#    This program is free software; you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation; either version 2 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""The interpreter's parameter (var) file, read once and kept up to date
+
+A VarFile holds the numbered parameters saved in a var file, and re-reads
+the file when the interpreter writes it:
+
+    params = varfile.get_varfile(filename)
+    params.subscribe(self.params_changed)
+    ...
+    print params[5220], params.g5x(2)    # the current system, G55 X..W
+
+    def params_changed(self, params, changed):
+        # 'changed' is a sorted list of the numbers whose values changed,
+        # or which were added or removed
+        if any(5221 <= n <= 5229 for n in changed): ...
+
+Widgets that show offsets share the one reader of the file, and only
+redraw when the parameters they show change.
+"""
+
+import numpy
+import os
+import re
+from filewatch import WatchedFile
+
+# RS274NGC_MAX_PARAMETERS in src/emc/rs274ngc/interp_internal.hh
+MAX_PARAMETERS = 5602
+
+# the X offset of coordinate system 'index' (1..9 = G54..G59.3) is
+# parameter G5X_BASE + G5X_STEP * index, and W follows 8 later
+G5X_BASE = 5201
+G5X_STEP = 20
+G92_BASE = 5211
+
+_line = re.compile(r"^[ \t]*(\d+)[ \t]+(\S+)", re.M)
+
+class VarFile(WatchedFile):
+    def __init__(self, filename):
+        WatchedFile.__init__(self, filename)
+        self.values = numpy.zeros(MAX_PARAMETERS)
+        self.present = numpy.zeros(MAX_PARAMETERS, bool)
+        self.reload()
+
+    def parse(self, text):
+        """The values and present mask of the parameters in 'text'"""
+        values = numpy.zeros(MAX_PARAMETERS)
+        present = numpy.zeros(MAX_PARAMETERS, bool)
+        for number, value in _line.findall(text):
+            number = int(number)
+            if not 0 < number < MAX_PARAMETERS: continue
+            try:
+                values[number] = float(value)
+            except ValueError:
+                continue
+            present[number] = True
+        return values, present
+
+    def reload(self):
+        """Read the file again, and tell the listeners which parameters
+        changed"""
+        self.stamp = self.stat()
+        values, present = self.parse(self.read())
+        changed = numpy.flatnonzero((values != self.values)
+            | (present != self.present))
+        if not len(changed): return
+        self.values = values
+        self.present = present
+        self.notify(changed.tolist())
+
+    def __getitem__(self, number):
+        return float(self.values[number])
+
+    def get(self, number, default=None):
+        """Parameter 'number', or 'default' if the file does not give it"""
+        if not 0 < number < MAX_PARAMETERS or not self.present[number]:
+            return default
+        return float(self.values[number])
+
+    def g5x(self, index):
+        """The X..W offsets of coordinate system 'index' (1 = G54)"""
+        base = G5X_BASE + G5X_STEP * index
+        return self.values[base:base+9].tolist()
+
+    def g92(self):
+        """The X..W G92 offsets"""
+        return self.values[G92_BASE:G92_BASE+9].tolist()
+
+_files = {}
+
+def get_varfile(filename):
+    """The watched var file 'filename' of this process"""
+    filename = os.path.abspath(filename)
+    params = _files.get(filename)
+    if params is None:
+        params = _files[filename] = VarFile(filename)
+        params.watch()
+    return params
+
+# vim:ts=8:sts=4:sw=4:et:
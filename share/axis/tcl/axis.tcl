@@ -79,6 +79,10 @@ setup_menu_accel .menu.file end [_ "_Save gcode as..."]
         -command gcode_properties
 setup_menu_accel .menu.file end [_ "_Properties..."]
 
+.menu.file add command \
+        -command save_live_plot
+setup_menu_accel .menu.file end [_ "Save li_ve plot as..."]
+
 .menu.file add separator
 
 .menu.file add command \
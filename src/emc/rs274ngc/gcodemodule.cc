@@ -909,6 +909,9 @@ static void rotate(double &x, double &y, double c, double s) {
     x = tx;
 }
 
+// Finest subdivision of an arc when segmenting by chord tolerance
+#define MIN_ARC_STEP (M_PI / 4096)
+
 static PyObject *rs274_arc_to_segments(PyObject *self, PyObject *args) {
     PyObject *canon;
     double x1, y1, cx, cy, z1, a, b, c, u, v, w;
@@ -917,9 +920,11 @@ static PyObject *rs274_arc_to_segments(PyObject *self, PyObject *args) {
     int X, Y, Z;
     double rotation_cos, rotation_sin;
     int max_segments = 128;
+    double tolerance = 0;
 
-    if(!PyArg_ParseTuple(args, "Oddddiddddddd|i:arcs_to_segments",
-        &canon, &x1, &y1, &cx, &cy, &rot, &z1, &a, &b, &c, &u, &v, &w, &max_segments)) return NULL;
+    if(!PyArg_ParseTuple(args, "Oddddiddddddd|id:arcs_to_segments",
+        &canon, &x1, &y1, &cx, &cy, &rot, &z1, &a, &b, &c, &u, &v, &w, &max_segments,
+        &tolerance)) return NULL;
     if(!get_attr(canon, "lo", "ddddddddd:arcs_to_segments lo", &o[0], &o[1], &o[2],
                     &o[3], &o[4], &o[5], &o[6], &o[7], &o[8]))
         return NULL;
@@ -978,7 +983,18 @@ static PyObject *rs274_arc_to_segments(PyObject *self, PyObject *args) {
     if(rot < -1) theta2 += 2*M_PI*(rot+1);
     if(rot > 1) theta2 += 2*M_PI*(rot-1);
 
-    int steps = std::max(3, int(max_segments * fabs(theta1 - theta2) / M_PI));
+    int steps;
+    if(tolerance > 0) {
+        // choose the number of segments so that no chord strays more than
+        // 'tolerance' from the arc; max_segments is not used
+        double r = std::max(hypot(o[X]-cx, o[Y]-cy), hypot(n[X]-cx, n[Y]-cy));
+        double step = M_PI;
+        if(tolerance < r) step = 2 * acos(1 - tolerance / r);
+        if(step < MIN_ARC_STEP) step = MIN_ARC_STEP;
+        steps = std::max(3, int(ceil(fabs(theta1 - theta2) / step)));
+    } else {
+        steps = std::max(3, int(max_segments * fabs(theta1 - theta2) / M_PI));
+    }
     double rsteps = 1. / steps;
     PyObject *segs = PyList_New(steps);
 
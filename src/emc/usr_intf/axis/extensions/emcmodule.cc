@@ -78,10 +78,23 @@ struct pyIniFile {
     IniFile *i;
 };
 
+// The stat attributes that are built from arrays or structures; each is
+// built once and then cached until poll() finds that its data changed
+enum {
+    SF_ACTUAL, SF_AIN, SF_AOUT, SF_JOINT, SF_AXIS, SF_DIN, SF_DOUT,
+    SF_GCODES, SF_HOMED, SF_LIMIT, SF_MCODES, SF_G5X_OFFSET, SF_G5X_INDEX,
+    SF_G92_OFFSET, SF_POSITION, SF_DTG, SF_JOINT_POSITION, SF_JOINT_ACTUAL,
+    SF_PROBED, SF_SETTINGS, SF_TOOL_OFFSET, SF_TOOL_TABLE, SF_AXES,
+    STAT_FIELDS
+};
+
 struct pyStatChannel {
     PyObject_HEAD
     RCS_STAT_CHANNEL *c;
     EMC_STAT status;
+    char *previous;             // status before the last poll
+    int generation;             // number of polls
+    PyObject *cache[STAT_FIELDS];
 };
 
 struct pyCommandChannel {
@@ -264,12 +277,24 @@ static int Stat_init(pyStatChannel *self, PyObject *a, PyObject *k) {
         return -1;
     }
 
+    if(!self->previous) {
+        self->previous = (char*)calloc(1, sizeof(EMC_STAT));
+        if(!self->previous) {
+            delete c;
+            PyErr_NoMemory();
+            return -1;
+        }
+    }
+
     self->c = c;
     return 0;
 }
 
 static void Stat_dealloc(PyObject *self) {
-    delete ((pyStatChannel*)self)->c;
+    pyStatChannel *s = (pyStatChannel*)self;
+    delete s->c;
+    free(s->previous);
+    for(int i = 0; i < STAT_FIELDS; i++) Py_XDECREF(s->cache[i]);
     PyObject_Del(self);
 }
 
@@ -281,18 +306,28 @@ static bool check_stat(RCS_STAT_CHANNEL *emcStatusBuffer) {
     return true;
 }
 
+static void invalidate_fields(pyStatChannel *s);
+
 static PyObject *poll(pyStatChannel *s, PyObject *o) {
     if(!check_stat(s->c)) return NULL;
+    memcpy(s->previous, &s->status, sizeof(EMC_STAT));
     if(s->c->peek() == EMC_STAT_TYPE) {
         EMC_STAT *emcStatus = static_cast<EMC_STAT*>(s->c->get_address());
         memcpy(&s->status, emcStatus, sizeof(EMC_STAT));
+        invalidate_fields(s);
     }
+    s->generation++;
     Py_INCREF(Py_None);
     return Py_None;
 }
 
+static PyObject *Stat_changed(pyStatChannel *s, PyObject *o);
+
 static PyMethodDef Stat_methods[] = {
     {"poll", (PyCFunction)poll, METH_NOARGS, "Update current machine state"},
+    {"changed", (PyCFunction)Stat_changed, METH_NOARGS,
+        "Return the names of the attributes that may have changed in the last\n"
+        "poll().  An attribute that is not listed has the same value as before."},
     {NULL}
 };
 
@@ -393,6 +428,9 @@ static PyMemberDef Stat_members[] = {
     {(char*)"lube_level", T_INT, O(io.lube.level), READONLY},
 
     {(char*)"debug", T_INT, O(debug), READONLY},
+    {(char*)"generation", T_INT, offsetof(pyStatChannel, generation), READONLY,
+        (char*)"The number of calls to poll().  Comparing it with a saved value tells\n"
+        "whether the object was polled since."},
     {NULL}
 };
 
@@ -657,38 +695,170 @@ static PyObject *Stat_axes(pyStatChannel *s) {
 // XXX io.tool.toolTable
 // XXX EMC_JOINT_STAT motion.joint[]
 
+typedef PyObject *(*stat_builder)(pyStatChannel *);
+
+struct stat_field {
+    const char *name;
+    stat_builder build;
+    size_t offset, size;        // the part of EMC_STAT it is built from
+    bool dicts;                 // a tuple of dicts, copied for each use
+};
+
+#define SF(n, b, x) {n, b, offsetof(EMC_STAT, x), sizeof(((EMC_STAT*)0)->x), false}
+#define SFD(n, b, x) {n, b, offsetof(EMC_STAT, x), sizeof(((EMC_STAT*)0)->x), true}
+// in the order of the SF_ constants
+static stat_field Stat_fields[STAT_FIELDS] = {
+    SF("actual_position", Stat_actual, motion.traj.actualPosition),
+    SF("ain", Stat_ain, motion.analog_input),
+    SF("aout", Stat_aout, motion.analog_output),
+    SFD("joint", Stat_joint, motion.joint),
+    SFD("axis", Stat_axis, motion.axis),
+    SF("din", Stat_din, motion.synch_di),
+    SF("dout", Stat_dout, motion.synch_do),
+    SF("gcodes", Stat_activegcodes, task.activeGCodes),
+    SF("homed", Stat_homed, motion.joint),
+    SF("limit", Stat_limit, motion.joint),
+    SF("mcodes", Stat_activemcodes, task.activeMCodes),
+    SF("g5x_offset", Stat_g5x_offset, task.g5x_offset),
+    SF("g5x_index", Stat_g5x_index, task.g5x_index),
+    SF("g92_offset", Stat_g92_offset, task.g92_offset),
+    SF("position", Stat_position, motion.traj.position),
+    SF("dtg", Stat_dtg, motion.traj.dtg),
+    SF("joint_position", Stat_joint_position, motion.joint),
+    SF("joint_actual_position", Stat_joint_actual, motion.joint),
+    SF("probed_position", Stat_probed, motion.traj.probedPosition),
+    SF("settings", Stat_activesettings, task.activeSettings),
+    SF("tool_offset", Stat_tool_offset, task.toolOffset),
+    SF("tool_table", Stat_tool_table, io.tool.toolTable),
+    // not cached, so each use still gives the deprecation warning
+    SF("axes", NULL, motion.traj.deprecated_axes),
+};
+#undef SF
+#undef SFD
+
+static bool field_changed(pyStatChannel *s, stat_field *f) {
+    return memcmp((char*)&s->status + f->offset, s->previous + f->offset,
+        f->size) != 0;
+}
+
+static void invalidate_fields(pyStatChannel *s) {
+    for(int i = 0; i < STAT_FIELDS; i++) {
+        if(s->cache[i] && field_changed(s, &Stat_fields[i]))
+            Py_CLEAR(s->cache[i]);
+    }
+}
+
+static PyObject *copy_dicts(PyObject *t) {
+    Py_ssize_t n = PyTuple_GET_SIZE(t);
+    PyObject *res = PyTuple_New(n);
+    if(!res) return NULL;
+    for(Py_ssize_t i = 0; i < n; i++) {
+        PyObject *d = PyDict_Copy(PyTuple_GET_ITEM(t, i));
+        if(!d) {
+            Py_DECREF(res);
+            return NULL;
+        }
+        PyTuple_SET_ITEM(res, i, d);
+    }
+    return res;
+}
+
+// The cached object is handed out again until the data changes, so only
+// immutable ones are shared; the dicts of stat.joint and stat.axis are
+// copied, which is still much cheaper than building them
+static PyObject *Stat_cached(pyStatChannel *s, void *closure) {
+    stat_field *f = (stat_field*)closure;
+    PyObject *&o = s->cache[f - Stat_fields];
+    if(!o) {
+        o = f->build(s);
+        if(!o) return NULL;
+    }
+    if(f->dicts) return copy_dicts(o);
+    Py_INCREF(o);
+    return o;
+}
+
+static bool member_changed(pyStatChannel *s, PyMemberDef *m) {
+    char *now = (char*)s + m->offset;
+    char *then = s->previous + (m->offset - offsetof(pyStatChannel, status));
+    switch(m->type) {
+    case T_STRING_INPLACE:
+        return strcmp(now, then) != 0;
+    case T_DOUBLE:
+        return memcmp(now, then, sizeof(double)) != 0;
+    case T_BOOL:
+        return memcmp(now, then, sizeof(char)) != 0;
+    default:
+        return memcmp(now, then, sizeof(int)) != 0;
+    }
+}
+
+static PyObject *Stat_changed(pyStatChannel *s, PyObject *o) {
+    PyObject *res = PyList_New(0);
+    if(!res) return NULL;
+    Py_ssize_t first = offsetof(pyStatChannel, status);
+    for(PyMemberDef *m = Stat_members; m->name; m++) {
+        // e.g. generation, which is not part of the status
+        if(m->offset < first || m->offset >= first + (Py_ssize_t)sizeof(EMC_STAT))
+            continue;
+        if(!member_changed(s, m)) continue;
+        PyObject *name = PyString_FromString(m->name);
+        if(!name || PyList_Append(res, name) < 0) {
+            Py_XDECREF(name);
+            Py_DECREF(res);
+            return NULL;
+        }
+        Py_DECREF(name);
+    }
+    for(int i = 0; i < STAT_FIELDS; i++) {
+        if(!field_changed(s, &Stat_fields[i])) continue;
+        PyObject *name = PyString_FromString(Stat_fields[i].name);
+        if(!name || PyList_Append(res, name) < 0) {
+            Py_XDECREF(name);
+            Py_DECREF(res);
+            return NULL;
+        }
+        Py_DECREF(name);
+    }
+    PyObject *t = PyList_AsTuple(res);
+    Py_DECREF(res);
+    return t;
+}
+
+#define C(n) (getter)Stat_cached, (setter)NULL, NULL, &Stat_fields[n]
 static PyGetSetDef Stat_getsetlist[] = {
-    {(char*)"actual_position", (getter)Stat_actual},
-    {(char*)"ain", (getter)Stat_ain},
-    {(char*)"aout", (getter)Stat_aout},
-    {(char*)"joint", (getter)Stat_joint},
-    {(char*)"axis", (getter)Stat_axis},
-    {(char*)"din", (getter)Stat_din},
-    {(char*)"dout", (getter)Stat_dout},
-    {(char*)"gcodes", (getter)Stat_activegcodes},
-    {(char*)"homed", (getter)Stat_homed},
-    {(char*)"limit", (getter)Stat_limit},
-    {(char*)"mcodes", (getter)Stat_activemcodes},
-    {(char*)"g5x_offset", (getter)Stat_g5x_offset},
-    {(char*)"g5x_index", (getter)Stat_g5x_index},
-    {(char*)"g92_offset", (getter)Stat_g92_offset},
-    {(char*)"position", (getter)Stat_position},
-    {(char*)"dtg", (getter)Stat_dtg},
-    {(char*)"joint_position", (getter)Stat_joint_position},
-    {(char*)"joint_actual_position", (getter)Stat_joint_actual},
-    {(char*)"probed_position", (getter)Stat_probed},
-    {(char*)"settings", (getter)Stat_activesettings, (setter)NULL,
+    {(char*)"actual_position", C(SF_ACTUAL)},
+    {(char*)"ain", C(SF_AIN)},
+    {(char*)"aout", C(SF_AOUT)},
+    {(char*)"joint", C(SF_JOINT)},
+    {(char*)"axis", C(SF_AXIS)},
+    {(char*)"din", C(SF_DIN)},
+    {(char*)"dout", C(SF_DOUT)},
+    {(char*)"gcodes", C(SF_GCODES)},
+    {(char*)"homed", C(SF_HOMED)},
+    {(char*)"limit", C(SF_LIMIT)},
+    {(char*)"mcodes", C(SF_MCODES)},
+    {(char*)"g5x_offset", C(SF_G5X_OFFSET)},
+    {(char*)"g5x_index", C(SF_G5X_INDEX)},
+    {(char*)"g92_offset", C(SF_G92_OFFSET)},
+    {(char*)"position", C(SF_POSITION)},
+    {(char*)"dtg", C(SF_DTG)},
+    {(char*)"joint_position", C(SF_JOINT_POSITION)},
+    {(char*)"joint_actual_position", C(SF_JOINT_ACTUAL)},
+    {(char*)"probed_position", C(SF_PROBED)},
+    {(char*)"settings", (getter)Stat_cached, (setter)NULL,
         (char*)"This is an array containing the Interp active settings: sequence number,\n"
-        "feed rate, and spindle speed."
+        "feed rate, and spindle speed.", &Stat_fields[SF_SETTINGS]
     },
-    {(char*)"tool_offset", (getter)Stat_tool_offset},
-    {(char*)"tool_table", (getter)Stat_tool_table, (setter)NULL,
+    {(char*)"tool_offset", C(SF_TOOL_OFFSET)},
+    {(char*)"tool_table", (getter)Stat_cached, (setter)NULL,
         (char*)"The tooltable, expressed as a list of tools.  Each tool is a dict with the\n"
-        "tool id (tool number), diameter, offsets, etc."
+        "tool id (tool number), diameter, offsets, etc.", &Stat_fields[SF_TOOL_TABLE]
     },
     {(char*)"axes", (getter)Stat_axes},
     {NULL}
 };
+#undef C
 
 static PyTypeObject Stat_Type = {
     PyObject_HEAD_INIT(NULL)
@@ -1498,6 +1668,7 @@ static PyTypeObject Error_Type = {
     0,                      /*tp_is_gc*/
 };
 
+#define GL_GLEXT_PROTOTYPES
 #include <GL/gl.h>
 
 static void rotate_z(double pt[3], double a) {
@@ -1694,6 +1865,60 @@ static PyObject *pydraw_lines(PyObject *s, PyObject *o) {
     return Py_None;
 }
 
+static PyObject *pydraw_segments(PyObject *s, PyObject *o) {
+    PyObject *olineno, *ostart, *oend;
+    const void *vlineno, *vstart, *vend;
+    Py_ssize_t slineno, sstart, send;
+    int for_selection = 0;
+    int first = 1;
+    int nl = -1;
+    const double *pl = NULL;
+    char *geometry;
+
+    if(!PyArg_ParseTuple(o, "sOOO|i:draw_segments",
+                            &geometry, &olineno, &ostart, &oend, &for_selection))
+        return NULL;
+
+    if(PyObject_AsReadBuffer(olineno, &vlineno, &slineno) < 0
+            || PyObject_AsReadBuffer(ostart, &vstart, &sstart) < 0
+            || PyObject_AsReadBuffer(oend, &vend, &send) < 0)
+        return NULL;
+
+    Py_ssize_t count = slineno / sizeof(int);
+    if(sstart != count * 9 * (Py_ssize_t)sizeof(double)
+            || send != count * 9 * (Py_ssize_t)sizeof(double)) {
+        PyErr_SetString(PyExc_ValueError,
+            "draw_segments: start and end must hold 9 doubles per line number");
+        return NULL;
+    }
+
+    const int *lineno = (const int *)vlineno;
+    const double *start = (const double *)vstart;
+    const double *end = (const double *)vend;
+
+    for(Py_ssize_t i=0; i<count; i++) {
+        const double *p1 = start + 9*i, *p2 = end + 9*i;
+        int n = lineno[i];
+        if(first || memcmp(p1, pl, 9*sizeof(double))
+                || (for_selection && n != nl)) {
+            if(!first) glEnd();
+            if(for_selection && n != nl) {
+                glLoadName(n);
+                nl = n;
+            }
+            glBegin(GL_LINE_STRIP);
+            glvertex9(p1, geometry);
+            first = 0;
+        }
+        line9(p1, p2, geometry);
+        pl = p2;
+    }
+
+    if(!first) glEnd();
+
+    Py_RETURN_NONE;
+}
+
 static PyObject *pydraw_dwells(PyObject *s, PyObject *o) {
     PyListObject *li;
     int for_selection = 0, is_lathe = 0, i, n;
@@ -1782,14 +2007,32 @@ struct logger_point {
     struct color c2;
 };
 
+// The points are kept in levels.  New points go to level 0, which holds
+// the most recent part of the path at full resolution.  When a level is
+// full, its older half is thinned to every other point and moved to the
+// next level; the last level is thinned in place.  So the whole path is
+// kept, at a resolution that falls with age, in a fixed amount of memory.
+// Each level is drawn as one strip from its own buffer object, and only
+// the points changed since the last draw are uploaded.
 #define NUMCOLORS (6)
-#define MAX_POINTS (10000)
+#define LOGGER_LEVELS (4)
+#define DEFAULT_LOGGER_MEMORY (2 << 20)
+#define MIN_LEVEL_POINTS (16)
+
+struct logger_level {
+    struct logger_point *p;
+    int n, max;
+    int dirty;                  // points from here on are not uploaded
+    GLuint buffer;
+    int buffer_max;             // the size of the buffer, in points
+};
+
 typedef struct {
     PyObject_HEAD
-    int npts, mpts, lpts;
-    struct logger_point *p;
+    int npts, lpts;
+    struct logger_level level[LOGGER_LEVELS];
     struct color colors[NUMCOLORS];
-    bool exit, clear, changed;
+    bool exit, clear;
     char *geometry;
     int is_xyuv;
     double foam_z, foam_w;
@@ -1816,13 +2059,87 @@ static pthread_mutex_t mutex = PTHREAD_MUTEX_INITIALIZER;
 static void LOCK() { pthread_mutex_lock(&mutex); }
 static void UNLOCK() { pthread_mutex_unlock(&mutex); }
 
+// Allocate the levels for 'memory' bytes of points; the caller holds the
+// lock, or the logger is not running
+static bool logger_alloc(pyPositionLogger *s, long memory) {
+    long per_level = memory / (long)sizeof(struct logger_point) / LOGGER_LEVELS;
+    if(per_level < MIN_LEVEL_POINTS) per_level = MIN_LEVEL_POINTS;
+    if(per_level > INT_MAX / 2) per_level = INT_MAX / 2;
+    per_level &= ~1;
+    for(int i = 0; i < LOGGER_LEVELS; i++) {
+        struct logger_level &l = s->level[i];
+        struct logger_point *p = (struct logger_point*)realloc(l.p,
+                sizeof(struct logger_point) * per_level);
+        if(!p) return false;
+        l.p = p;
+        l.max = per_level;
+        l.n = l.dirty = 0;
+    }
+    s->npts = s->lpts = 0;
+    return true;
+}
+
+static int logger_count(pyPositionLogger *s) {
+    int n = 0;
+    for(int i = 0; i < LOGGER_LEVELS; i++) n += s->level[i].n;
+    return n;
+}
+
+// Thin n points into dst, keeping the first and last points, the points
+// where the color changes and every other point in between.  dst may be p
+static int logger_thin(struct logger_point *p, int n, struct logger_point *dst) {
+    int j = 0;
+    for(int i = 0; i < n; i++) {
+        bool keep = i == 0 || i == n-1 || i % 2 == 0
+            || p[i].c != p[i-1].c || p[i].c != p[i+1].c;
+        if(keep) dst[j++] = p[i];
+    }
+    return j;
+}
+
+static void logger_make_room(pyPositionLogger *s, int k, int need);
+
+// Move the older half of level k to level k+1, or thin the last level
+static void logger_shift(pyPositionLogger *s, int k, int need) {
+    struct logger_level &l = s->level[k];
+    if(k == LOGGER_LEVELS - 1) {
+        l.n = logger_thin(l.p, l.n, l.p);
+        if(l.max - l.n < need) {
+            // only color changes are left; drop the oldest points
+            int drop = need - (l.max - l.n);
+            l.n -= drop;
+            memmove(l.p, l.p + drop, sizeof(struct logger_point) * l.n);
+        }
+    } else {
+        // point h goes to both levels, so the strips join up; point 0
+        // is there already, unless the next level is empty
+        int h = l.n / 2;
+        struct logger_level &next = s->level[k+1];
+        logger_make_room(s, k+1, h + 1);
+        int first = next.n ? 1 : 0;
+        int m = logger_thin(l.p + first, h + 1 - first, next.p + next.n);
+        if(next.dirty > next.n) next.dirty = next.n;
+        next.n += m;
+        l.n -= h;
+        memmove(l.p, l.p + h, sizeof(struct logger_point) * l.n);
+        if(k == 0) s->lpts = s->lpts > h ? s->lpts - h : 0;
+    }
+    l.dirty = 0;
+}
+
+static void logger_make_room(pyPositionLogger *s, int k, int need) {
+    while(s->level[k].max - s->level[k].n < need)
+        logger_shift(s, k, need);
+}
+
 static int Logger_init(pyPositionLogger *self, PyObject *a, PyObject *k) {
     char *geometry;
     struct color *c = self->colors;
-    self->p = (logger_point*)malloc(0);
-    self->npts = self->mpts = 0;
+    if(!logger_alloc(self, DEFAULT_LOGGER_MEMORY)) {
+        PyErr_NoMemory();
+        return -1;
+    }
     self->exit = self->clear = 0;
-    self->changed = 1;
     self->st = 0;
     self->is_xyuv = 0;
     self->foam_z = 0;
@@ -1844,7 +2161,8 @@ static int Logger_init(pyPositionLogger *self, PyObject *a, PyObject *k) {
 }
 
 static void Logger_dealloc(pyPositionLogger *s) {
-    free(s->p);
+    // the buffer objects are left, as there may be no GL context now
+    for(int i = 0; i < LOGGER_LEVELS; i++) free(s->level[i].p);
     Py_XDECREF(s->st);
     free(s->geometry);
     PyObject_Del(s);
@@ -1859,6 +2177,17 @@ static PyObject *Logger_set_depth(pyPositionLogger *s, PyObject *o) {
     return Py_None;
 }
 
+static PyObject *Logger_set_memory(pyPositionLogger *s, PyObject *o) {
+    long memory;
+    if(!PyArg_ParseTuple(o, "l:logger.set_memory", &memory)) return NULL;
+    LOCK();
+    bool ok = logger_alloc(s, memory);
+    UNLOCK();
+    if(!ok) return PyErr_NoMemory();
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 static double dist2(double x1, double y1, double x2, double y2) {
     double dx = x2-x1;
     double dy = y2-y1;
@@ -1877,24 +2206,31 @@ static PyObject *Logger_start(pyPositionLogger *s, PyObject *o) {
 
     s->exit = 0;
     s->clear = 0;
-    s->npts = 0;
 
     Py_BEGIN_ALLOW_THREADS
+    LOCK();
+    for(int i = 0; i < LOGGER_LEVELS; i++) s->level[i].n = s->level[i].dirty = 0;
+    s->npts = 0;
+    UNLOCK();
     while(!s->exit) {
+        LOCK();
         if(s->clear) {
+            for(int i = 0; i < LOGGER_LEVELS; i++)
+                s->level[i].n = s->level[i].dirty = 0;
             s->npts = 0;
             s->lpts = 0;
             s->clear = 0;
         }
+        struct logger_level &l = s->level[0];
         if(s->st->c->valid() && s->st->c->peek() == EMC_STAT_TYPE) {
             EMC_STAT *status = static_cast<EMC_STAT*>(s->st->c->get_address());
             int colornum = 2;
             colornum = status->motion.traj.motion_type;
-            if(colornum < 0 || colornum > NUMCOLORS) colornum = 0;
+            if(colornum < 0 || colornum >= NUMCOLORS) colornum = 0;
             struct color c = s->colors[colornum];
-            struct logger_point *op = &s->p[s->npts-1];
-            struct logger_point *oop = &s->p[s->npts-2];
-            bool add_point = s->npts < 2 || c != op->c;
+            struct logger_point *op = &l.p[l.n-1];
+            struct logger_point *oop = &l.p[l.n-2];
+            bool add_point = l.n < 2 || c != op->c;
             double x, y, z, rx, ry, rz;
             if(s->is_xyuv) {
                 x = status->motion.traj.position.tran.x - status->task.toolOffset.tran.x,
@@ -1937,54 +2273,41 @@ static PyObject *Logger_start(pyPositionLogger *s, PyObject *o) {
                                 oop->x, oop->y, oop->z);
             }
             if(add_point) {
-                // 1 or 2 points may be added, make room whenever
-                // fewer than 2 are left
-                bool changed_color = s->npts && c != op->c;
-                if(s->npts+2 > s->mpts) {
-                    LOCK();
-                    if(s->mpts >= MAX_POINTS) {
-                        int adjust = MAX_POINTS / 10;
-                        if(adjust < 2) adjust = 2;
-                        s->npts -= adjust;
-                        memmove(s->p, s->p + adjust, 
-                                sizeof(struct logger_point) * s->npts);
-                    } else {
-                        s->mpts = 2 * s->mpts + 2;
-                        s->changed = 1;
-                        s->p = (struct logger_point*) realloc(s->p,
-                                    sizeof(struct logger_point) * s->mpts);
-                    }
-                    UNLOCK();
-                    op = &s->p[s->npts-1];
-                    oop = &s->p[s->npts-2];
-                }
+                // 1 or 2 points may be added
+                bool changed_color = l.n && c != op->c;
+                logger_make_room(s, 0, 2);
+                op = &l.p[l.n-1];
+                if(l.dirty > l.n) l.dirty = l.n;
                 if(changed_color) {
                     {
-                    struct logger_point &np = s->p[s->npts];
+                    struct logger_point &np = l.p[l.n];
                     np.x = op->x; np.y = op->y; np.z = op->z;
                     np.rx = rx; np.ry = ry; np.rz = rz;
                     np.c = np.c2 = c;
                     }
                     {
-                    struct logger_point &np = s->p[s->npts+1];
+                    struct logger_point &np = l.p[l.n+1];
                     np.x = x; np.y = y; np.z = z;
                     np.rx = rx; np.ry = ry; np.rz = rz;
                     np.c = np.c2 = c;
                     }
-                    s->npts += 2;
+                    l.n += 2;
                 } else {
-                    struct logger_point &np = s->p[s->npts];
+                    struct logger_point &np = l.p[l.n];
                     np.x = x; np.y = y; np.z = z;
                     np.rx = rx; np.ry = ry; np.rz = rz;
                     np.c = np.c2 = c;
-                    s->npts++;
+                    l.n++;
                 }
             } else {
-                struct logger_point &np = s->p[s->npts-1];
+                struct logger_point &np = l.p[l.n-1];
                 np.x = x; np.y = y; np.z = z;
                 np.rx = rx; np.ry = ry; np.rz = rz;
+                if(l.dirty > l.n-1) l.dirty = l.n-1;
             }
+            s->npts = logger_count(s);
         }
+        UNLOCK();
         nanosleep(&ts, NULL);
     }
     Py_END_ALLOW_THREADS
@@ -2008,49 +2331,93 @@ static PyObject* Logger_stop(pyPositionLogger *s, PyObject *o) {
 static PyObject* Logger_call(pyPositionLogger *s, PyObject *o) {
     if(!s->clear) {
         LOCK();
-        if(s->is_xyuv) {
-            if(s->changed) {
-                glVertexPointer(3, GL_FLOAT,
-                        sizeof(struct logger_point)/2, &s->p->x);
-                glColorPointer(4, GL_UNSIGNED_BYTE,
-                        sizeof(struct logger_point)/2, &s->p->c);
-                glEnableClientState(GL_COLOR_ARRAY);
-                glEnableClientState(GL_VERTEX_ARRAY);
-                s->changed = 0;
+        int stride = sizeof(struct logger_point);
+        if(s->is_xyuv) stride /= 2;
+        glEnableClientState(GL_COLOR_ARRAY);
+        glEnableClientState(GL_VERTEX_ARRAY);
+        // oldest first
+        for(int i = LOGGER_LEVELS - 1; i >= 0; i--) {
+            struct logger_level &l = s->level[i];
+            if(!l.buffer) glGenBuffers(1, &l.buffer);
+            glBindBuffer(GL_ARRAY_BUFFER, l.buffer);
+            if(l.buffer_max != l.max) {
+                glBufferData(GL_ARRAY_BUFFER,
+                    sizeof(struct logger_point) * l.max, NULL, GL_DYNAMIC_DRAW);
+                l.buffer_max = l.max;
+                l.dirty = 0;
             }
-            s->lpts = s->npts;
-            glDrawArrays(GL_LINES, 0, 2*s->npts);
-        } else {
-            if(s->changed) {
-                glVertexPointer(3, GL_FLOAT,
-                        sizeof(struct logger_point), &s->p->x);
-                glColorPointer(4, GL_UNSIGNED_BYTE,
-                        sizeof(struct logger_point), &s->p->c);
-                glEnableClientState(GL_COLOR_ARRAY);
-                glEnableClientState(GL_VERTEX_ARRAY);
-                s->changed = 0;
+            if(l.dirty < l.n) {
+                glBufferSubData(GL_ARRAY_BUFFER,
+                    sizeof(struct logger_point) * l.dirty,
+                    sizeof(struct logger_point) * (l.n - l.dirty),
+                    l.p + l.dirty);
+                l.dirty = l.n;
             }
-            s->lpts = s->npts;
-            glDrawArrays(GL_LINE_STRIP, 0, s->npts);
+            if(!l.n) continue;
+            glVertexPointer(3, GL_FLOAT, stride,
+                (void*)offsetof(struct logger_point, x));
+            glColorPointer(4, GL_UNSIGNED_BYTE, stride,
+                (void*)offsetof(struct logger_point, c));
+            if(s->is_xyuv)
+                glDrawArrays(GL_LINES, 0, 2*l.n);
+            else
+                glDrawArrays(GL_LINE_STRIP, 0, l.n);
         }
+        glBindBuffer(GL_ARRAY_BUFFER, 0);
+        glDisableClientState(GL_COLOR_ARRAY);
+        glDisableClientState(GL_VERTEX_ARRAY);
+        s->lpts = s->level[0].n;
         UNLOCK();
     }
     Py_INCREF(Py_None);
     return Py_None;
 }
 
+static PyObject *Logger_points(pyPositionLogger *s, PyObject *o) {
+    PyObject *result = PyList_New(0);
+    if(!result) return NULL;
+    LOCK();
+    bool joined = false;
+    for(int i = LOGGER_LEVELS - 1; i >= 0; i--) {
+        struct logger_level &l = s->level[i];
+        // the first point of a level repeats the last of the level before
+        for(int j = joined ? 1 : 0; j < l.n; j++) {
+            struct logger_point &p = l.p[j];
+            int type = -1;
+            for(int k = 0; k < NUMCOLORS; k++) {
+                if(p.c == s->colors[k]) { type = k; break; }
+            }
+            // no motion type to give it; the logger only stores colors from
+            // the table, so this is not expected to happen
+            if(type < 0) continue;
+            PyObject *t = Py_BuildValue("(ffffffi)",
+                p.x, p.y, p.z, p.rx, p.ry, p.rz, type);
+            if(!t || PyList_Append(result, t) < 0) {
+                Py_XDECREF(t);
+                Py_DECREF(result);
+                UNLOCK();
+                return NULL;
+            }
+            Py_DECREF(t);
+        }
+        if(l.n) joined = true;
+    }
+    UNLOCK();
+    return result;
+}
+
 static PyObject *Logger_last(pyPositionLogger *s, PyObject *o) {
     int flag=1;
     if(!PyArg_ParseTuple(o, "|i:emc.positionlogger.last", &flag)) return NULL;
     PyObject *result = NULL;
     LOCK();
-    int idx = flag ? s->lpts : s->npts;
+    int idx = flag ? s->lpts : s->level[0].n;
     if(!idx) {
         Py_INCREF(Py_None);
         result = Py_None;
     } else {
         result = PyTuple_New(6);
-        struct logger_point &p = s->p[idx-1];
+        struct logger_point &p = s->level[0].p[idx-1];
         PyTuple_SET_ITEM(result, 0, PyFloat_FromDouble(p.x));
         PyTuple_SET_ITEM(result, 1, PyFloat_FromDouble(p.y));
         PyTuple_SET_ITEM(result, 2, PyFloat_FromDouble(p.z));
@@ -2078,6 +2445,12 @@ static PyMethodDef Logger_methods[] = {
         "Plot the backplot now"},
     {"set_depth", (PyCFunction)Logger_set_depth, METH_VARARGS,
         "set the Z and W depths for foam cutter"},
+    {"set_memory", (PyCFunction)Logger_set_memory, METH_VARARGS,
+        "Keep the plot in ARG bytes, and clear it"},
+    {"points", (PyCFunction)Logger_points, METH_NOARGS,
+        "Return the plot as a list of (x, y, z, rx, ry, rz, motion type)\n"
+        "tuples, oldest first.  The motion type is the index of the color of\n"
+        "the point; points with a color that is not in the table are left out"},
     {"last", (PyCFunction)Logger_last, METH_VARARGS,
         "Return the most recent point on the plot or None"},
     {NULL, NULL, 0, NULL},
@@ -2131,6 +2504,7 @@ static PyTypeObject PositionLoggerType = {
 static PyMethodDef emc_methods[] = {
 #define METH(name, doc) { #name, (PyCFunction) py##name, METH_VARARGS, doc }
 METH(draw_lines, "Draw a bunch of lines in the 'rs274.glcanon' format"),
+METH(draw_segments, "Draw lines from the line number, start and end columns of an 'rs274.segments' store"),
 METH(draw_dwells, "Draw a bunch of dwell positions in the 'rs274.glcanon' format"),
 METH(line9, "Draw a single line in the 'rs274.glcanon' format; assumes glBegin(GL_LINES)"),
 METH(vertex9, "Get the 3d location for a 9d point"),
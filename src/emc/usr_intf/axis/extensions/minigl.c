@@ -173,6 +173,41 @@ GLCALL2V(glDeleteLists, "ii", int, int)
 GLCALL2V(glBlendFunc, "ii", int, int)
 GLCALL0V(glFlush)
 GLCALL2V(glPixelStorei, "ii", int, int)
+GLCALL2V(glBindBuffer, "ii", int, int)
+GLCALL1V(glEnableClientState, "i", int)
+GLCALL1V(glDisableClientState, "i", int)
+GLCALL2V(glBindFramebuffer, "ii", int, int)
+GLCALL2V(glBindRenderbuffer, "ii", int, int)
+GLCALL4V(glRenderbufferStorage, "iiii", int, int, int, int)
+GLCALL4V(glFramebufferRenderbuffer, "iiii", int, int, int, int)
+
+static PyObject *pyglBlitFramebuffer(PyObject *s, PyObject *o) {
+    int sx0, sy0, sx1, sy1, dx0, dy0, dx1, dy1, mask, filter;
+    if(!PyArg_ParseTuple(o, "iiiiiiiiii:glBlitFramebuffer",
+                &sx0, &sy0, &sx1, &sy1, &dx0, &dy0, &dx1, &dy1,
+                &mask, &filter))
+        return NULL;
+    glBlitFramebuffer(sx0, sy0, sx1, sy1, dx0, dy0, dx1, dy1, mask, filter);
+    CHECK_ERROR;
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject *pyglCheckFramebufferStatus(PyObject *s, PyObject *o) {
+    int target;
+    if(!PyArg_ParseTuple(o, "i:glCheckFramebufferStatus", &target))
+        return NULL;
+    return PyInt_FromLong(glCheckFramebufferStatus(target));
+}
+
+static PyObject *pyglGetString(PyObject *s, PyObject *o) {
+    int name;
+    const GLubyte *r;
+    if(!PyArg_ParseTuple(o, "i:glGetString", &name)) return NULL;
+    r = glGetString(name);
+    CHECK_ERROR;
+    return PyString_FromString(r ? (const char *)r : "");
+}
 
 static PyObject *pyglBitmap(PyObject *s, PyObject *o) {
     int width, height, nbitmap;
@@ -207,6 +242,133 @@ static PyObject *pyglGenLists(PyObject *s, PyObject *o) {
     return PyInt_FromLong(glGenLists(range));
 }
 
+static PyObject *pyglGenBuffers(PyObject *s, PyObject *o) {
+    int n, i;
+    GLuint *buffers;
+    PyObject *r;
+    if(!PyArg_ParseTuple(o, "i:glGenBuffers", &n)) return NULL;
+    if(n < 0) {
+        PyErr_SetString(PyExc_ValueError, "glGenBuffers: negative count");
+        return NULL;
+    }
+    buffers = malloc(sizeof(GLuint) * (n ? n : 1));
+    if(!buffers) return PyErr_NoMemory();
+    glGenBuffers(n, buffers);
+    r = PyList_New(n);
+    for(i=0; i<n; i++) {
+        PyList_SetItem(r, i, PyInt_FromLong(buffers[i]));
+    }
+    free(buffers);
+    return r;
+}
+
+static PyObject *pyglDeleteBuffers(PyObject *s, PyObject *o) {
+    PyObject *seq;
+    GLuint *buffers;
+    int n, i;
+    if(!PyArg_ParseTuple(o, "O:glDeleteBuffers", &seq)) return NULL;
+    seq = PySequence_Fast(seq, "glDeleteBuffers: expected a sequence");
+    if(!seq) return NULL;
+    n = PySequence_Fast_GET_SIZE(seq);
+    buffers = malloc(sizeof(GLuint) * (n ? n : 1));
+    if(!buffers) { Py_DECREF(seq); return PyErr_NoMemory(); }
+    for(i=0; i<n; i++) {
+        buffers[i] = PyInt_AsLong(PySequence_Fast_GET_ITEM(seq, i));
+    }
+    Py_DECREF(seq);
+    if(PyErr_Occurred()) { free(buffers); return NULL; }
+    glDeleteBuffers(n, buffers);
+    free(buffers);
+    CHECK_ERROR;
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+#define GLGENDELETE(gen, delete) \
+static PyObject *py##gen(PyObject *s, PyObject *o) { \
+    int n, i; \
+    GLuint *names; \
+    PyObject *r; \
+    if(!PyArg_ParseTuple(o, "i:" #gen, &n)) return NULL; \
+    if(n < 0) { \
+        PyErr_SetString(PyExc_ValueError, #gen ": negative count"); \
+        return NULL; \
+    } \
+    names = malloc(sizeof(GLuint) * (n ? n : 1)); \
+    if(!names) return PyErr_NoMemory(); \
+    gen(n, names); \
+    r = PyList_New(n); \
+    for(i=0; i<n; i++) { \
+        PyList_SetItem(r, i, PyInt_FromLong(names[i])); \
+    } \
+    free(names); \
+    return r; \
+} \
+static PyObject *py##delete(PyObject *s, PyObject *o) { \
+    PyObject *seq; \
+    GLuint *names; \
+    int n, i; \
+    if(!PyArg_ParseTuple(o, "O:" #delete, &seq)) return NULL; \
+    seq = PySequence_Fast(seq, #delete ": expected a sequence"); \
+    if(!seq) return NULL; \
+    n = PySequence_Fast_GET_SIZE(seq); \
+    names = malloc(sizeof(GLuint) * (n ? n : 1)); \
+    if(!names) { Py_DECREF(seq); return PyErr_NoMemory(); } \
+    for(i=0; i<n; i++) { \
+        names[i] = PyInt_AsLong(PySequence_Fast_GET_ITEM(seq, i)); \
+    } \
+    Py_DECREF(seq); \
+    if(PyErr_Occurred()) { free(names); return NULL; } \
+    delete(n, names); \
+    free(names); \
+    CHECK_ERROR; \
+    Py_INCREF(Py_None); \
+    return Py_None; \
+}
+
+GLGENDELETE(glGenFramebuffers, glDeleteFramebuffers)
+GLGENDELETE(glGenRenderbuffers, glDeleteRenderbuffers)
+
+static PyObject *pyglBufferData(PyObject *s, PyObject *o) {
+    int target, usage;
+    PyObject *data;
+    const void *buf;
+    Py_ssize_t sz;
+    if(!PyArg_ParseTuple(o, "iOi:glBufferData", &target, &data, &usage))
+        return NULL;
+    if(PyObject_AsReadBuffer(data, &buf, &sz) < 0) return NULL;
+    glBufferData(target, sz, buf, usage);
+    CHECK_ERROR;
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/* With a buffer object bound to GL_ARRAY_BUFFER, the last argument of
+ * glVertexPointer and glColorPointer is a byte offset into the buffer */
+static PyObject *pyglVertexPointer(PyObject *s, PyObject *o) {
+    int size, type, stride;
+    long offset;
+    if(!PyArg_ParseTuple(o, "iiil:glVertexPointer",
+                &size, &type, &stride, &offset))
+        return NULL;
+    glVertexPointer(size, type, stride, (const GLvoid *)offset);
+    CHECK_ERROR;
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+static PyObject *pyglColorPointer(PyObject *s, PyObject *o) {
+    int size, type, stride;
+    long offset;
+    if(!PyArg_ParseTuple(o, "iiil:glColorPointer",
+                &size, &type, &stride, &offset))
+        return NULL;
+    glColorPointer(size, type, stride, (const GLvoid *)offset);
+    CHECK_ERROR;
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 static PyObject *pyglGetDoublev(PyObject *s, PyObject *o) {
     int what;
     if(!PyArg_ParseTuple(o, "i:glGetDoublev", &what)) return NULL;
@@ -233,7 +395,8 @@ static PyObject *pyglGetIntegerv(PyObject *s, PyObject *o) {
     int what;
     if(!PyArg_ParseTuple(o, "i:glGetIntegerv", &what)) return NULL;
     switch(what) {
-        case GL_LIST_INDEX: {
+        case GL_LIST_INDEX:
+        case GL_DRAW_FRAMEBUFFER_BINDING: {
             int r;
             glGetIntegerv(what, &r);
             return PyInt_FromLong(r);
@@ -758,6 +921,31 @@ METH(glMultMatrixd, "multiply the current matrix with the specified matrix"),
 
 METH(glPixelStorei, "set pixel storage modes"),
 
+METH(glGenBuffers, "generate buffer object names"),
+METH(glDeleteBuffers, "delete named buffer objects"),
+METH(glBindBuffer, "bind a named buffer object"),
+METH(glBufferData, "creates and initializes a buffer object's data store"),
+METH(glVertexPointer, "define an array of vertex data"),
+METH(glColorPointer, "define an array of colors"),
+METH(glEnableClientState, "enable or disable client-side capability"),
+METH(glDisableClientState, "enable or disable client-side capability"),
+
+METH(glGenFramebuffers, "generate framebuffer object names"),
+METH(glDeleteFramebuffers, "delete framebuffer objects"),
+METH(glBindFramebuffer, "bind a framebuffer to a framebuffer target"),
+METH(glGenRenderbuffers, "generate renderbuffer object names"),
+METH(glDeleteRenderbuffers, "delete renderbuffer objects"),
+METH(glBindRenderbuffer, "bind a renderbuffer to a renderbuffer target"),
+METH(glRenderbufferStorage,
+    "establish data storage, format and dimensions of a renderbuffer"),
+METH(glFramebufferRenderbuffer,
+    "attach a renderbuffer as a logical buffer of a framebuffer"),
+METH(glCheckFramebufferStatus,
+    "check the completeness status of a framebuffer"),
+METH(glBlitFramebuffer,
+    "copy a block of pixels from the read framebuffer to the draw framebuffer"),
+METH(glGetString, "return a string describing the current GL connection"),
+
 METH(glSelectBuffer, "establish a buffer for selection mode values"),
 METH(glFeedbackBuffer, "establish a buffer for feedback mode values"),
 // METH(glVertex3fv, ""),
@@ -808,6 +996,26 @@ void initminigl(void) {
     CONST(GL_LINES);
     CONST(GL_LINE_LOOP);
     CONST(GL_LINE_STIPPLE);
+    CONST(GL_ARRAY_BUFFER);
+    CONST(GL_STATIC_DRAW);
+    CONST(GL_VERTEX_ARRAY);
+    CONST(GL_COLOR_ARRAY);
+    CONST(GL_FRAMEBUFFER);
+    CONST(GL_READ_FRAMEBUFFER);
+    CONST(GL_DRAW_FRAMEBUFFER);
+    CONST(GL_DRAW_FRAMEBUFFER_BINDING);
+    CONST(GL_FRAMEBUFFER_COMPLETE);
+    CONST(GL_RENDERBUFFER);
+    CONST(GL_RGBA8);
+    CONST(GL_DEPTH_COMPONENT24);
+    CONST(GL_DEPTH24_STENCIL8);
+    CONST(GL_COLOR_ATTACHMENT0);
+    CONST(GL_DEPTH_ATTACHMENT);
+    CONST(GL_DEPTH_STENCIL_ATTACHMENT);
+    CONST(GL_NEAREST);
+    CONST(GL_VERSION);
+    CONST(GL_EXTENSIONS);
+    CONST(GL_FLOAT);
     CONST(GL_LINE_STRIP);
     CONST(GL_MODELVIEW);
     CONST(GL_MODELVIEW_MATRIX);
@@ -35,6 +35,7 @@ gettext.install("linuxcnc", localedir=os.path.join(BASE, "share", "locale"), uni
 
 import array, time, atexit, tempfile, shutil, errno, thread, select, re, getopt
 import traceback
+import numpy
 
 # Print Tk errors to stdout. python.org/sf/639266
 import Tkinter 
@@ -60,9 +61,14 @@ sys.setdlopenflags(old_flags)
 from rs274.OpenGLTk import *
 from rs274.interpret import StatMixin
 from rs274.glcanon import GLCanon, GlCanonDraw
+from rs274.segments import dist_xyz
+from rs274 import cycletime
+from stattrack import StatTracker
+from progtext import ProgramText
 from hershey import Hershey
 from propertywindow import properties
 import rs274.options
+import rs274.parseworker
 import nf
 import locale
 import bwidget
@@ -387,14 +393,8 @@ class MyOpengl(GlCanonDraw, Opengl):
         self.bind('<Button1-Motion>', self.select_cancel, add=True)
         self.highlight_line = None
         self.select_event = None
-        self.select_buffer_size = 100
         self.select_primed = None
-        self.last_position = None
-        self.last_homed = None
         self.last_origin = None
-        self.last_rotation_xy = None
-        self.last_tool = None
-        self.last_tool_offset = None
         self.last_limits = None
         self.set_eyepoint(5.)
         self.get_resources()
@@ -464,14 +464,13 @@ class MyOpengl(GlCanonDraw, Opengl):
 
     def set_current_line(self, line):
         if line == vars.running_line.get(): return
-        t.tag_remove("executing", "0.0", "end")
         if line is not None and line > 0:
             vupdate(vars.running_line, line)
             if vars.highlight_line.get() <= 0:
-                t.see("%d.0" % (line+2))
-                t.see("%d.0" % line)
-            t.tag_add("executing", "%d.0" % line, "%d.end" % line)
+                listing.see(line)
+            listing.mark("executing", line)
         else:
+            listing.mark("executing", None)
             vupdate(vars.running_line, 0)
 
     def get_highlight_line(self):
@@ -480,15 +479,39 @@ class MyOpengl(GlCanonDraw, Opengl):
     def set_highlight_line(self, line):
         if line == self.get_highlight_line(): return
         GlCanonDraw.set_highlight_line(self, line)
-        t.tag_remove("sel", "0.0", "end")
         if line is not None and line > 0:
-            t.see("%d.0" % (line+2))
-            t.see("%d.0" % line)
-            t.tag_add("sel", "%d.0" % line, "%d.end" % line)
+            listing.see(line)
+            listing.mark("sel", line)
             vupdate(vars.highlight_line, line)
         else:
+            listing.mark("sel", None)
             vupdate(vars.highlight_line, -1)
 
+    def preview_chunk_ready(self):
+        self.tkRedraw()
+        root_window.update()
+
+    def arc_lod_changed(self):
+        root_window.after_idle(reload_file, False)
+
+    def parse_preview(self, f, canon, *args):
+        if not parse_worker:
+            return GlCanonDraw.parse_preview(self, f, canon, *args)
+        def make_canon():
+            worker = WorkerCanon(self, None, canon.linecount, None,
+                canon.arcdivision)
+            worker.tools = list(canon.tools)
+            worker.parameter_file = canon.parameter_file
+            worker.arc_tolerance = canon.arc_tolerance
+            return worker
+        chunk = None
+        if self.progressive_preview:
+            self.start_preview_chunks(canon)
+            chunk = self.add_preview_chunk
+        return rs274.parseworker.parse(f, canon, args, make_canon,
+            root_window.update, update_ms / 1000., chunk,
+            lambda message: notifications.add("info", message))
+
     def tkRedraw(self, *dummy):
         if self.after_id:
             # May need to upgrade to an instant redraw
@@ -631,9 +654,161 @@ def toggle_perspective(e):
     o.perspective = not o.perspective
     o.tkRedraw()
 
+class ProgramListing:
+    """The program text in the text widget.  Only a window of lines around
+    the ones in view is in the widget, so loading and scrolling take the
+    same time for any size of program; the scrollbar covers the whole
+    program.  Lines are given as program line numbers."""
+    window = 500
+
+    def __init__(self, text, scrollbar):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.program = None
+        self.first = 1
+        self.count = 0
+        self.marks = {}
+        self.ignored = 0
+        text.configure(yscrollcommand=self.yscroll)
+        scrollbar.configure(command=self.yview)
+
+    def __len__(self):
+        if self.program is None: return 0
+        return len(self.program)
+
+    def load(self, filename):
+        self.clear()
+        self.program = ProgramText(filename)
+        self.fill(1)
+
+    def clear(self):
+        if self.program is not None:
+            self.program.close()
+            self.program = None
+        self.marks.clear()
+        self.fill(1)
+
+    def fill(self, line):
+        """Put the lines around 'line' in the widget"""
+        first = max(1, min(line - self.window / 2, len(self) - self.window + 1))
+        lines = []
+        if self.program is not None:
+            lines = self.program[first-1:first-1+self.window]
+        code = []
+        for i, l in enumerate(lines):
+            code.extend(["%6d: " % (first+i), "lineno",
+                l.expandtabs().replace("\r", ""), ""])
+        t = self.text
+        t.configure(state="normal")
+        t.tk.call("delete_all", t)
+        if code:
+            t.insert("end", *code)
+        t.configure(state="disabled")
+        self.first = first
+        self.count = len(lines)
+        for tag, line in self.marks.items():
+            self.tag_line(tag, line)
+        self.tag_ignored()
+
+    def in_window(self, line):
+        return self.first <= line < self.first + self.count
+
+    def index(self, line):
+        return "%d.0" % (line - self.first + 1)
+
+    def ensure(self, line, span=1):
+        """Make sure lines line .. line+span-1 are in the widget"""
+        n = len(self)
+        if not n: return
+        line = max(1, min(line, n))
+        if not (self.in_window(line) and self.in_window(min(line+span-1, n))):
+            self.fill(line)
+
+    def see(self, line):
+        self.ensure(line, 3)
+        self.text.see(self.index(line+2))
+        self.text.see(self.index(line))
+
+    def top(self):
+        """The first line in view"""
+        return self.first + int(self.text.index("@0,0").split(".")[0]) - 1
+
+    def visible(self):
+        """The number of lines in view"""
+        t = self.text
+        bottom = t.index("@0,%d" % t.winfo_height())
+        return max(1, int(bottom.split(".")[0])
+            - int(t.index("@0,0").split(".")[0]) + 1)
+
+    def line_at(self, x, y):
+        return self.first + int(self.text.index("@%d,%d" % (x, y))
+            .split(".")[0]) - 1
+
+    def get(self, line):
+        """The text of program line 'line'"""
+        if not 1 <= line <= len(self): return ""
+        return self.program.line(line).expandtabs().replace("\r", "")
+
+    def mark(self, tag, line):
+        """Show 'tag' on program line 'line', or on no line if None"""
+        self.text.tag_remove(tag, "0.0", "end")
+        if line is None:
+            self.marks.pop(tag, None)
+        else:
+            self.marks[tag] = line
+            self.tag_line(tag, line)
+
+    def tag_line(self, tag, line):
+        if self.in_window(line):
+            i = line - self.first + 1
+            self.text.tag_add(tag, "%d.0" % i, "%d.end" % i)
+
+    def set_ignored(self, lineno):
+        """Grey out the lines before 'lineno'"""
+        self.ignored = lineno
+        self.text.tag_remove("ignored", "0.0", "end")
+        self.tag_ignored()
+
+    def tag_ignored(self):
+        last = min(self.ignored - 1, self.first + self.count - 1)
+        if last >= self.first:
+            self.text.tag_add("ignored", "1.0",
+                "%d.end" % (last - self.first + 1))
+
+    def scroll_to(self, line):
+        visible = self.visible()
+        line = max(1, min(line, len(self) - visible + 1))
+        self.ensure(line, visible)
+        self.text.yview(self.index(line))
+
+    def scroll(self, units):
+        self.yview("scroll", units, "units")
+
+    def yview(self, *args):
+        """The scrollbar command"""
+        if not len(self):
+            self.text.yview(*args)
+        elif args[0] == "moveto":
+            self.scroll_to(1 + int(float(args[1]) * len(self)))
+        else:
+            amount = int(args[1])
+            if args[2].startswith("page"):
+                amount *= max(1, self.visible() - 1)
+            self.scroll_to(self.top() + amount)
+
+    def yscroll(self, lo, hi):
+        """The text's yscrollcommand: scale the view of the window to the
+        whole program"""
+        n = len(self)
+        if not n or not self.count:
+            self.scrollbar.set(lo, hi)
+            return
+        start = self.first - 1
+        self.scrollbar.set((start + float(lo) * self.count) / n,
+            (start + float(hi) * self.count) / n)
+
 def select_line(event):
-    i = t.index("@%d,%d" % (event.x, event.y))
-    i = int(i.split('.')[0])
+    i = listing.line_at(event.x, event.y)
     o.set_highlight_line(i)
     o.tkRedraw()
     return "break"
@@ -655,10 +830,10 @@ def select_next(event):
     o.tkRedraw()
 
 def scroll_up(event):
-    t.yview_scroll(-2, "units")
+    listing.scroll(-2)
 
 def scroll_down(event):
-    t.yview_scroll(2, "units")
+    listing.scroll(2)
 
 current_tool = None
 
@@ -670,6 +845,28 @@ def vupdate(var, val):
     var.set(val)
 
 class LivePlotter:
+    # stat fields that the widgets updated by update() depend on
+    tracked_fields = (
+        'exec_state', 'interp_state', 'queued_mdi_commands', 'task_mode',
+        'task_state', 'task_paused', 'file', 'paused', 'mist', 'flood',
+        'spindle_brake', 'spindle_direction', 'motion_mode', 'optional_stop',
+        'block_delete', 'spindlerate', 'feedrate', 'rapidrate',
+        'max_velocity', 'limit', 'tool_in_spindle', 'tool_offset', 'gcodes',
+        'mcodes', 'settings', 'actual_position', 'joint_actual_position',
+        'homed', 'g5x_offset', 'g92_offset', 'g5x_index', 'rotation_xy',
+        ('tool', lambda s: s.tool_table[0]),
+        ('override_limits', lambda s: s.joint[0]['override_limits']),
+    )
+    # a change in any of these redraws the preview
+    redraw_fields = (
+        'actual_position', 'joint_actual_position', 'homed', 'g5x_offset',
+        'g92_offset', 'g5x_index', 'rotation_xy', 'limit', 'tool_offset',
+        'tool', 'motion_mode',
+    )
+    # All the widgets are updated this often, in seconds, in case one was
+    # changed other than from the stat fields
+    resync_interval = 1.
+
     def __init__(self, window):
         self.win = window
         window.live_plot_size = 0
@@ -679,9 +876,6 @@ class LivePlotter:
         self.running.set(False)
         self.lastpts = -1
         self.last_speed = -1
-        self.last_limit = None
-        self.last_motion_mode = None
-        self.last_joint_position = None
         self.notifications_clear = False
         self.notifications_clear_info = False
         self.notifications_clear_error = False
@@ -695,7 +889,8 @@ class LivePlotter:
         except linuxcnc.error:
             return False
         self.last_task_mode = self.stat.task_mode
-        self.last_motion_mode  = self.stat.motion_mode
+        self.tracker = StatTracker(self.stat, self.tracked_fields)
+        self.next_resync = 0
         def C(s):
             a = o.colors[s + "_alpha"]
             s = o.colors[s]
@@ -710,6 +905,8 @@ class LivePlotter:
             C('backplotprobing'),
             geometry, foam
         )
+        if o.live_plot_memory:
+            self.logger.set_memory(o.live_plot_memory)
         o.after_idle(lambda: thread.start_new_thread(self.logger.start, (.01,)))
 
         global feedrate_blackout, rapidrate_blackout, spindlerate_blackout, maxvel_blackout
@@ -780,47 +977,34 @@ class LivePlotter:
 
         self.win.set_current_line(self.stat.id or self.stat.motion_line)
 
+        # 'changed' decides what to redraw, and 'show' which widgets to
+        # update
+        changed = show = self.tracker.changes()
+        now = time.time()
+        if now >= self.next_resync:
+            show = dict(self.tracker.values)
+            self.next_resync = now + self.resync_interval
+
         speed = self.stat.current_vel
 
         limits = soft_limits()
 
-        if (   self.stat.tool_offset   != o.last_tool_offset
-            or self.stat.tool_table[0] != o.last_tool):
+        if 'tool_offset' in changed or 'tool' in changed:
             o.redraw_dro()
-        if (self.logger.npts != self.lastpts
+        if (any(name in changed for name in self.redraw_fields)
+                or self.logger.npts != self.lastpts
                 or limits != o.last_limits
-                or self.stat.actual_position != o.last_position
-                or self.stat.joint_actual_position != o.last_joint_position
-                or self.stat.homed != o.last_homed
-                or self.stat.g5x_offset != o.last_g5x_offset
-                or self.stat.g92_offset != o.last_g92_offset
-                or self.stat.g5x_index != o.last_g5x_index
-                or self.stat.rotation_xy != o.last_rotation_xy
-                or self.stat.limit != o.last_limit
-                or self.stat.tool_offset != o.last_tool_offset
-                or self.stat.tool_table[0] != o.last_tool
-                or self.stat.motion_mode != self.last_motion_mode
                 or abs(speed - self.last_speed) > .01):
             o.redraw_soon()
             o.last_limits = limits
-            o.last_limit = self.stat.limit
-            o.last_homed = self.stat.homed
-            o.last_position = self.stat.actual_position
-            o.last_g5x_offset = self.stat.g5x_offset
-            o.last_g92_offset = self.stat.g92_offset
-            o.last_g5x_index = self.stat.g5x_index
-            o.last_rotation_xy = self.stat.rotation_xy
-            self.last_motion_mode = self.stat.motion_mode
-            o.last_tool = self.stat.tool_table[0]
-            o.last_tool_offset = self.stat.tool_offset
-            o.last_joint_position = self.stat.joint_actual_position
             self.last_speed = speed
             self.lastpts = self.logger.npts
 
         root_window.update_idletasks()
-        vupdate(vars.exec_state, self.stat.exec_state)
-        vupdate(vars.interp_state, self.stat.interp_state)
-        vupdate(vars.queued_mdi_commands, self.stat.queued_mdi_commands)
+        for var, name in ((vars.exec_state, 'exec_state'),
+                (vars.interp_state, 'interp_state'),
+                (vars.queued_mdi_commands, 'queued_mdi_commands')):
+            if name in show: vupdate(var, show[name])
         if hal_present == 1 :
             notifications_clear = comp["notifications-clear"]
             if self.notifications_clear != notifications_clear:
@@ -845,70 +1029,88 @@ class LivePlotter:
                      root_window.tk.call("pause_image_override")
                  else:
                      root_window.tk.call("pause_image_normal")
-        vupdate(vars.task_mode, self.stat.task_mode)
-        vupdate(vars.task_state, self.stat.task_state)
-        vupdate(vars.task_paused, self.stat.task_paused)
-        vupdate(vars.taskfile, self.stat.file)
-        vupdate(vars.interp_pause, self.stat.paused)
-        vupdate(vars.mist, self.stat.mist)
-        vupdate(vars.flood, self.stat.flood)
-        vupdate(vars.brake, self.stat.spindle_brake)
-        vupdate(vars.spindledir, self.stat.spindle_direction)
-        vupdate(vars.motion_mode, self.stat.motion_mode)
-        vupdate(vars.optional_stop, self.stat.optional_stop)
-        vupdate(vars.block_delete, self.stat.block_delete)
-        if time.time() > spindlerate_blackout:
-            vupdate(vars.spindlerate, int(100 * self.stat.spindlerate + .5))
-        if time.time() > feedrate_blackout:
-            vupdate(vars.feedrate, int(100 * self.stat.feedrate + .5))
-        if time.time() > rapidrate_blackout:
-            vupdate(vars.rapidrate, int(100 * self.stat.rapidrate + .5))
-        if time.time() > maxvel_blackout:
-            m = to_internal_linear_unit(self.stat.max_velocity)
-            if vars.metric.get(): m = m * 25.4
-            vupdate(vars.maxvel_speed, float(int(600 * m)/10.0))
-            root_window.tk.call("update_maxvel_slider")
-        vupdate(vars.override_limits, self.stat.joint[0]['override_limits'])
-        on_any_limit = 0
-        for l in self.stat.limit:
-            if l:
-                on_any_limit = True
-                break
-        vupdate(vars.on_any_limit, on_any_limit)
-        global current_tool
-        current_tool = self.stat.tool_table[0]
-        if current_tool:
-            tool_data = {'tool': current_tool[0], 'zo': current_tool[3], 'xo': current_tool[1], 'dia': current_tool[10]}
-        if current_tool is None:
-            vupdate(vars.tool, _("Unknown tool %d") % self.stat.tool_in_spindle)
-        elif tool_data['tool'] == 0 or tool_data['tool'] == -1:
-            vupdate(vars.tool, _("No tool"))
-        elif current_tool.xoffset == 0 and not lathe:
-            vupdate(vars.tool, _("Tool %(tool)d, offset %(zo)g, diameter %(dia)g") % tool_data)
-        else:
-            vupdate(vars.tool, _("Tool %(tool)d, zo %(zo)g, xo %(xo)g, dia %(dia)g") % tool_data)
-        active_codes = []
-        for i in self.stat.gcodes[1:]:
-            if i == -1: continue
-            if i % 10 == 0:
-                active_codes.append("G%d" % (i/10))
+        for var, name in ((vars.task_mode, 'task_mode'),
+                (vars.task_state, 'task_state'),
+                (vars.task_paused, 'task_paused'),
+                (vars.taskfile, 'file'),
+                (vars.interp_pause, 'paused'),
+                (vars.mist, 'mist'),
+                (vars.flood, 'flood'),
+                (vars.brake, 'spindle_brake'),
+                (vars.spindledir, 'spindle_direction'),
+                (vars.motion_mode, 'motion_mode'),
+                (vars.optional_stop, 'optional_stop'),
+                (vars.block_delete, 'block_delete'),
+                (vars.override_limits, 'override_limits')):
+            if name in show: vupdate(var, show[name])
+        # While the user moves a slider, the stat value is not shown; it
+        # is forgotten, so it is shown again as soon as the blackout ends
+        if 'spindlerate' in show:
+            if now > spindlerate_blackout:
+                vupdate(vars.spindlerate, int(100 * show['spindlerate'] + .5))
+            else:
+                self.tracker.forget('spindlerate')
+        if 'feedrate' in show:
+            if now > feedrate_blackout:
+                vupdate(vars.feedrate, int(100 * show['feedrate'] + .5))
+            else:
+                self.tracker.forget('feedrate')
+        if 'rapidrate' in show:
+            if now > rapidrate_blackout:
+                vupdate(vars.rapidrate, int(100 * show['rapidrate'] + .5))
+            else:
+                self.tracker.forget('rapidrate')
+        if 'max_velocity' in show:
+            if now > maxvel_blackout:
+                m = to_internal_linear_unit(show['max_velocity'])
+                if vars.metric.get(): m = m * 25.4
+                vupdate(vars.maxvel_speed, float(int(600 * m)/10.0))
+                root_window.tk.call("update_maxvel_slider")
             else:
-                active_codes.append("G%(ones)d.%(tenths)d" % {'ones': i/10, 'tenths': i%10})
+                self.tracker.forget('max_velocity')
+        if 'limit' in show:
+            on_any_limit = 0
+            for l in show['limit']:
+                if l:
+                    on_any_limit = True
+                    break
+            vupdate(vars.on_any_limit, on_any_limit)
+        if 'tool' in show or 'tool_in_spindle' in show:
+            global current_tool
+            current_tool = self.tracker["tool"]
+            if current_tool:
+                tool_data = {'tool': current_tool[0], 'zo': current_tool[3], 'xo': current_tool[1], 'dia': current_tool[10]}
+            if current_tool is None:
+                vupdate(vars.tool, _("Unknown tool %d") % self.stat.tool_in_spindle)
+            elif tool_data['tool'] == 0 or tool_data['tool'] == -1:
+                vupdate(vars.tool, _("No tool"))
+            elif current_tool.xoffset == 0 and not lathe:
+                vupdate(vars.tool, _("Tool %(tool)d, offset %(zo)g, diameter %(dia)g") % tool_data)
+            else:
+                vupdate(vars.tool, _("Tool %(tool)d, zo %(zo)g, xo %(xo)g, dia %(dia)g") % tool_data)
+        if 'gcodes' in show or 'mcodes' in show or 'settings' in show:
+            active_codes = []
+            for i in self.stat.gcodes[1:]:
+                if i == -1: continue
+                if i % 10 == 0:
+                    active_codes.append("G%d" % (i/10))
+                else:
+                    active_codes.append("G%(ones)d.%(tenths)d" % {'ones': i/10, 'tenths': i%10})
 
-        for i in self.stat.mcodes[1:]:
-            if i == -1: continue
-            active_codes.append("M%d" % i)
+            for i in self.stat.mcodes[1:]:
+                if i == -1: continue
+                active_codes.append("M%d" % i)
 
-        feed_str = "F%.1f" % self.stat.settings[1]
-        if feed_str.endswith(".0"): feed_str = feed_str[:-2]
-        active_codes.append(feed_str)
-        active_codes.append("S%.0f" % self.stat.settings[2])
+            feed_str = "F%.1f" % self.stat.settings[1]
+            if feed_str.endswith(".0"): feed_str = feed_str[:-2]
+            active_codes.append(feed_str)
+            active_codes.append("S%.0f" % self.stat.settings[2])
 
-        codes = " ".join(active_codes)
-        widgets.code_text.configure(state="normal")
-        widgets.code_text.delete("0.0", "end")
-        widgets.code_text.insert("end", codes)
-        widgets.code_text.configure(state="disabled")
+            codes = " ".join(active_codes)
+            widgets.code_text.configure(state="normal")
+            widgets.code_text.delete("0.0", "end")
+            widgets.code_text.insert("end", codes)
+            widgets.code_text.configure(state="disabled")
 
         user_live_update()
 
@@ -1046,6 +1248,17 @@ class AxisCanon(GLCanon, StatMixin):
             notifications.add("info",self.notify_message)
             self.notify = 0
 
+class WorkerCanon(AxisCanon):
+    """AxisCanon for the parse worker process, which must not use Tk"""
+    def check_abort(self): pass
+
+    def next_line(self, st):
+        GLCanon.next_line(self, st)
+        self.progress.update(self.lineno)
+        if self.notify:
+            self.progress.notify(self.notify_message)
+            self.notify = 0
+
 
 progress_re = re.compile("^FILTER_PROGRESS=(\\d*)$")
 def filter_program(program_filter, infilename, outfilename):
@@ -1109,7 +1322,16 @@ def cancel_open(event=None):
         o.canon.aborted = True
 
 loaded_file = None
+open_in_progress = False
+pending_open = None
 def open_file_guts(f, filtered=False, addrecent=True):
+    global open_in_progress, pending_open
+    if open_in_progress:
+        # Called while loading, e.g. through axis-remote: cancel that load
+        # and open this file once it has finished
+        pending_open = f, filtered, addrecent
+        cancel_open()
+        return
     s.poll()
     save_task_mode = s.task_mode
     ensure_mode(linuxcnc.MODE_MANUAL)
@@ -1120,6 +1342,8 @@ def open_file_guts(f, filtered=False, addrecent=True):
         loaded_file = f
         program_filter = get_filter(f)
         if program_filter:
+            # the filter may rewrite the file that is shown now
+            listing.clear()
             tempfile = os.path.join(tempdir, os.path.basename(f))
             exitcode, stderr = filter_program(program_filter, f, tempfile)
             if exitcode:
@@ -1139,30 +1363,17 @@ def open_file_guts(f, filtered=False, addrecent=True):
 
     canon = None
     o.deselect(None) # remove highlight line from last program
+    open_in_progress = True
     try:
         # Force a sync of the interpreter, which writes out the var file.
         c.task_plan_synch()
         c.wait_complete()
         c.program_open(f)
-        lines = open(f).readlines()
-        progress = Progress(2, len(lines))
-        t.configure(state="normal")
-        t.tk.call("delete_all", t)
-        code = []
-        i = 0
-        for i, l in enumerate(lines):
-            l = l.expandtabs().replace("\r", "")
-            #t.insert("end", "%6d: " % (i+1), "lineno", l)
-            code.extend(["%6d: " % (i+1), "lineno", l, ""])
-            if i % 1000 == 0:
-                t.insert("end", *code)
-                del code[:]
-                progress.update(i)
-        if code:
-            t.insert("end", *code)
-        progress.nextphase(len(lines))
+        listing.load(f)
+        progress = Progress(1, len(listing))
         f = os.path.abspath(f)
-        o.canon = canon = AxisCanon(o, widgets.text, i, progress, arcdivision)
+        o.canon = canon = AxisCanon(o, widgets.text, max(0, len(listing) - 1),
+            progress, arcdivision)
         root_window.bind_class(".info.progress", "<Escape>", cancel_open)
 
         parameter = inifile.find("RS274NGC", "PARAMETER_FILE")
@@ -1222,7 +1433,6 @@ def open_file_guts(f, filtered=False, addrecent=True):
                     _("Near line %(seq)d of %(f)s:\n%(error_str)s") % {'seq': seq, 'f': f, 'error_str': error_str},
                     "error",0,_("OK"))
 
-        t.configure(state="disabled")
         o.lp.set_depth(from_internal_linear_unit(o.get_foam_z()),
                        from_internal_linear_unit(o.get_foam_w()))
 
@@ -1248,6 +1458,10 @@ def open_file_guts(f, filtered=False, addrecent=True):
             pass
         o.tkRedraw()
         root_window.tk.call("set_mode_from_tab")
+        open_in_progress = False
+        if pending_open:
+            root_window.after_idle(open_file_guts, *pending_open)
+            pending_open = None
 
 tabs_mdi = str(root_window.tk.call("set", "_tabs_mdi"))
 tabs_manual = str(root_window.tk.call("set", "_tabs_manual"))
@@ -1259,6 +1473,7 @@ widgets = nf.Widgets(root_window,
     ("help_window", Toplevel, ".keys"),
     ("about_window", Toplevel, ".about"),
     ("text", Text, pane_bottom + ".t.text"),
+    ("text_scrollbar", Scrollbar, pane_bottom + ".t.sb"),
     ("preview_frame", Frame, tabs_preview),
     ("numbers_text", Text, tabs_numbers + ".text"),
     ("tabs", bwidget.NoteBook, pane_top + ".tabs"),
@@ -1376,9 +1591,7 @@ def activate_ja_widget(i, force=0):
 def set_first_line(lineno):
     global program_start_line
     program_start_line = lineno
-    t.tag_remove("ignored", "0.0", "end")
-    if lineno > 0:
-        t.tag_add("ignored", "0.0", "%d.end" % (lineno-1))
+    listing.set_ignored(lineno)
 
 def parse_increment(jogincr):
     if jogincr.endswith("mm"):
@@ -1741,9 +1954,6 @@ property_names = [
     ('c', _("C bounds:"))
 ]
 
-def dist((x,y,z),(p,q,r)):
-    return ((x-p)**2 + (y-q)**2 + (z-r)**2) ** .5
-
 # returns units/sec
 def get_jog_speed(a):
     if vars.teleop_mode.get():
@@ -1950,7 +2160,7 @@ class TclCommands(nf.TclCommands):
                 props['name'] = name
 
             size = os.stat(loaded_file).st_size
-            lines = int(widgets.text.index("end").split(".")[0])-2
+            lines = len(listing)
             props['size'] = _("%(size)s bytes\n%(lines)s gcode lines") % {'size': size, 'lines': lines}
 
             if vars.metric.get():
@@ -1962,24 +2172,25 @@ class TclCommands(nf.TclCommands):
                 units = _("in")
                 fmt = "%.4f"
 
-            mf = vars.max_speed.get()
-            #print o.canon.traverse[0]
-
-            g0 = sum(dist(l[1][:3], l[2][:3]) for l in o.canon.traverse)
-            g1 = (sum(dist(l[1][:3], l[2][:3]) for l in o.canon.feed) +
-                sum(dist(l[1][:3], l[2][:3]) for l in o.canon.arcfeed))
-            gt = (sum(dist(l[1][:3], l[2][:3])/min(mf, l[3]) for l in o.canon.feed) +
-                sum(dist(l[1][:3], l[2][:3])/min(mf, l[3])  for l in o.canon.arcfeed) +
-                sum(dist(l[1][:3], l[2][:3])/mf  for l in o.canon.traverse) +
-                o.canon.dwell_time
-                )
+            def fmt_time(t):
+                if t > 120:
+                    return _("%.1f minutes") % (t/60)
+                return _("%d seconds") % (int(t))
+
+            d0 = dist_xyz(o.canon.traverse)
+            d1 = dist_xyz(o.canon.feed)
+            d2 = dist_xyz(o.canon.arcfeed)
+            g0 = float(d0.sum())
+            g1 = float(d1.sum() + d2.sum())
+            estimate = cycletime.estimate(o.canon,
+                cycletime.limits_from_ini(inifile),
+                initial_tool=s.tool_in_spindle)
  
             props['g0'] = "%f %s".replace("%f", fmt) % (from_internal_linear_unit(g0, conv), units)
             props['g1'] = "%f %s".replace("%f", fmt) % (from_internal_linear_unit(g1, conv), units)
-            if gt > 120:
-                props['run'] = _("%.1f minutes") % (gt/60)
-            else:
-                props['run'] = _("%d seconds") % (int(gt))
+            props['run'] = fmt_time(estimate.total)
+            props['tools'] = "\n".join("T%d: %s" % (tool, fmt_time(t))
+                for tool, t in estimate.tools)
 
             min_extents = from_internal_units(o.canon.min_extents, conv)
             max_extents = from_internal_units(o.canon.max_extents, conv)
@@ -2034,7 +2245,7 @@ class TclCommands(nf.TclCommands):
         if vars.running_line.get() != -1: line = vars.running_line.get()
         if vars.highlight_line.get() != -1: line = vars.highlight_line.get()
         if line == -1: return
-        selection.set_value(t.get("%d.8" % line, "%d.end" % line))
+        selection.set_value(listing.get(line))
 
     def task_run_line(*args):
         line = vars.highlight_line.get()
@@ -2247,7 +2458,7 @@ class TclCommands(nf.TclCommands):
         ensure_mode(linuxcnc.MODE_AUTO)
         c.auto(linuxcnc.AUTO_RUN, program_start_line)
         program_start_line = 0
-        t.tag_remove("ignored", "0.0", "end")
+        listing.set_ignored(0)
         o.set_highlight_line(None)
 
     def task_step(*event):
@@ -2846,12 +3057,23 @@ class TclCommands(nf.TclCommands):
         else:
             add_recent_file(f)
 
+    def save_live_plot(*args):
+        f = root_window.tk.call("tk_getSaveFile", "-initialdir", open_directory,
+            "-initialfile", "liveplot.txt",
+            "-filetypes", ((_("Text files"), ".txt"),))
+        if not f: return
+        f = unicode(f)
+        try:
+            o.export_live_plot(f)
+        except (IOError, OSError), detail:
+            root_window.tk.call("nf_dialog", ".error", _("Error saving file"),
+                str(detail), "error", 0, _("OK"))
+
     def goto_sensible_line():
         line = o.get_highlight_line()
         if not line: line = vars.running_line.get()
         if line is not None and line > 0:
-            t.see("%d.0" % (line+2))
-            t.see("%d.0" % line)
+            listing.see(line)
 
     def dynamic_tab(name, text):
         return _dynamic_tab(name,text) # caller: make a frame and pack
@@ -3560,6 +3782,13 @@ root_window.call(widgets.jogincr._w, "select", 0)
 vcp = inifile.find("DISPLAY", "PYVCP")
 
 arcdivision = int(inifile.find("DISPLAY", "ARCDIVISION") or 64)
+parse_worker = False
+temp = inifile.find("DISPLAY", "PARSE_WORKER")
+if temp:
+    try:
+        parse_worker = bool(int(temp))
+    except ValueError:
+        print "Error: invalid [DISPLAY] PARSE_WORKER in INI file"
 
 del sys.argv[1:3]
 
@@ -3720,6 +3949,7 @@ def rClicker(e):
     return "break"
 
 t = widgets.text
+listing = ProgramListing(t, widgets.text_scrollbar)
 t.bind('<Button-3>', rClicker) #allow right-click to select start from line
 t.tag_configure("ignored", background="#ffffff", foreground="#808080")
 t.tag_configure("lineno", foreground="#808080")
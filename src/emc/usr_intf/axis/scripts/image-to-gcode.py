@@ -36,6 +36,7 @@ import rs274.options
 
 from math import *
 import operator
+import multiprocessing
 
 epsilon = 1e-5
 
@@ -43,12 +44,13 @@ def tobytes(img):
     if hasattr(img, 'tobytes'): return img.tobytes()
     return img.tostring()
 
+# The tool functions take r as a number or as an array of numbers
 def ball_tool(r,rad):
-    s = -sqrt(rad**2-r**2)
+    s = -numpy.sqrt(rad**2-r**2)
     return s
 
 def endmill(r,dia):
-    return 0
+    return r * 0
 
 def vee_common(angle):
     slope = tan(angle * pi / 180)
@@ -63,19 +65,70 @@ def make_tool_shape(f, wdia, resp):
     dia = int(wdia*res+.5)
     wrad = wdia/2.
     if dia < 2: dia = 2
-    n = numpy.array([[plus_inf] * dia] * dia, dtype=numpy.float32)
+    n = numpy.empty((dia, dia), dtype=numpy.float32)
+    n.fill(plus_inf)
     hdia = dia / 2.
-    l = []
-    for x in range(dia):
-        for y in range(dia):
-            r = hypot(x-hdia, y-hdia) * resp
-            if r < wrad:
-                z = f(r, wrad)
-                l.append(z)
-                n[x,y] = z
+    x, y = numpy.indices((dia, dia))
+    r = numpy.hypot(x-hdia, y-hdia) * resp
+    inside = r < wrad
+    n[inside] = f(r[inside], wrad)
     n = n - n.min()
     return n
 
+def _envelope(args):
+    image, tool = args
+    th, tw = tool.shape
+    h = max(0, image.shape[0] - th + 1)
+    w = max(0, image.shape[1] - tw + 1)
+    result = numpy.empty((h, w), dtype=image.dtype)
+    result.fill(-plus_inf)
+    # one whole-image step per point of the tool instead of one
+    # tool-sized step per pixel
+    for a in range(th):
+        for b in range(tw):
+            t = tool[a, b]
+            if t == plus_inf: continue
+            numpy.maximum(result, image[a:a+h, b:b+w] - t, result)
+    return result
+
+def tool_envelope(image, tool, processes=1):
+    """\
+Return e with e[y, x] = (image[y:y+th, x:x+tw] - tool).max() for each
+position where the tool fits on the image, a grey-scale dilation of the
+image by the tool.  With more than one process, bands of rows are
+computed in a process pool."""
+    th = tool.shape[0]
+    h = image.shape[0] - th + 1
+    bands = min(processes, h / 64)
+    if bands < 2:
+        return _envelope((image, tool))
+    edges = [h * k / bands for k in range(bands + 1)]
+    jobs = [(image[a:b+th-1], tool) for a, b in zip(edges, edges[1:])]
+    pool = multiprocessing.Pool(bands)
+    try:
+        parts = pool.map(_envelope, jobs)
+    finally:
+        pool.terminate()
+    return numpy.concatenate(parts)
+
+def envelope_processes(image):
+    # not worth starting processes for small images
+    if image.size < 1000000: return 1
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+def slope(z, n, step):
+    """\
+The slope at each of the first n points of z, from the points on either
+side; z has one point more than that."""
+    d = numpy.empty(n)
+    if n == 0: return d
+    d[0] = (z[1] - z[0]) / step
+    d[1:] = (z[2:n+1] - z[0:n-1]) / (step * 2)
+    return d
+
 def amax(seq):
     res = 0
     for i in seq:
@@ -176,22 +229,21 @@ class Reduce_Scan_Lace:
             if j % keep == 0: return j
             return j + keep - j%keep
 
-        for i, (flag, span) in enumerate(self.converter(primary, items)):
-            subspan = []
-            a = None
-            for i, si in enumerate(span):
-                ki = si[idx]
-                if a is None:
-                    if test(abs(ki), slope):
-                        a = b = i
-                else:
-                    if test(abs(ki), slope):
-                        b = i
-                    else:
-                        if i - b < keep: continue
-                        yield True, span[bos(a):eos(b+1)]
-                        a = None
-            if a is not None:
+        for flag, span in self.converter(primary, items):
+            k = numpy.abs(numpy.array([si[idx] for si in span]))
+            steep = numpy.flatnonzero(test(k, slope))
+            if not len(steep): continue
+            # runs of steep points, where a run ends after 'keep' points
+            # that are not steep
+            ends = numpy.flatnonzero(numpy.diff(steep) > keep)
+            starts = [steep[0]] + steep[ends+1].tolist()
+            stops = steep[ends].tolist() + [steep[-1]]
+            for a, b in zip(starts, stops)[:-1]:
+                yield True, span[bos(a):eos(b+1)]
+            a, b = starts[-1], stops[-1]
+            if len(span) - 1 - b >= keep:
+                yield True, span[bos(a):eos(b+1)]
+            else:
                 yield True, span[a:]
 
     def reset(self):
@@ -228,7 +280,8 @@ class Converter:
         self.roughing_delta = roughing_delta
         self.roughing_feed = roughing_feed
 
-        self.cache = {}
+        self.processes = envelope_processes(image)
+        self.envelope = tool_envelope(image, tool_shape, self.processes)
 
         w, h = self.w, self.h = image.shape
         ts = self.ts = tool_shape.shape[0]
@@ -277,11 +330,10 @@ class Converter:
             h1 = h + th
             nim1 = numpy.zeros((w1, h1), dtype=numpy.float32) + base_image.min()
             nim1[tw/2:tw/2+w, th/2:th/2+h] = base_image
-            self.image = numpy.zeros((w,h), dtype=numpy.float32)
-            for j in range(0, w):
-                progress(j,w)
-                for i in range(0, h):
-                    self.image[j,i] = (nim1[j:j+tw,i:i+th] - rough).max()
+            self.image = tool_envelope(nim1, rough, self.processes)[:w,:h]
+            base_envelope = self.envelope
+            self.envelope = tool_envelope(self.image, self.tool,
+                self.processes)
             self.feed = self.roughing_feed
             r = -self.roughing_delta
             m = self.image.min()
@@ -294,7 +346,7 @@ class Converter:
                 self.rd = m
                 self.one_pass()
             self.image = base_image
-            self.cache.clear()
+            self.envelope = base_envelope
         self.feed = self.base_feed
         self.ro = 0
         self.rd = self.image.min()
@@ -302,12 +354,13 @@ class Converter:
         g.end()
 
     def get_z(self, x, y):
-        try:
-            return min(0, max(self.rd, self.cache[x,y]) + self.ro)
-        except KeyError:
-            m1 = self.image[y:y+self.ts, x:x+self.ts]
-            self.cache[x,y] = d = (m1 - self.tool).max()
-            return min(0, max(self.rd, d) + self.ro)
+        return min(0, max(self.rd, self.envelope[y,x]) + self.ro)
+
+    def get_z_map(self):
+        """get_z for every position at once, as z[y, x]"""
+        z = numpy.maximum(self.rd, self.envelope.astype(numpy.float64)) \
+            + self.ro
+        return numpy.where(z < 0, z, 0.)
         
     def get_dz_dy(self, x, y):
         y1 = max(0, y-1)
@@ -327,16 +380,17 @@ class Converter:
         jrange = range(0, w1, pixelstep)
         if w1-1 not in jrange: jrange.append(w1-1)
         irange = range(h1)
+        z = self.get_z_map()
+        xs = (numpy.arange(h1) * pixelsize).tolist()
 
         for j in jrange:
             progress(jrange.index(j), len(jrange))
             y = (w1-j) * pixelsize
-            scan = []
-            for i in irange:
-                x = i * pixelsize
-                milldata = (i, (x, y, self.get_z(i, j)),
-                    self.get_dz_dx(i, j), self.get_dz_dy(i, j))
-                scan.append(milldata)
+            j1 = max(0, j-1)
+            dz_dx = slope(z[j], h1, pixelsize)
+            dz_dy = (z[j+1,:h1] - z[j1,:h1]) / (pixelsize * (j+1-j1))
+            scan = zip(irange, zip(xs, [y] * h1, z[j,:h1].tolist()),
+                dz_dx.tolist(), dz_dy.tolist())
             for flag, points in convert_scan(primary, scan):
                 if flag:
                     self.entry_cut(self, points[0][0], j, points)
@@ -351,16 +405,17 @@ class Converter:
         irange = range(w1)
         if h1-1 not in jrange: jrange.append(h1-1)
         jrange.reverse()
+        z = self.get_z_map()
+        ys = ((w1 - numpy.arange(w1)) * pixelsize).tolist()
 
         for j in jrange:
             progress(jrange.index(j), len(jrange))
             x = j * pixelsize
-            scan = []
-            for i in irange:
-                y = (w1-i) * pixelsize
-                milldata = (i, (x, y, self.get_z(j, i)),
-                    self.get_dz_dy(j, i), self.get_dz_dx(j, i))
-                scan.append(milldata)
+            j1 = max(0, j-1)
+            dz_dy = slope(z[:,j], w1, pixelsize)
+            dz_dx = (z[:w1,j+1] - z[:w1,j1]) / (pixelsize * (j+1-j1))
+            scan = zip(irange, zip([x] * w1, ys, z[:w1,j].tolist()),
+                dz_dy.tolist(), dz_dx.tolist())
             for flag, points in convert_scan(primary, scan):
                 if flag:
                     self.entry_cut(self, j, points[0][0], points)
@@ -39,6 +39,7 @@ import subprocess          # to launch onboard and other processes
 import vte                 # To get the embedded terminal
 import tempfile            # needed only if the user click new in edit mode to open a new empty file
 import linuxcnc            # to get our own error system
+import cmdfuture           # to send commands without blocking the GUI
 import gobject             # needed to add the timer for periodic
 import locale              # for setting the language of the GUI
 import gettext             # to extract the strings to be translated
@@ -160,6 +161,11 @@ class gmoccapy(object):
         # needed components to comunicate with hal and linuxcnc
         self.halcomp = hal.component("gmoccapy")
         self.command = linuxcnc.command()
+        # the same command channel, but its methods return a future instead
+        # of making us wait for the task in a handler
+        self.async_command = cmdfuture.AsyncCommand(self.command)
+        # the future of the last estop button command
+        self._estop_future = None
         self.stat = linuxcnc.stat()
 
         self.error_channel = linuxcnc.error_channel()
@@ -1618,16 +1624,25 @@ class gmoccapy(object):
 
     # toggle emergency button
     def on_tbtn_estop_toggled(self, widget, data=None):
-        if widget.get_active():  # estop is active, open circuit
-            self.command.state(linuxcnc.STATE_ESTOP)
-            self.command.wait_complete()
-            self.stat.poll()
+        requested = widget.get_active()
+        if requested:  # estop is active, open circuit
+            future = self.async_command.state(linuxcnc.STATE_ESTOP)
+        else:  # estop circuit is fine
+            future = self.async_command.state(linuxcnc.STATE_ESTOP_RESET)
+        self._estop_future = future
+        future.add_done_callback(
+            lambda f: self._estop_done(widget, f, requested))
+
+    # check the result of an estop command, once the task has done it
+    def _estop_done(self, widget, future, requested):
+        # the button was toggled again since; the newer command counts
+        if future is not self._estop_future:
+            return
+        self.stat.poll()
+        if requested:
             if self.stat.task_state == linuxcnc.STATE_ESTOP_RESET:
                 widget.set_active(False)
-        else:  # estop circuit is fine
-            self.command.state(linuxcnc.STATE_ESTOP_RESET)
-            self.command.wait_complete()
-            self.stat.poll()
+        else:
             if self.stat.task_state == linuxcnc.STATE_ESTOP:
                 widget.set_active(True)
                 self._show_error((11, _("ERROR : External ESTOP is set, could not change state!")))
@@ -1638,31 +1653,35 @@ class gmoccapy(object):
             if self.stat.task_state == linuxcnc.STATE_ESTOP:
                 widget.set_active(False)
                 return
-            self.command.state(linuxcnc.STATE_ON)
-            self.command.wait_complete()
-            self.stat.poll()
-            if self.stat.task_state != linuxcnc.STATE_ON:
-                widget.set_active(False)
-                self._show_error((11, _("ERROR : Could not switch the machine on, is limit switch activated?")))
-                self._update_widgets(False)
-                return
-            self._update_widgets(True)
+            future = self.async_command.state(linuxcnc.STATE_ON)
+            future.add_done_callback(lambda f: self._machine_on_done(widget))
         else:
             self.command.state(linuxcnc.STATE_OFF)
             self._update_widgets(False)
 
+    # check that the machine is on, once the task has done the command
+    def _machine_on_done(self, widget):
+        # the button may have been released in the meantime
+        if not widget.get_active():
+            return
+        self.stat.poll()
+        if self.stat.task_state != linuxcnc.STATE_ON:
+            widget.set_active(False)
+            self._show_error((11, _("ERROR : Could not switch the machine on, is limit switch activated?")))
+            self._update_widgets(False)
+            return
+        self._update_widgets(True)
+
     # The mode buttons
+    # the mode change is shown by the status handlers once it is done
     def on_rbt_manual_pressed(self, widget, data=None):
-        self.command.mode(linuxcnc.MODE_MANUAL)
-        self.command.wait_complete()
+        self.async_command.mode(linuxcnc.MODE_MANUAL)
 
     def on_rbt_mdi_pressed(self, widget, data=None):
-        self.command.mode(linuxcnc.MODE_MDI)
-        self.command.wait_complete()
+        self.async_command.mode(linuxcnc.MODE_MDI)
 
     def on_rbt_auto_pressed(self, widget, data=None):
-        self.command.mode(linuxcnc.MODE_AUTO)
-        self.command.wait_complete()
+        self.async_command.mode(linuxcnc.MODE_AUTO)
 
     # If button exit is clicked, press emergency button before closing the application
     def on_btn_exit_clicked(self, widget, data=None):
@@ -2593,10 +2612,7 @@ class gmoccapy(object):
             return
 
         if "G43" in self.active_gcodes and self.stat.task_mode != linuxcnc.MODE_AUTO:
-            self.command.mode(linuxcnc.MODE_MDI)
-            self.command.wait_complete()
-            self.command.mdi("G43")
-            self.command.wait_complete()
+            self.async_command.sequence(("mode", linuxcnc.MODE_MDI), ("mdi", "G43"))
 
 # helpers functions end
 # =========================================================
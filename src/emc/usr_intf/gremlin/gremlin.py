@@ -47,8 +47,10 @@ import pango
 
 import rs274.glcanon
 import rs274.interpret
+import rs274.cycletime
 import linuxcnc
 import gcode
+import stathub
 
 import time
 import re
@@ -106,11 +108,17 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
         )
         thread.start_new_thread(self.logger.start, (.01,))
 
-        rs274.glcanon.GlCanonDraw.__init__(self, linuxcnc.stat(), self.logger)
+        rs274.glcanon.GlCanonDraw.__init__(self, stathub.shared_stat(),
+            self.logger)
+        if self.live_plot_memory:
+            self.logger.set_memory(self.live_plot_memory)
 
         self.current_view = 'z'
 
         self.select_primed = None
+        # gcode.parse cannot be entered again while it runs
+        self._loading = False
+        self._pending_load = None
 
         self.connect_after('realize', self.realize)
         self.connect('configure_event', self.reshape)
@@ -128,6 +136,7 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
         self.add_events(gtk.gdk.BUTTON_RELEASE_MASK)
 
         self.fingerprint = ()
+        self.subscription = None
 
         self.lat = 0
         self.minlat = -90
@@ -198,11 +207,23 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
 
     def _redraw(self): self.expose()
 
+    def preview_chunk_ready(self):
+        self.queue_draw()
+        while gtk.events_pending():
+            gtk.main_iteration(False)
+
     def clear_live_plotter(self):
         self.logger.clear()
 
     def map(self, *args):
-        gobject.timeout_add(50, self.poll)
+        if self.subscription is None:
+            self.subscription = stathub.get_hub().subscribe(self.hub_poll, 50)
+
+    def hub_poll(self, snapshot):
+        # the hub has polled self.stat
+        if snapshot is not None:
+            self.check_fingerprint()
+        return True
 
     def poll(self):
         s = self.stat
@@ -210,6 +231,11 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
             s.poll()
         except:
             return
+        self.check_fingerprint()
+        return True
+
+    def check_fingerprint(self):
+        s = self.stat
         fingerprint = (self.logger.npts, self.soft_limits(),
             s.actual_position, s.joint_actual_position,
             s.homed, s.g5x_offset, s.g92_offset, s.limit, s.tool_in_spindle,
@@ -219,9 +245,6 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
             self.fingerprint = fingerprint
             self.queue_draw()
 
-        # return self.visible
-        return True
-
     @rs274.glcanon.with_context
     def realize(self, widget):
         self.set_current_view()
@@ -246,6 +269,11 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
         return getattr(self, 'set_view_%s' % self.current_view)()
 
     def load(self,filename = None):
+        if self._loading:
+            # called from an event handled in preview_chunk_ready: load the
+            # file once the current load has finished
+            self._pending_load = filename,
+            return
         s = self.stat
         s.poll()
         if not filename and s.file:
@@ -255,6 +283,7 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
 
         td = tempfile.mkdtemp()
         self._current_file = filename
+        self._loading = True
         try:
             random = int(self.inifile.find("EMCIO", "RANDOM_TOOLCHANGER") or 0)
             canon = StatCanon(self.colors, self.get_geometry(),self.lathe_option, s, random)
@@ -272,8 +301,20 @@ class Gremlin(gtk.gtkgl.widget.DrawingArea, glnav.GlNavBase,
 
         finally:
             shutil.rmtree(td)
+            self._loading = False
 
         self.set_current_view()
+        if self._pending_load is not None:
+            gobject.idle_add(self.load, *self._pending_load)
+            self._pending_load = None
+
+    def estimate_cycle_time(self, tolerance=None):
+        """Estimate the run time of the loaded program, with the limits of
+        the INI file; returns an rs274.cycletime.Estimate, or None"""
+        if self.canon is None: return None
+        return rs274.cycletime.estimate(self.canon,
+            rs274.cycletime.limits_from_ini(self.inifile), tolerance,
+            self.stat.tool_in_spindle)
 
     def get_program_alpha(self): return self.program_alpha
     def get_num_joints(self): return self.num_joints
@@ -10,7 +10,7 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 # GNU General Public License for more details.
 
-
+from progtext import ProgramText
 
 class listing:
     def __init__(self, gtk, emc, labels, eventboxes):
@@ -69,9 +69,10 @@ class listing:
 
     def readfile(self, fn):
         self.filename = fn
-        f = file(fn, 'r')
-        self.program = f.readlines()
-        f.close()
+        # only the lines on the labels are ever read from the file
+        if isinstance(self.program, ProgramText):
+            self.program.close()
+        self.program = ProgramText(fn)
         self.lines = len(self.program)
         self.lineoffset = 0
         self.selected = -1
@@ -20,6 +20,8 @@
 #include <structmember.h>
 #include <string>
 #include <map>
+#include <time.h>
+#include <unistd.h>
 using namespace std;
 
 #include "config.h"
@@ -177,6 +179,7 @@ struct pyhalitem {
 };
 
 static PyObject * pyhal_pin_new(halitem * pin, const char *name);
+static PyObject *pyhal_group(PyObject *_self, PyObject *names);
 
 typedef std::map<std::string, struct halitem> itemmap;
 
@@ -250,61 +253,59 @@ static void pyhal_delete(PyObject *_self) {
     self->ob_type->tp_free(self);
 }
 
-static int pyhal_write_common(halitem *pin, PyObject *value) {
-    if(!pin) return -1;
+// A value converted from Python, ready to be stored in a pin or param
+union halvalue {
+    bool b;
+    uint32_t u32;
+    int32_t s32;
+    double f;
+};
 
-    if(pin->is_pin) {
-        switch(pin->type) {
-            case HAL_BIT:
-                *pin->u->pin.b = PyObject_IsTrue(value);
-                break;
-            case HAL_FLOAT: {
-                double tmp;
-                if(!from_python(value, &tmp)) return -1;
-                *pin->u->pin.f = tmp;
-                break;
-            }
-            case HAL_U32: {
-                uint32_t tmp;
-                if(!from_python(value, &tmp)) return -1;
-                *pin->u->pin.u32 = tmp;
-                break;
-            }
-            case HAL_S32: {
-                int32_t tmp;
-                if(!from_python(value, &tmp)) return -1;
-                *pin->u->pin.s32 = tmp;
-                break;
-            }
-            default:
-                PyErr_Format(pyhal_error_type, "Invalid pin type %d", pin->type);
+static int pyhal_convert(halitem *item, PyObject *value, halvalue *out) {
+    switch(item->type) {
+        case HAL_BIT: {
+            int b = PyObject_IsTrue(value);
+            if(b < 0) return -1;
+            out->b = b;
+            return 0;
+        }
+        case HAL_FLOAT:
+            return from_python(value, &out->f) ? 0 : -1;
+        case HAL_U32:
+            return from_python(value, &out->u32) ? 0 : -1;
+        case HAL_S32:
+            return from_python(value, &out->s32) ? 0 : -1;
+        default:
+            PyErr_Format(pyhal_error_type, "Invalid pin type %d", item->type);
+            return -1;
+    }
+}
+
+static void pyhal_store(halitem *item, const halvalue *value) {
+    if(item->is_pin) {
+        switch(item->type) {
+            case HAL_BIT: *item->u->pin.b = value->b; break;
+            case HAL_FLOAT: *item->u->pin.f = value->f; break;
+            case HAL_U32: *item->u->pin.u32 = value->u32; break;
+            case HAL_S32: *item->u->pin.s32 = value->s32; break;
+            default: break;
         }
     } else {
-        switch(pin->type) {
-            case HAL_BIT:
-                pin->u->param.b = PyObject_IsTrue(value);
-                break;
-            case HAL_FLOAT: {
-                double tmp;
-                if(!from_python(value, &tmp)) return -1;
-                pin->u->param.f = tmp;
-                break;
-            }
-            case HAL_U32: {
-                uint32_t tmp;
-                if(!from_python(value, &tmp)) return -1;
-                pin->u->param.u32 = tmp;
-                break;
-            }
-            case HAL_S32:
-                int32_t tmp;
-                if(!from_python(value, &tmp)) return -1;
-                pin->u->param.s32 = tmp;
-                break;
-            default:
-                PyErr_Format(pyhal_error_type, "Invalid pin type %d", pin->type);
+        switch(item->type) {
+            case HAL_BIT: item->u->param.b = value->b; break;
+            case HAL_FLOAT: item->u->param.f = value->f; break;
+            case HAL_U32: item->u->param.u32 = value->u32; break;
+            case HAL_S32: item->u->param.s32 = value->s32; break;
+            default: break;
         }
     }
+}
+
+static int pyhal_write_common(halitem *pin, PyObject *value) {
+    halvalue tmp;
+    if(!pin) return -1;
+    if(pyhal_convert(pin, value, &tmp) < 0) return -1;
+    pyhal_store(pin, &tmp);
     return 0;
 }
 
@@ -539,6 +540,9 @@ static PyMethodDef hal_methods[] = {
         "Create a new pin"},
     {"getitem", pyhal_get_pin, METH_VARARGS,
         "Get existing pin object"},
+    {"group", pyhal_group, METH_O,
+        "group(names): Get a pingroup that reads and writes the named pins\n"
+        "and params with one call"},
     {"exit", pyhal_exit, METH_NOARGS,
         "Call hal_exit"},
     {"ready", pyhal_ready, METH_NOARGS,
@@ -1238,9 +1242,156 @@ PyObject *stream_write(PyObject *_self, PyObject *args) {
     Py_RETURN_NONE;
 }
 
+// The bulk methods move whole samples, each stored as one
+// hal_stream_data per element, between the stream and a buffer
+static Py_ssize_t stream_record_size(streamobj *self) {
+    return PyString_GET_SIZE(self->pyelt) * sizeof(hal_stream_data);
+}
+
+static double monotonic_time() {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec * 1e-9;
+}
+
+// None means to wait forever, which is passed on as a negative timeout
+static bool timeout_from_python(PyObject *o, double *timeout) {
+    if(o == Py_None) {
+        *timeout = -1;
+        return true;
+    }
+    if(!from_python(o, timeout)) return false;
+    if(*timeout < 0) *timeout = 0;
+    return true;
+}
+
+// Wait until ready(stream) is true.  Return 1 when it is, 0 when 'deadline'
+// passes first (a negative deadline never passes), or -1 if a signal
+// handler raised an exception.  The GIL is released while sleeping.
+static int stream_wait(streamobj *self, bool (*ready)(hal_stream_t *),
+        double deadline) {
+    while(!ready(&self->stream)) {
+        if(deadline >= 0 && monotonic_time() >= deadline) return 0;
+        Py_BEGIN_ALLOW_THREADS
+        usleep(1000);
+        Py_END_ALLOW_THREADS
+        if(PyErr_CheckSignals()) return -1;
+    }
+    return 1;
+}
+
+static double deadline_for(double timeout) {
+    return timeout < 0 ? -1 : monotonic_time() + timeout;
+}
+
+static PyObject *stream_wait_common(PyObject *_self, PyObject *args,
+        bool (*ready)(hal_stream_t *)) {
+    streamobj *self = (streamobj *)_self;
+    PyObject *pytimeout = Py_None;
+    double timeout;
+    if(!PyArg_ParseTuple(args, "|O", &pytimeout)) return NULL;
+    if(!timeout_from_python(pytimeout, &timeout)) return NULL;
+    int r = stream_wait(self, ready, deadline_for(timeout));
+    if(r < 0) return NULL;
+    return PyBool_FromLong(r);
+}
+
+PyObject *stream_wait_readable(PyObject *_self, PyObject *args) {
+    return stream_wait_common(_self, args, hal_stream_readable);
+}
+
+PyObject *stream_wait_writable(PyObject *_self, PyObject *args) {
+    return stream_wait_common(_self, args, hal_stream_writable);
+}
+
+PyObject *stream_readinto(PyObject *_self, PyObject *args) {
+    streamobj *self = (streamobj *)_self;
+    PyObject *out, *pytimeout = NULL;
+    double timeout = 0;
+    if(!PyArg_ParseTuple(args, "O|O:hal.stream.readinto", &out, &pytimeout))
+        return NULL;
+    if(pytimeout && !timeout_from_python(pytimeout, &timeout)) return NULL;
+
+    void *buf;
+    Py_ssize_t len, size = stream_record_size(self);
+    if(PyObject_AsWriteBuffer(out, &buf, &len) < 0) return NULL;
+    if(size == 0 || len % size) {
+        PyErr_Format(PyExc_ValueError,
+            "Buffer size must be a multiple of %d bytes", (int)size);
+        return NULL;
+    }
+
+    Py_ssize_t count = len / size;
+    if(count && timeout) {
+        int r = stream_wait(self, hal_stream_readable, deadline_for(timeout));
+        if(r < 0) return NULL;
+    }
+
+    // checking readable first means an empty stream is not an underrun
+    hal_stream_data *data = (hal_stream_data *)buf;
+    Py_ssize_t i;
+    for(i=0; i<count && hal_stream_readable(&self->stream); i++) {
+        if(hal_stream_read(&self->stream, data + i * PyString_GET_SIZE(self->pyelt),
+                &self->sampleno) < 0)
+            break;
+    }
+    return PyInt_FromSsize_t(i);
+}
+
+PyObject *stream_write_many(PyObject *_self, PyObject *args) {
+    streamobj *self = (streamobj *)_self;
+    PyObject *data, *pytimeout = NULL;
+    double timeout = 0;
+    if(!PyArg_ParseTuple(args, "O|O:hal.stream.write_many", &data, &pytimeout))
+        return NULL;
+    if(pytimeout && !timeout_from_python(pytimeout, &timeout)) return NULL;
+
+    const void *buf;
+    Py_ssize_t len, size = stream_record_size(self);
+    if(PyObject_AsReadBuffer(data, &buf, &len) < 0) return NULL;
+    if(size == 0 || len % size) {
+        PyErr_Format(PyExc_ValueError,
+            "Buffer size must be a multiple of %d bytes", (int)size);
+        return NULL;
+    }
+
+    Py_ssize_t count = len / size;
+    double deadline = deadline_for(timeout);
+    hal_stream_data *samples = (hal_stream_data *)buf;
+    Py_ssize_t i;
+    for(i=0; i<count; i++) {
+        if(!hal_stream_writable(&self->stream)) {
+            if(!timeout) break;
+            int r = stream_wait(self, hal_stream_writable, deadline);
+            if(r < 0) return NULL;
+            if(r == 0) break;
+        }
+        if(hal_stream_write(&self->stream,
+                samples + i * PyString_GET_SIZE(self->pyelt)) < 0)
+            break;
+    }
+    return PyInt_FromSsize_t(i);
+}
+
 static PyMethodDef stream_methods[] = {
     {"read", stream_read, METH_NOARGS},
     {"write", stream_write, METH_VARARGS},
+    {"readinto", stream_readinto, METH_VARARGS,
+        "readinto(buffer[, timeout]): Read as many samples as are available\n"
+        "and fit in 'buffer', and return how many were read.  With a\n"
+        "timeout, first wait up to 'timeout' seconds (None: forever) for\n"
+        "a sample to arrive"},
+    {"write_many", stream_write_many, METH_VARARGS,
+        "write_many(buffer[, timeout]): Write the samples in 'buffer' for\n"
+        "which there is room, and return how many were written.  With a\n"
+        "timeout, wait up to 'timeout' seconds (None: forever) for room\n"
+        "for all of them"},
+    {"wait_readable", stream_wait_readable, METH_VARARGS,
+        "wait_readable([timeout]): Wait up to 'timeout' seconds (None:\n"
+        "forever) for a sample, and return whether there is one"},
+    {"wait_writable", stream_wait_writable, METH_VARARGS,
+        "wait_writable([timeout]): Wait up to 'timeout' seconds (None:\n"
+        "forever) for room for a sample, and return whether there is"},
     {}
 };
 
@@ -1255,6 +1406,11 @@ PyObject *stream_getter(PyObject *_self, void *vfp) {
     return to_python(result);
 }
 
+PyObject *stream_get_record_size(PyObject *_self, void *unused) {
+    streamobj *self = reinterpret_cast<streamobj*>(_self);
+    return PyInt_FromSsize_t(stream_record_size(self));
+}
+
 PyObject *stream_element_types(PyObject *_self, void *unused) {
     streamobj *self = reinterpret_cast<streamobj*>(_self);
     if(!self->pyelt) {
@@ -1277,6 +1433,7 @@ static PyGetSetDef stream_getset[] = {
     {"writable", stream_getter<bool>, NULL, NULL, VFC(hal_stream_writable)},
     {"depth", stream_getter<int>, NULL, NULL, VFC(hal_stream_depth)},
     {"element_types", stream_element_types, NULL, NULL, NULL},
+    {"record_size", stream_get_record_size, NULL, NULL, NULL},
     {"maxdepth", stream_getter<int>, NULL, NULL, VFC(hal_stream_maxdepth)},
     {"num_underruns", stream_getter<int>, NULL, NULL, VFC(hal_stream_num_underruns)},
     {"num_overruns", stream_getter<int>, NULL, NULL, VFC(hal_stream_num_overruns)},
@@ -1323,7 +1480,7 @@ PyTypeObject stream_type = {
     0,                         /*tp_getattro*/
     0,                         /*tp_setattro*/
     0,                         /*tp_as_buffer*/
-    Py_TPFLAGS_DEFAULT,        /*tp_flags*/
+    Py_TPFLAGS_DEFAULT|Py_TPFLAGS_BASETYPE,        /*tp_flags*/
     "HAL Stream",              /*tp_doc*/
     0,                         /*tp_traverse*/
     0,                         /*tp_clear*/
@@ -1347,6 +1504,249 @@ PyTypeObject stream_type = {
 };
 
 
+
+// A pingroup is a fixed list of the pins and params of a component, looked
+// up once, so a cycle of a userspace component can read or write all of
+// them with one call instead of one dictionary lookup per item.
+struct groupobj {
+    PyObject_HEAD
+    halobject *comp;
+    PyObject *names;
+    Py_ssize_t n;
+    halitem *items;
+};
+
+static bool group_live(groupobj *self) {
+    if(self->comp->hal_id <= 0) {
+        PyErr_SetString(PyExc_RuntimeError, "Invalid operation on closed HAL component");
+        return false;
+    }
+    return true;
+}
+
+static double pyhal_read_double(halitem *item) {
+    if(item->is_pin) {
+        switch(item->type) {
+            case HAL_BIT: return *(item->u->pin.b);
+            case HAL_U32: return *(item->u->pin.u32);
+            case HAL_S32: return *(item->u->pin.s32);
+            case HAL_FLOAT: return *(item->u->pin.f);
+            default: return 0;
+        }
+    } else {
+        switch(item->type) {
+            case HAL_BIT: return item->u->param.b;
+            case HAL_U32: return item->u->param.u32;
+            case HAL_S32: return item->u->param.s32;
+            case HAL_FLOAT: return item->u->param.f;
+            default: return 0;
+        }
+    }
+}
+
+static int pygroup_init(PyObject *_self, PyObject *, PyObject *) {
+    PyErr_Format(PyExc_RuntimeError,
+	    "Cannot be constructed directly, use component.group()");
+    return -1;
+}
+
+static void pygroup_delete(PyObject *_self) {
+    groupobj *self = (groupobj *)_self;
+    delete [] self->items;
+    Py_XDECREF(self->names);
+    Py_XDECREF(self->comp);
+    PyObject_Del(self);
+}
+
+static PyObject *pygroup_read(PyObject *_self, PyObject *args) {
+    groupobj *self = (groupobj *)_self;
+    PyObject *out = NULL;
+    if(!PyArg_ParseTuple(args, "|O:hal.pingroup.read", &out)) return NULL;
+    if(!group_live(self)) return NULL;
+
+    if(!out || out == Py_None) {
+        PyObject *r = PyTuple_New(self->n);
+        if(!r) return NULL;
+        for(Py_ssize_t i=0; i<self->n; i++) {
+            PyObject *o = pyhal_read_common(&self->items[i]);
+            if(!o) { Py_DECREF(r); return NULL; }
+            PyTuple_SET_ITEM(r, i, o);
+        }
+        return r;
+    }
+
+    if(PyList_Check(out)) {
+        if(PyList_GET_SIZE(out) != self->n) {
+            PyErr_Format(PyExc_ValueError, "List of %d items expected",
+                (int)self->n);
+            return NULL;
+        }
+        for(Py_ssize_t i=0; i<self->n; i++) {
+            PyObject *o = pyhal_read_common(&self->items[i]);
+            if(!o) return NULL;
+            PyList_SetItem(out, i, o);
+        }
+        Py_INCREF(out);
+        return out;
+    }
+
+    // anything else must be a writable buffer of doubles, like
+    // array.array('d') or a numpy float64 array
+    void *buf;
+    Py_ssize_t len;
+    if(PyObject_AsWriteBuffer(out, &buf, &len) < 0) return NULL;
+    if(len != self->n * (Py_ssize_t)sizeof(double)) {
+        PyErr_Format(PyExc_ValueError, "Buffer of %d doubles expected",
+            (int)self->n);
+        return NULL;
+    }
+    double *d = (double *)buf;
+    for(Py_ssize_t i=0; i<self->n; i++)
+        d[i] = pyhal_read_double(&self->items[i]);
+    Py_INCREF(out);
+    return out;
+}
+
+static PyObject *pygroup_write(PyObject *_self, PyObject *values) {
+    groupobj *self = (groupobj *)_self;
+    if(!group_live(self)) return NULL;
+
+    PyObject *seq = PySequence_Fast(values, "Sequence of values expected");
+    if(!seq) return NULL;
+    if(PySequence_Fast_GET_SIZE(seq) != self->n) {
+        PyErr_Format(PyExc_ValueError, "%d values expected, got %d",
+            (int)self->n, (int)PySequence_Fast_GET_SIZE(seq));
+        Py_DECREF(seq);
+        return NULL;
+    }
+
+    // Convert everything first, so a bad value leaves all items unchanged
+    halvalue buf[self->n ? self->n : 1];
+    PyObject **o = PySequence_Fast_ITEMS(seq);
+    for(Py_ssize_t i=0; i<self->n; i++) {
+        if(pyhal_convert(&self->items[i], o[i], &buf[i]) < 0) {
+            Py_DECREF(seq);
+            return NULL;
+        }
+    }
+    Py_DECREF(seq);
+
+    for(Py_ssize_t i=0; i<self->n; i++)
+        pyhal_store(&self->items[i], &buf[i]);
+    Py_RETURN_NONE;
+}
+
+static Py_ssize_t pygroup_len(PyObject *_self) {
+    groupobj *self = (groupobj *)_self;
+    return self->n;
+}
+
+static PyObject *pygroup_repr(PyObject *_self) {
+    groupobj *self = (groupobj *)_self;
+    return PyString_FromFormat("<hal pingroup of %d items>", (int)self->n);
+}
+
+static PyMethodDef group_methods[] = {
+    {"read", pygroup_read, METH_VARARGS,
+        "read([out]): Read all the items.  Return a tuple, or fill 'out',\n"
+        "which is a list or a writable buffer of doubles, and return it"},
+    {"write", pygroup_write, METH_O,
+        "write(values): Write all the items.  If any value cannot be\n"
+        "converted, no item is written"},
+    {NULL},
+};
+
+#pragma GCC diagnostic ignored "-Wwrite-strings"
+static PyMemberDef group_members[] = {
+    {"names", T_OBJECT, offsetof(groupobj, names), READONLY,
+        "The names of the items, in order"},
+    {}
+};
+#pragma GCC diagnostic warning "-Wwrite-strings"
+
+static PySequenceMethods group_sequence = {
+    pygroup_len,               /*sq_length*/
+};
+
+static
+PyTypeObject group_type = {
+    PyObject_HEAD_INIT(NULL)
+    0,                         /*ob_size*/
+    "hal.pingroup",            /*tp_name*/
+    sizeof(groupobj),          /*tp_basicsize*/
+    0,                         /*tp_itemsize*/
+    pygroup_delete,            /*tp_dealloc*/
+    0,                         /*tp_print*/
+    0,                         /*tp_getattr*/
+    0,                         /*tp_setattr*/
+    0,                         /*tp_compare*/
+    pygroup_repr,              /*tp_repr*/
+    0,                         /*tp_as_number*/
+    &group_sequence,           /*tp_as_sequence*/
+    0,                         /*tp_as_mapping*/
+    0,                         /*tp_hash */
+    0,                         /*tp_call*/
+    0,                         /*tp_str*/
+    0,                         /*tp_getattro*/
+    0,                         /*tp_setattro*/
+    0,                         /*tp_as_buffer*/
+    Py_TPFLAGS_DEFAULT,        /*tp_flags*/
+    "HAL Pin Group",           /*tp_doc*/
+    0,                         /*tp_traverse*/
+    0,                         /*tp_clear*/
+    0,                         /*tp_richcompare*/
+    0,                         /*tp_weaklistoffset*/
+    0,                         /*tp_iter*/
+    0,                         /*tp_iternext*/
+    group_methods,             /*tp_methods*/
+    group_members,             /*tp_members*/
+    0,                         /*tp_getset*/
+    0,                         /*tp_base*/
+    0,                         /*tp_dict*/
+    0,                         /*tp_descr_get*/
+    0,                         /*tp_descr_set*/
+    0,                         /*tp_dictoffset*/
+    pygroup_init,              /*tp_init*/
+    0,                         /*tp_alloc*/
+    PyType_GenericNew,         /*tp_new*/
+    0,                         /*tp_free*/
+    0,                         /*tp_is_gc*/
+};
+
+static PyObject *pyhal_group(PyObject *_self, PyObject *names) {
+    halobject *self = (halobject *)_self;
+    EXCEPTION_IF_NOT_LIVE(NULL);
+
+    PyObject *t = PySequence_Tuple(names);
+    if(!t) return NULL;
+
+    Py_ssize_t n = PyTuple_GET_SIZE(t);
+    halitem *items = new halitem[n ? n : 1];
+    for(Py_ssize_t i=0; i<n; i++) {
+        halitem *item = find_item(self, PyString_AsString(PyTuple_GET_ITEM(t, i)));
+        if(!item) {
+            delete [] items;
+            Py_DECREF(t);
+            return NULL;
+        }
+        items[i] = *item;
+    }
+
+    groupobj *group = PyObject_New(groupobj, &group_type);
+    if(!group) {
+        delete [] items;
+        Py_DECREF(t);
+        return NULL;
+    }
+    Py_INCREF(self);
+    group->comp = self;
+    group->names = t;
+    group->n = n;
+    group->items = items;
+    return (PyObject *)group;
+}
+
+
 PyMethodDef module_methods[] = {
     {"pin_has_writer", pin_has_writer, METH_VARARGS,
 	"Return a FALSE value if a pin has no writers and TRUE if it does"},
@@ -1405,10 +1805,12 @@ void init_hal(void) {
     PyType_Ready(&shm_type);
     PyType_Ready(&halpin_type);
     PyType_Ready(&stream_type);
+    PyType_Ready(&group_type);
     PyModule_AddObject(m, "component", (PyObject*)&halobject_type);
     PyModule_AddObject(m, "shm", (PyObject*)&shm_type);
     PyModule_AddObject(m, "item", (PyObject*)&halpin_type);
     PyModule_AddObject(m, "stream", (PyObject*)&stream_type);
+    PyModule_AddObject(m, "pingroup", (PyObject*)&group_type);
 
     PyModule_AddIntConstant(m, "MSG_NONE", RTAPI_MSG_NONE);
     PyModule_AddIntConstant(m, "MSG_ERR", RTAPI_MSG_ERR);
@@ -36,6 +36,8 @@ class HalWrapper:
     def newparam(self, *args):
 	self._params.add(args[0])
  	return self._comp.newparam(*args)
+    def group(self, names):
+	return self._comp.group(names)
 
     def __getitem__(self, k):
 	if k in self._drive: return self._drive[k]
@@ -55,51 +57,59 @@ class HalInputDevice:
 
 	self.idx = idx
 	self.codes = set()
-	self.last = {}
-	self.rel_items = []
-	self.abs_items = []
 	self.comp = comp
         self.parts = parts
 
+        # Pin objects and state, by code name
+        self.keys = {}
+        self.key_state = {}
+        self.abs_items = []
+        self.rel_items = []
+        self.counts = {}
+        self.out = {}
+        # the axes whose output pins are out of date
+        self.dirty = set()
+
+        inputs = []
         if 'K' in parts:
             for key in self.device.get_bits('EV_KEY'):
                 key = tohalname(key)
                 self.codes.add(key)
-                comp.newpin("%s.%s" % (idx, key), HAL_BIT, HAL_OUT)
-                comp.newpin("%s.%s-not" % (idx, key), HAL_BIT, HAL_OUT)
-                self.set(key + "-not", 1)
+                self.keys[key] = (self.newpin(key, HAL_BIT, HAL_OUT),
+                    self.newpin(key + "-not", HAL_BIT, HAL_OUT))
+                self.key_state[key] = 0
 
         if 'R' in parts:
             for axis in self.device.get_bits('EV_REL'):
                 name = tohalname(axis)
                 self.codes.add(name)
-                comp.newpin("%s.%s-position" % (idx, name), HAL_FLOAT, HAL_OUT)
-                comp.newpin("%s.%s-counts" % (idx, name), HAL_S32, HAL_OUT)
-                comp.newpin("%s.%s-reset" % (idx, name), HAL_BIT, HAL_IN)
-                comp.newpin("%s.%s-scale" % (idx, name), HAL_FLOAT, HAL_IN)
+                self.newpin(name + "-position", HAL_FLOAT, HAL_OUT)
+                self.newpin(name + "-counts", HAL_S32, HAL_OUT)
+                self.newpin(name + "-reset", HAL_BIT, HAL_IN)
+                self.newpin(name + "-scale", HAL_FLOAT, HAL_IN)
                 self.set(name + '-scale', 1.)
                 self.rel_items.append(name)
+                self.counts[name] = 0
+                self.out[name] = self.group(name, "-counts", "-position")
+                inputs.extend(self.names(name, "-reset", "-scale"))
 
         if 'A' in parts:
             for axis in self.device.get_bits('EV_ABS'):
                 name = tohalname(axis)
                 self.codes.add(name)
                 absinfo = self.device.get_absinfo(axis)
-                comp.newpin("%s.%s-position" % (idx, name), HAL_FLOAT, HAL_OUT)
-                comp.newpin("%s.%s-counts" % (idx, name), HAL_S32, HAL_OUT)
-                comp.newpin("%s.%s-is-pos" % (idx, name), HAL_BIT, HAL_OUT)
-                comp.newpin("%s.%s-is-neg" % (idx, name), HAL_BIT, HAL_OUT)
-                comp.newpin("%s.%s-scale" % (idx, name), HAL_FLOAT, HAL_IN)
-                comp.newpin("%s.%s-offset" % (idx, name), HAL_FLOAT, HAL_IN)
-                comp.newpin("%s.%s-fuzz" % (idx, name), HAL_S32, HAL_IN)
-                comp.newpin("%s.%s-flat" % (idx, name), HAL_S32, HAL_IN)
+                self.newpin(name + "-position", HAL_FLOAT, HAL_OUT)
+                self.newpin(name + "-counts", HAL_S32, HAL_OUT)
+                self.newpin(name + "-is-pos", HAL_BIT, HAL_OUT)
+                self.newpin(name + "-is-neg", HAL_BIT, HAL_OUT)
+                self.newpin(name + "-scale", HAL_FLOAT, HAL_IN)
+                self.newpin(name + "-offset", HAL_FLOAT, HAL_IN)
+                self.newpin(name + "-fuzz", HAL_S32, HAL_IN)
+                self.newpin(name + "-flat", HAL_S32, HAL_IN)
                 comp.newparam("%s.%s-min" % (idx, name), HAL_S32, HAL_RO)
                 comp.newparam("%s.%s-max" % (idx, name), HAL_S32, HAL_RO)
                 center = (absinfo.minimum + absinfo.maximum)/2.
                 halfrange = (absinfo.maximum - absinfo.minimum)/2. or 1
-                self.set(name + "-counts", absinfo.value)
-                self.set(name + "-position",
-                    (absinfo.value - center) / halfrange)
                 self.set(name + "-scale", halfrange)
                 self.set(name + "-offset", center)
                 self.set(name + "-fuzz", absinfo.fuzz)
@@ -107,17 +117,43 @@ class HalInputDevice:
                 self.set(name + "-min", absinfo.minimum)
                 self.set(name + "-max", absinfo.maximum)
                 self.abs_items.append(name)
+                self.counts[name] = absinfo.value
+                self.out[name] = self.group(name,
+                    "-counts", "-position", "-is-neg", "-is-pos")
+                inputs.extend(self.names(name,
+                    "-scale", "-offset", "-fuzz", "-flat"))
 
 	self.ledmap = {}
+	self.last = {}
+	self.leds = []
         if 'L' in parts:
             for led in self.device.get_bits('EV_LED'):
                 name = tohalname(led)
                 self.ledmap[name] = led
-                comp.newpin("%s.%s" % (idx, name), HAL_BIT, HAL_IN)
-                comp.newpin("%s.%s-invert" % (idx, name), HAL_BIT, HAL_IN)
+                self.newpin(name, HAL_BIT, HAL_IN)
+                self.newpin(name + "-invert", HAL_BIT, HAL_IN)
                 self.last[name] = 0
+                self.leds.append(name)
                 self.device.write_event('EV_LED', led, 0)
-	
+                inputs.extend(self.names(name, "", "-invert"))
+
+        # All the input pins, which are checked for changes periodically
+        self.inputs = comp.group(inputs)
+        self.input_values = None
+        self.rel_params = {}
+        self.abs_params = {}
+        self.update_hal()
+        self.refresh()
+
+    def names(self, name, *suffixes):
+        return ["%s.%s%s" % (self.idx, name, suffix) for suffix in suffixes]
+
+    def group(self, name, *suffixes):
+        return self.comp.group(self.names(name, *suffixes))
+
+    def newpin(self, name, type, dir):
+        return self.comp.newpin("%s.%s" % (self.idx, name), type, dir)
+
     def get(self, name):
 	name = "%s.%s" % (self.idx, name)
 	return self.comp[name]
@@ -126,9 +162,9 @@ class HalInputDevice:
 	name = "%s.%s" % (self.idx, name)
 	self.comp[name] = value
 
-    def update(self):
-	while self.device.readable():
-	    ev = self.device.read_event()
+    def update_device(self):
+        """Handle the pending events of the device"""
+	for ev in self.device.read_events(coalesce=True):
 	    if ev.type == 'EV_SYN': continue
 	    elif ev.type == 'EV_SND': continue
 	    elif ev.type == 'EV_MSC': continue
@@ -141,57 +177,89 @@ class HalInputDevice:
 		print >>sys.stderr, "Unexpected event", ev.type, ev.code
 		continue
 	    if ev.type == 'EV_KEY':
-		if ev.value:
-		    self.set(code, 1)
-		    self.set(code + "-not", 0)
-		else:
-		    self.set(code, 0)
-		    self.set(code + "-not", 1)
+		value = ev.value and 1
+		if value != self.key_state[code]:
+		    self.key_state[code] = value
+		    pin, notpin = self.keys[code]
+		    pin.set(value)
+		    notpin.set(not value)
 	    elif ev.type == 'EV_REL':
-		self.set(code + "-counts", self.get(code + "-counts") + ev.value)
+		reset, scale = self.rel_params[code]
+		if not reset:
+		    self.counts[code] += ev.value
+		    self.dirty.add(code)
 	    elif ev.type == 'EV_ABS':
-		flat = self.get(code + "-flat")
-		fuzz = self.get(code + "-fuzz")
-		center = int(self.get(code + "-offset"))
+		scale, offset, fuzz, flat = self.abs_params[code]
+		center = int(offset)
 		if ev.value < center-flat or ev.value > center+flat:
 		    value = ev.value
 		else: value = center
-		if abs(value - self.get(code + "-counts")) > fuzz:
-		    self.set(code + "-counts", value)
+		if abs(value - self.counts[code]) > fuzz:
+		    self.counts[code] = value
+		    self.dirty.add(code)
+	self.flush()
 
-                
-	for a in self.abs_items:
-	    value = self.get(a + "-counts")
-	    scale = self.get(a + "-scale") or 1
-	    offset = self.get(a + "-offset")
-	    position = (value - offset) / scale
-	    self.set(a + "-position", position)
-	    # Use .01 because my Joystick isn't exactly zero at rest. maybe should be a parameter?
-	    self.set(a + "-is-neg", (position < -.01) )
-	    self.set(a + "-is-pos", (position >  .01) )
+    def update_hal(self):
+        """Act on changes of the input pins"""
+	values = self.inputs.read()
+	if values == self.input_values: return
+	self.input_values = values
 
+	i = 0
 	for r in self.rel_items:
-	    reset = self.get(r + "-reset")
-	    scale = self.get(r + "-scale") or 1
-	    if reset: self.set(r + "-counts", 0)
-	    self.set(r + "-position", self.get(r + "-counts") / scale)
+	    self.rel_params[r] = reset, scale = values[i:i+2]
+	    i += 2
+	    if reset: self.counts[r] = 0
+	for a in self.abs_items:
+	    self.abs_params[a] = values[i:i+4]
+	    i += 4
+	# the axes are written with the new values by the refresh() that
+	# follows each call
 
-	for k, v in self.last.items():
+	for k in self.leds:
 	    # Note: this is OK because the hal module always returns True or False for HAL_BIT values
-	    u = self.comp["%s.%s" % (self.idx, k)] != self.comp["%s.%s-invert" % (self.idx, k)]
+	    u = values[i] != values[i+1]
+	    i += 2
 	    if u != self.last[k]:
 		led = self.ledmap[k]
 		self.device.write_event('EV_LED', led, u)
 		self.last[k] = u
 
+    def flush(self):
+        """Write the output pins of the axes that changed"""
+	for a in self.dirty:
+	    counts = self.counts[a]
+	    if a in self.rel_params:
+		reset, scale = self.rel_params[a]
+		self.out[a].write((counts, counts / (scale or 1)))
+	    else:
+		scale, offset, fuzz, flat = self.abs_params[a]
+		position = (counts - offset) / (scale or 1)
+		# Use .01 because my Joystick isn't exactly zero at rest. maybe should be a parameter?
+		self.out[a].write((counts, position, position < -.01, position > .01))
+	self.dirty.clear()
+
+    def refresh(self):
+        """Drive all the output pins again, changed or not"""
+	self.dirty.update(self.out)
+	self.flush()
+	for k, (pin, notpin) in self.keys.items():
+	    value = self.key_state[k]
+	    pin.set(value)
+	    notpin.set(not value)
+
 h = component("hal_input")
 w = HalWrapper(h)
 h.setprefix("input")
 d = []
 i = 0
 parts = 'KRAL'
+# how often the input pins are checked, and all output pins driven
+period = .01
 for f in sys.argv[1:]:
-    if f.startswith("-"):
+    if f.startswith("--period="):
+        period = float(f[len("--period="):]) / 1000.
+    elif f.startswith("-"):
         parts = f[1:]
     else:
         try:
@@ -203,11 +271,24 @@ for f in sys.argv[1:]:
 w.drive()
 h.ready()
 
-fds = [dev.device.fileno() for dev in d]
+# Events are handled as soon as they arrive; in between, the input pins are
+# looked at and the output pins driven again, once per period
+devices = dict((dev.device.fileno(), dev) for dev in d)
+poller = select.epoll()
+for fd in devices:
+    poller.register(fd, select.EPOLLIN)
+now = time.time()
+next_update = now + period
 try:
     while 1:
-	select.select(fds, [], [], .01)
-	for i in d: i.update()
-	w.drive()
+	for fd, event in poller.poll(max(0, next_update - time.time())):
+	    devices[fd].update_device()
+	now = time.time()
+	if now < next_update: continue
+	next_update += period
+	if next_update < now: next_update = now + period
+	for dev in d:
+	    dev.update_hal()
+	    dev.refresh()
 except KeyboardInterrupt:
     pass
@@ -36,8 +36,63 @@
 # PR 124 CR selection - 0                 don't change
 
 import time,hal
+import select
 import serial
+import sys
 import traceback
+from collections import OrderedDict
+
+# Control characters of the computer link protocol
+ENQ = chr(0x5)
+STX = chr(0x2)
+ETX = chr(0x3)
+ACK = chr(0x6)
+NAK = chr(0x15)
+
+# Request priorities, most urgent first
+STOP, COMMAND, POLL = range(3)
+
+# How long to wait for the first byte of a response, on top of the time
+# the request and response take on the line
+RESPONSE_TIMEOUT = .1
+# How often the input pins are checked while waiting
+HAL_PERIOD = .01
+
+def frame_length(buf):
+    """Return the length of the response at the start of 'buf', 0 if buf
+    does not start with a response, or None if the response is incomplete.
+    A read gives STX, station, data, ETX, checksum; a write gives ACK,
+    station; an error NAK, station, error code"""
+    if buf[0] == STX:
+        end = buf.find(ETX)
+        if end < 0 or len(buf) < end + 3: return None
+        return end + 3
+    if buf[0] == ACK: n = 3
+    elif buf[0] == NAK: n = 4
+    else: return 0
+    if len(buf) < n: return None
+    return n
+
+def checksum(data):
+    return "%02X" % (sum(ord(c) for c in data.upper()) & 0xff)
+
+class Request:
+    def __init__(self, index, command, data=None, priority=POLL, handler=None):
+        self.index = index
+        self.command = command
+        self.data = data
+        self.priority = priority
+        self.handler = handler
+
+class Poll:
+    """A monitoring read, repeated every 'period' seconds at most"""
+    def __init__(self, index, command, period_pin, handler):
+        self.index = index
+        self.command = command
+        self.period_pin = period_pin
+        self.handler = handler
+        self.due = 0
+
 class mitsubishi_serial:
 
     def __init__(self,vfd_names=[['mitsub_vfd','00']],baudrate=9600,port='/dev/ttyUSB0'):
@@ -49,15 +104,22 @@ class mitsubishi_serial:
             stopbits=serial.STOPBITS_TWO,
             bytesize=serial.EIGHTBITS
             )
-            self.ser.open()
-            self.ser.isOpen()
+            # Serial() opens the port when it is given one, and newer pyserial
+            # refuses to open it twice
+            if not self.ser.isOpen():
+                self.ser.open()
         except:
             print "ERROR : mitsub_vfd - No serial interface found at %s"% port
             raise SystemExit
         print "Mitsubishi VFD serial computer link has loaded"
         print "Port: %s,\nbaudrate: %d\n8 data bits, no parity, 2 stop bits\n"%(port,baudrate)
+        # 11 bits per character
+        self.char_time = 11. / baudrate
 
         self.h=[]
+        self.inputs = []
+        self.stat_pins = []
+        self.last = []
         self.comp_names = vfd_names
         for index,name in enumerate(self.comp_names):
             #print index,' NAME:',name[0],' SLAVE:',name[1]
@@ -85,205 +147,263 @@ class mitsubishi_serial:
             c.newpin("stat-bit-5", hal.HAL_BIT, hal.HAL_OUT)
             c.newpin("stat-bit-6", hal.HAL_BIT, hal.HAL_OUT)
             c.newpin("stat-bit-7", hal.HAL_BIT, hal.HAL_OUT)
+            # how often to read each monitored value, in seconds; 0 is as
+            # often as the line allows
+            c.newpin("status-period", hal.HAL_FLOAT, hal.HAL_IN)
+            c.newpin("fb-period", hal.HAL_FLOAT, hal.HAL_IN)
+            c.newpin("amps-period", hal.HAL_FLOAT, hal.HAL_IN)
+            c.newpin("cycle-time", hal.HAL_FLOAT, hal.HAL_OUT)
+            c.newpin("error-count", hal.HAL_S32, hal.HAL_OUT)
+            c.newpin("timeout-count", hal.HAL_S32, hal.HAL_OUT)
             # set reasonable defaults
             c['scale-cmd'] = 1
             c['scale-fb'] = 1
             c['scale-amps'] = 1
             c['scale-power'] = 1
             c['fwd'] = 1
-            # flags for each device
-            self['last_run%d'%index] = c['run']
-            self['last_fwd%d'%index] = c['fwd']
-            self['last_cmd%d'%index] = c['motor-cmd']
-            self['last_monitor%d'%index] = c['monitor']
-            self['last_estop%d'%index] = c['estop']
+            self.inputs.append(c.group(["run", "fwd", "motor-cmd", "scale-cmd",
+                "estop", "monitor"]))
+            self.stat_pins.append(c.group(["stat-bit-%d" % i for i in range(8)]
+                + ["up-to-speed", "alarm"]))
+            # the input values the commands sent so far are based on
+            self.last.append(self.inputs[-1].read())
             #add device to component reference variable
             self.h.append(c)
             print "Mitsubishi %s VFD: slave# %s added\n"%(name[0],name[1])
+
+        self.commands = OrderedDict()
+        self.polls = []
+        for index in range(len(self.h)):
+            # 7A is the address for 8 status bits, 6F running motor
+            # frequency, 70 motor current
+            self.polls.append(Poll(index, "7A", "status-period", self.got_status))
+            self.polls.append(Poll(index, "6F", "fb-period", self.got_frequency))
+            self.polls.append(Poll(index, "70", "amps-period", self.got_amps))
+        self.last_status = [None] * len(self.h)
+        # the request waiting for its response, and what has arrived of it
+        self.current = None
+        self.deadline = 0
+        self.received = ''
         # only issue ready when all the components are ready
         for i in self.h:
             i.ready()
 
     def loop(self):
-        cmd = data = out = temp=''
         while 1:
             try:
-              for index,ids in enumerate(self.comp_names):
-                self.slave_num = ids[1]
-                # MONITOR for up-to-speed, alarms and running frequency
-                # 7A is the address for 8 status bits ( b0 - b8 )
-                # These bits are configurable from the panel. We assume bit 3 is up to speed
-                # and bit 7 is alarm
-                # the returned data is 2 characters of hex
-                # we convert that to binary and the mask for the bits we want
-                if self.h[index]['monitor']:
-                    while self.ser.inWaiting() > 0:
-                        raw = self.ser.read(1)
-                    word = self.prepare_data("7A",None)
-                    out = temp = ''
-                    self.ser.write(word)
-                    time.sleep(.05)
-                    string,chr_list,chr_hex = self.poll_output()
-                    #print 'DEBUG: ',chr_list,chr_hex
-                    if chr_list != '':
-                        #print string
-                        try:
-                            binary = "{0:#010b}".format(int(string[3:5],16))
-                        except:
-                            binary = '0b000000'
-                        self.h[index]['stat-bit-0'] = int(binary,2) & 1
-                        self.h[index]['stat-bit-1'] = int(binary,2) & 2
-                        self.h[index]['stat-bit-2'] = int(binary,2) & 4
-                        self.h[index]['stat-bit-3'] = self.h[index]['up-to-speed'] = int(binary,2) & 8
-                        self.h[index]['stat-bit-4'] = int(binary,2) & 16
-                        self.h[index]['stat-bit-5'] = int(binary,2) & 32
-                        self.h[index]['stat-bit-6'] = int(binary,2) & 64
-                        self.h[index]['stat-bit-7'] = self.h[index]['alarm'] = int(binary,2) & 128
-                        if self.h[index]['debug'] and 1==2:
-                            print 'monitor operation:',binary,temp,temp[3:5],len(temp)
-
-                    # 6F is the address for running motor frequency status
-                    # it returns 4 characters of hex
-                    # we convert to decimal and multiply by .01 for hertz and by user scale-fb
-                    # for arbrtrary units. This does require scale to be set to something besides 0!
-                    # we assume the inverter is set to show running hertz (it's configurable in the VFD)
-                    word = self.prepare_data("6F",None)
-                    out = temp = ''
-                    self.ser.write(word)
-                    time.sleep(.05)
-                    string,chr_list,chr_hex = self.poll_output()
-                    if self.h[index]['debug']:
-                        print 'DEBUG: ',chr_list,chr_hex
-                    if chr_list != '':
-                        decimal = int(string[3:7],16)
-                        self.h[index]["motor-fb"] = decimal *.01 * self.h[index]["scale-fb"]
-                        if self.h[index]['debug'] and 1==2:
-                            print 'monitor frequency:',decimal,string,string[3:7], len(string)
-
-                # amps
-                    word = self.prepare_data("70",None)
-                    out = temp = ''
-                    self.ser.write(word)
-                    time.sleep(.05)
-                    time.sleep(.05)
-                    string,chr_list,chr_hex = self.poll_output()
-                    if self.h[index]['debug']:
-                        print 'DEBUG: ',chr_list,chr_hex
-                    if chr_list != '':
-                        decimal = int(string[3:7],16)
-                        self.h[index]["motor-amps"] = decimal *.01 * self.h[index]["scale-amps"]
-                        if self.h[index]['debug'] and 1==2:
-                            print 'monitor amps:',decimal,string,string[3:7], len(string)
-
-
-                # STOP ON ESTOP
-                # if ESTOP is false it stops the output
-                # when ESTOP is reset the run command must be re-issued (cycled false to true) to start motor 
-                if not self['last_estop%d'%index] == self.h[index]['estop']:
-                    if not self.h[index]["estop"]:
-                        cmd = "FA";data ="00"
-                        word = self.prepare_data(cmd,data)
-                        self.ser.write(word)
-                        time.sleep(.05)
-                        self['last_estop%d'%index] = self.h[index]['estop']
-                        print "**** Mitsubishi VFD: %s stopped due to Estop Signal"% ids[0]
-                        continue
-                    print "**** Mitsubishi VFD: Estop cleared - Must re-issue run command to start %s." % ids[0]
-                    self['last_estop%d'%index] = self.h[index]['estop']
-
-                # SET RUN AND DIRECTION
-                # address FA sets the start and direction
-                # it expects a 2 character hex representing a 8 bit (b0 - b7) binary number
-                # bit 1 sets forward, 4 sets reverse, 0 stop
-                # depending on the inverter and options other bits are possible,
-                # but these three are consistant
-                if not self['last_run%d'%index] == self.h[index]['run'] or not self['last_fwd%d'%index] == self.h[index]['fwd']:
-                    if self.h[index]['run']:
-                        if self.h[index]['fwd']:
-                            cmd = "FA";data ="02"
-                        else:
-                            cmd = "FA";data ="04"
-                    else:
-                        cmd = "FA";data ="00"
-                    word = self.prepare_data(cmd,data)
-                    self.ser.write(word)
-                    time.sleep(.05)
-                    self['last_run%d'%index] = self.h[index]['run']
-                    self['last_fwd%d'%index] = self.h[index]['fwd']
-                    if self.h[index]['debug']:
-                        string,chr_list,chr_hex = self.poll_output()
-                        print 'DEBUG: ',chr_list,chr_hex
-
-                # SET cmd
-                # address ED is for setting the running frequency
-                # it expects 4 characters of hex representing frequency in .01 hertz units
-                # we internally scale it by 100 to make it 1 hertz units and by user scale
-                # for arbrtrary units. This does require scale to be set to something besides 0!
-                if not self['last_cmd%d'%index] == self.h[index]['motor-cmd']:
-                    freq = int(abs(self.h[index]['motor-cmd']*100*self.h[index]['scale-cmd']))
-                    if freq > 40000: freq = 40000
-                    if freq < 0: freq = 0
-                    self['last_cmd%d'%index] = self.h[index]['motor-cmd']
-                    # send frequency command
-                    cmd="ED";data="%0.4X"%freq
-                    word = self.prepare_data(cmd,data)
-                    self.ser.write(word)
-                    time.sleep(.05)
-                    if self.h[index]['debug']:
-                        string,chr_list,chr_hex = self.poll_output()
-                        print 'DEBUG: ',chr_list,chr_hex
-
+                self.update_inputs()
+                if self.current is None:
+                    self.send_next()
+                self.receive()
             except KeyboardInterrupt:
                     self.kill_output()
                     raise
             except:
-                    print "error",ids
-                    print sys.exc_info()[0]
+                    print "error",self.current and self.comp_names[self.current.index]
+                    traceback.print_exc()
+                    self.current = None
+
+    def queue(self, index, command, data, priority=COMMAND):
+        # a newer command replaces one for the same thing that was not sent
+        # yet, e.g. a stop replaces a start
+        key = index, command
+        old = self.commands.pop(key, None)
+        if old is not None: priority = min(priority, old.priority)
+        self.commands[key] = Request(index, command, data, priority,
+            self.got_ack)
+
+    def update_inputs(self):
+        for index,ids in enumerate(self.comp_names):
+            values = self.inputs[index].read()
+            last = self.last[index]
+            if values == last: continue
+            run, fwd, cmd, scale, estop, monitor = values
+            last_run, last_fwd, last_cmd, last_scale, last_estop, last_monitor = last
+
+            # STOP ON ESTOP
+            # if ESTOP is false it stops the output
+            # when ESTOP is reset the run command must be re-issued (cycled false to true) to start motor
+            # only the edge stops the motor, so run commands still work when
+            # the pin is not connected
+            stopped = False
+            if estop != last_estop:
+                if not estop:
+                    self.queue(index, "FA", "00", STOP)
+                    stopped = True
+                    print "**** Mitsubishi VFD: %s stopped due to Estop Signal"% ids[0]
+                else:
+                    print "**** Mitsubishi VFD: Estop cleared - Must re-issue run command to start %s." % ids[0]
+
+            # SET RUN AND DIRECTION
+            # address FA sets the start and direction
+            # it expects a 2 character hex representing a 8 bit (b0 - b7) binary number
+            # bit 1 sets forward, 4 sets reverse, 0 stop
+            # depending on the inverter and options other bits are possible,
+            # but these three are consistant
+            # a run change that comes with the estop edge would replace the
+            # queued stop, so it is left out
+            if (run, fwd) != (last_run, last_fwd) and not stopped:
+                if not run: data = "00"
+                elif fwd: data = "02"
+                else: data = "04"
+                self.queue(index, "FA", data)
+
+            # SET cmd
+            # address ED is for setting the running frequency
+            # it expects 4 characters of hex representing frequency in .01 hertz units
+            # we internally scale it by 100 to make it 1 hertz units and by user scale
+            # for arbrtrary units. This does require scale to be set to something besides 0!
+            if (cmd, scale) != (last_cmd, last_scale):
+                freq = int(abs(cmd*100*scale))
+                if freq > 40000: freq = 40000
+                self.queue(index, "ED", "%0.4X"%freq)
+
+            self.last[index] = values
+
+    def next_poll(self, now):
+        """Return the poll that is most overdue, or the time the next one
+        is due"""
+        best = None
+        for poll in self.polls:
+            if not self.last[poll.index][5]: continue    # monitor pin
+            if best is None or poll.due < best.due: best = poll
+        if best is None or best.due > now:
+            return None, best and best.due
+        return best, None
+
+    def send_next(self):
+        if self.commands:
+            key, request = min(self.commands.items(),
+                key=lambda item: item[1].priority)
+            del self.commands[key]
+        else:
+            poll, due = self.next_poll(time.time())
+            if poll is None: return
+            request = Request(poll.index, poll.command, None, POLL, poll.handler)
+            request.poll = poll
+        # anything left over from an earlier response is stale now
+        if self.ser.inWaiting() > 0:
+            self.ser.read(self.ser.inWaiting())
+        word = self.prepare_data(self.comp_names[request.index][1],
+            request.command, request.data)
+        self.ser.write(word)
+        self.current = request
+        self.received = ''
+        # the longest response is 11 characters
+        self.deadline = (time.time() + RESPONSE_TIMEOUT
+            + (len(word) + 11) * self.char_time)
+
+    def receive(self):
+        now = time.time()
+        if self.current is not None:
+            timeout = min(self.deadline - now, HAL_PERIOD)
+        else:
+            poll, due = self.next_poll(now)
+            if poll is not None: return
+            timeout = HAL_PERIOD
+            if due is not None: timeout = min(due - now, timeout)
+        r, w, x = select.select([self.ser.fileno()], [], [], max(timeout, 0))
+        if r and self.ser.inWaiting() > 0:
+            data = self.ser.read(self.ser.inWaiting())
+            if self.current is None: return     # not asked for
+            self.received += data
+            self.parse()
+        elif self.current is not None and time.time() >= self.deadline:
+            request = self.current
+            self.count(request.index, "timeout-count")
+            if self.h[request.index]['debug']:
+                print 'DEBUG: no response to', request.command
+            self.done(request)
+
+    def parse(self):
+        buf = self.received
+        while buf:
+            n = frame_length(buf)
+            if n is None: break
+            if n == 0:
+                # not the start of a response
+                buf = buf[1:]
+                continue
+            frame, buf = buf[:n], buf[n:]
+            request = self.current
+            if self.h[request.index]['debug']:
+                print 'DEBUG: ', ','.join(frame), ' '.join(hex(ord(c)) for c in frame)
+            if frame[0] == STX:
+                # the sum covers the station number and the data
+                if checksum(frame[1:-3]) != frame[-2:]:
+                    self.count(request.index, "error-count")
+                else:
+                    request.handler(request.index, frame[3:-3])
+            elif frame[0] == ACK:
+                request.handler(request.index, None)
+            else:
+                self.count(request.index, "error-count")
+            self.done(request)
+            return
+        self.received = buf
+
+    def done(self, request):
+        if request.priority == POLL:
+            poll = request.poll
+            poll.due = time.time() + max(self.h[poll.index][poll.period_pin], 0)
+        self.current = None
+        self.received = ''
+
+    def count(self, index, pin):
+        self.h[index][pin] += 1
+
+    # These bits are configurable from the panel. We assume bit 3 is up to speed
+    # and bit 7 is alarm
+    # the returned data is 2 characters of hex
+    def got_status(self, index, data):
+        try:
+            bits = int(data[:2],16)
+        except ValueError:
+            self.count(index, "error-count")
+            return
+        values = [bits & (1 << i) for i in range(8)]
+        self.stat_pins[index].write(values + [values[3], values[7]])
+        now = time.time()
+        if self.last_status[index] is not None:
+            self.h[index]['cycle-time'] = now - self.last_status[index]
+        self.last_status[index] = now
+
+    # it returns 4 characters of hex
+    # we convert to decimal and multiply by .01 for hertz and by user scale-fb
+    # for arbrtrary units. This does require scale to be set to something besides 0!
+    # we assume the inverter is set to show running hertz (it's configurable in the VFD)
+    def got_frequency(self, index, data):
+        try:
+            decimal = int(data[:4],16)
+        except ValueError:
+            self.count(index, "error-count")
+            return
+        self.h[index]["motor-fb"] = decimal *.01 * self.h[index]["scale-fb"]
+
+    def got_amps(self, index, data):
+        try:
+            decimal = int(data[:4],16)
+        except ValueError:
+            self.count(index, "error-count")
+            return
+        self.h[index]["motor-amps"] = decimal *.01 * self.h[index]["scale-amps"]
+
+    def got_ack(self, index, data):
+        pass
 
     def kill_output(self):
         cmd = "FA";data ="00"
         for index,ids in enumerate(self.comp_names):
-            self.slave_num = ids[1]
-            word = self.prepare_data(cmd,data)
+            word = self.prepare_data(ids[1],cmd,data)
             self.ser.write(word)
             time.sleep(.05)
             print 'Mitsub VFD: Kill-> ', ids[0]
 
-    def prepare_data(self,command ='E1',data= '07AD'):
-        combined = self.slave_num+command  +'1'
+    def prepare_data(self,slave_num,command ='E1',data= '07AD'):
+        combined = slave_num+command  +'1'
         if not data == None:
             combined += data
-        s=0
-        for i in range(0,len(combined)):
-            letter = combined[i]
-            s=s+ord(letter.upper())
-        converted_data = chr(0x5) + combined + hex(s)[-2:-1].upper() + hex(s)[-1:].upper()
-        return converted_data
-
-    def poll_output(self):
-        string = chr_list_out = hex_out = ''
-        while self.ser.inWaiting() > 0:
-            raw = self.ser.read(1)
-            chr_list_out += raw+','
-            string += raw
-            hex_out += hex(ord(raw))
-            hex_out +=' '
-        if hex_out != '':
-            answ=''
-            if chr_list_out[0] == chr(0x6):
-                answ = 'ackg'
-            if chr_list_out[0] == chr(0x15):
-                answ = 'error'
-            if chr_list_out[0] == chr(0x2):
-                answ = 'checksome error'
-            #print 'slave:',chr_list_out[2]+chr_list_out[4],answ
-            return string,chr_list_out,hex_out
-        return '','',''
-
-    def __getitem__(self, item):
-        return getattr(self, item)
-    def __setitem__(self, item, value):
-        return setattr(self, item, value)
+        return ENQ + combined + checksum(combined)
 
 if __name__ == "__main__":
     import getopt,sys
@@ -330,6 +450,13 @@ This driver assumes certain other VFD settings:
         print
         print '''some models (eg E500) cannot monitor status -set the monitor pin to false
 in this case pins such as up-to-speed, amps, alarm and status bits are not useful.
+'''
+        print '''Requests are sent as soon as the previous one is answered or timed out.
+Stop, run and frequency commands go before monitoring reads.  The
+status-period, fb-period and amps-period pins set how often, in seconds, each
+monitored value is read (0 = as often as possible).  cycle-time shows the
+time between the last two status reads, error-count the bad or refused
+answers and timeout-count the requests that were not answered.
 '''
         print '''HAL command used to load: '''
         print '''loadusr mitsub_vfd --baud 4800 --port /dev/ttyUSB0 NAME=SLAVE_NUMBER 
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+import linuxcnc
+import cmdfuture
+
+NAMES = {None: "pending", linuxcnc.RCS_DONE: "done",
+    linuxcnc.RCS_ERROR: "error", cmdfuture.TIMEOUT: "timeout"}
+
+class FakeCommand:
+    """Counts serial numbers like linuxcnc.command, and logs the calls"""
+    def __init__(self):
+        self.serial = 0
+        self.log = []
+
+    def _send(self, name, *args):
+        self.serial += 1
+        self.log.append((self.serial, name) + args)
+
+    def mode(self, m): self._send("mode", m)
+    def mdi(self, text): self._send("mdi", text)
+    def state(self, s): self._send("state", s)
+    def wait_complete(self, timeout=5): return "wait_complete"
+
+class FakeStat:
+    def __init__(self, echo, state):
+        self.echo_serial_number = echo
+        self.state = state
+
+def show(*futures):
+    print " ".join("%s=%s" % (f.name, NAMES[f.status]) for f in futures)
+
+command = FakeCommand()
+cmd = cmdfuture.AsyncCommand(command, watch=False)
+EXEC = linuxcnc.RCS_EXEC
+
+print "passed through", cmd.wait_complete(), cmd.serial
+
+# a later serial number completes a command
+f = cmd.mode(linuxcnc.MODE_MDI)
+print "serial", f.serial, command.log[-1][1:]
+print "pending", cmd.update(FakeStat(0, linuxcnc.RCS_DONE))
+print "pending", cmd.update(FakeStat(f.serial, EXEC))
+show(f)
+print "pending", cmd.update(FakeStat(f.serial + 1, EXEC))
+show(f)
+print "ok", f.ok()
+
+# the state of the echoed command completes it too
+f = cmd.mdi("G0 X1")
+cmd.update(FakeStat(f.serial, linuxcnc.RCS_DONE))
+show(f)
+f = cmd.mdi("G0 X-1")
+cmd.update(FakeStat(f.serial, linuxcnc.RCS_ERROR))
+show(f)
+print "ok", f.ok()
+
+# several at once, each with its own rule; callbacks run in order
+done = []
+a = cmd.mode(linuxcnc.MODE_MANUAL)
+b = cmd.state(linuxcnc.STATE_ON)
+c = cmd.mdi("M3")
+for x in a, b, c:
+    x.add_done_callback(lambda x: done.append(x.name))
+print "pending", cmd.update(FakeStat(b.serial, EXEC))
+show(a, b, c)
+print "pending", cmd.update(FakeStat(c.serial, linuxcnc.RCS_ERROR))
+show(a, b, c)
+print "callbacks", done
+# a callback added after the command completed runs at once
+c.add_done_callback(lambda x: done.append("late"))
+print "callbacks", done
+# later status does not change a completed future
+cmd.update(FakeStat(c.serial + 5, linuxcnc.RCS_DONE))
+show(c)
+
+# the timeout
+cmd.timeout = -1
+f = cmd.mode(linuxcnc.MODE_AUTO)
+print "pending", cmd.update(FakeStat(f.serial - 1, EXEC))
+show(f)
+f = cmd.mode(linuxcnc.MODE_AUTO)
+cmd.expire()
+show(f)
+print "pending", cmd.pending
+cmd.timeout = 5.0
+
+# sequence: each step is sent once the one before it succeeded
+del command.log[:]
+s = cmd.sequence(("mode", linuxcnc.MODE_MDI), ("mdi", "G43"),
+    ("mode", linuxcnc.MODE_MANUAL))
+print "sent", [entry[1:] for entry in command.log]
+cmd.update(FakeStat(s.serial, linuxcnc.RCS_DONE))
+print "sent", [entry[1:] for entry in command.log]
+show(s)
+cmd.update(FakeStat(s.serial, linuxcnc.RCS_DONE))
+cmd.update(FakeStat(s.serial, linuxcnc.RCS_DONE))
+show(s)
+print "sent", len(command.log)
+
+# and stops at the first step that fails
+del command.log[:]
+s = cmd.sequence(("mode", linuxcnc.MODE_MDI), ("mdi", "G43"),
+    ("mode", linuxcnc.MODE_MANUAL))
+cmd.update(FakeStat(s.serial, linuxcnc.RCS_DONE))
+cmd.update(FakeStat(s.serial, linuxcnc.RCS_ERROR))
+show(s)
+print "sent", [entry[1:] for entry in command.log]
+print "pending", cmd.update(FakeStat(s.serial + 1, linuxcnc.RCS_DONE))
+
+# an empty sequence is done at once
+show(cmd.sequence())
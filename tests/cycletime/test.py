@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+import math
+from rs274.segments import SegmentStore
+from rs274 import cycletime
+
+class Canon:
+    """The parts of a GLCanon that the estimate uses"""
+    def __init__(self):
+        self.tool_offsets = [(0, 0, 0)]
+        self.traverse = SegmentStore(self.tool_offsets, False)
+        self.feed = SegmentStore(self.tool_offsets)
+        self.arcfeed = SegmentStore(self.tool_offsets)
+        self.tool_changes = []
+        self.dwell_time = 0
+        self.seq = 0
+
+    def move(self, store, lineno, start, end, feedrate=0):
+        start = list(start) + [0] * (9 - len(start))
+        end = list(end) + [0] * (9 - len(end))
+        store.append(lineno, start, end, feedrate, 0, self.seq)
+        self.seq += 1
+
+# 1 inch/s and 10 inch/s^2 on each axis
+limits = cycletime.Limits([1] * 9, [10] * 9)
+
+def check(title, canon, expected, **kw):
+    e = cycletime.estimate(canon, limits, **kw)
+    print "%-20s %.6f %.6f %s" % (title, e.total, expected,
+        abs(e.total - expected) < 1e-9)
+    return e
+
+# long enough to reach full speed: L/v + v/a
+c = Canon()
+c.move(c.traverse, 1, (0, 0, 0), (10, 0, 0))
+check("long", c, 10 + 1 / 10.)
+
+# the feed rate is the top speed
+c = Canon()
+c.move(c.feed, 1, (0, 0, 0), (0, 0, -2), .5)
+check("feed", c, 2 / .5 + .5 / 10)
+
+# too short to reach full speed: a triangle, 2 sqrt(L/a)
+c = Canon()
+c.move(c.traverse, 1, (0, 0, 0), (.01, 0, 0))
+check("triangle", c, 2 * math.sqrt(.01 / 10))
+
+# a rotary move, in degrees
+c = Canon()
+c.move(c.traverse, 1, (0, 0, 0, 0), (0, 0, 0, 90))
+check("rotary", c, 90 + 1 / 10.)
+
+# moves that go on in the same direction do not stop in between
+c = Canon()
+for i in range(100):
+    c.move(c.feed, i, (i * .1, 0, 0), ((i + 1) * .1, 0, 0), 2)
+check("collinear", c, 10 + 1 / 10.)
+check("collinear chunks", c, 10 + 1 / 10., chunk=7)
+
+# a reversal stops
+c = Canon()
+c.move(c.traverse, 1, (0, 0, 0), (5, 0, 0))
+c.move(c.traverse, 2, (5, 0, 0), (0, 0, 0))
+check("reversal", c, 2 * (5 + 1 / 10.))
+
+# a right angle with no blending allowed stops
+c = Canon()
+c.move(c.feed, 1, (0, 0, 0), (5, 0, 0), 1)
+c.move(c.feed, 2, (5, 0, 0), (5, 5, 0), 1)
+check("corner", c, 2 * (5 + 1 / 10.), tolerance=0)
+# and is faster than that with blending
+e = cycletime.estimate(c, limits)
+print "corner blended", e.total < 2 * (5 + 1 / 10.)
+
+# a gap stops
+c = Canon()
+c.move(c.feed, 1, (0, 0, 0), (5, 0, 0), 1)
+c.move(c.feed, 2, (6, 0, 0), (11, 0, 0), 1)
+check("gap", c, 2 * (5 + 1 / 10.))
+
+# the order of the moves comes from seq, not from the stores
+c = Canon()
+c.seq = 2
+c.move(c.traverse, 3, (10, 0, 0), (15, 0, 0))
+c.seq = 0
+c.move(c.feed, 1, (0, 0, 0), (5, 0, 0), 2)
+c.move(c.arcfeed, 2, (5, 0, 0), (10, 0, 0), 2)
+e = check("order", c, 15 + 1 / 10.)
+print "lines", ["%.6f" % t for t in e.lines]
+print "rapid %.6f" % e.rapid
+
+# a tool change stops, and splits the time between the tools
+c = Canon()
+c.move(c.feed, 1, (0, 0, 0), (5, 0, 0), 2)
+c.tool_changes.append((c.seq, 7))
+c.move(c.feed, 3, (5, 0, 0), (10, 0, 0), 2)
+c.tool_changes.append((c.seq, 3))
+c.move(c.feed, 5, (10, 0, 0), (10, 0, .01), 2)
+c.dwell_time = 1.5
+e = check("tool change", c,
+    2 * (5 + 1 / 10.) + 2 * math.sqrt(.01 / 10) + 1.5, initial_tool=3)
+print "tools", [(tool, "%.6f" % t) for tool, t in e.tools]
+print "dwell %.6f motion %.6f" % (e.dwell, e.motion)
+
+# nothing to do
+c = Canon()
+c.dwell_time = 2
+e = check("empty", c, 2)
+print "tools", e.tools, "lines", len(e.lines), e.line_time(1)
+
+# limits from an INI file; unreadable entries are taken as missing
+class Ini:
+    def __init__(self, values): self.values = values
+    def find(self, section, name): return self.values.get((section, name))
+l = cycletime.limits_from_ini(Ini({
+    ("TRAJ", "LINEAR_UNITS"): "inch", ("TRAJ", "ANGULAR_UNITS"): "two",
+    ("AXIS_X", "MAX_VELOCITY"): "2.5", ("AXIS_X", "MAX_ACCELERATION"): "fast",
+    ("TRAJ", "MAX_LINEAR_VELOCITY"): "1,5"}))
+print "ini", ["%.6f" % v for v in l.velocity[:2]], \
+    ["%.6f" % v for v in l.acceleration[:2]], l.linear_velocity, \
+    l.angular_velocity
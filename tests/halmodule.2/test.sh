@@ -0,0 +1,54 @@
+#!/bin/sh
+realtime start
+python <<EOF
+import hal
+import array
+h = hal.component("x")
+try:
+    h.newpin("f", hal.HAL_FLOAT, hal.HAL_OUT)
+    h.newpin("b", hal.HAL_BIT, hal.HAL_OUT)
+    h.newpin("s", hal.HAL_S32, hal.HAL_OUT)
+    h.newpin("u", hal.HAL_U32, hal.HAL_OUT)
+    h.newparam("param", hal.HAL_S32, hal.HAL_RW)
+    h.ready()
+
+    g = h.group(["f", "b", "s", "u", "param"])
+    print "len", len(g), g.names
+
+    g.write((1.5, 1, -3, 7, 9))
+    print "read", g.read()
+    print "single", h["f"], h["b"], h["s"], h["u"], h["param"]
+
+    l = [None] * 5
+    g.read(l)
+    print "list", l
+    a = array.array('d', [0] * 5)
+    g.read(a)
+    print "array", list(a)
+
+    try:
+        g.write((2.5, 0, -4, -1, 10))
+        print "write", "out-of-range", "ok"
+    except OverflowError:
+        print "write", "out-of-range", "fail"
+    print "read", g.read()
+
+    try:
+        g.write((1, 2))
+        print "write", "short", "ok"
+    except ValueError:
+        print "write", "short", "fail"
+
+    try:
+        h.group(["f", "not-found"])
+        print "group", "not-found", "ok"
+    except AttributeError:
+        print "group", "not-found", "fail"
+except:
+    import traceback
+    print "Exception:", traceback.format_exc()
+    raise
+finally:
+    h.exit()
+EOF
+realtime stop
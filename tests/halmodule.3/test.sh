@@ -0,0 +1,58 @@
+#!/bin/sh
+realtime start
+python <<EOF
+import hal
+import array
+import numpy
+c = hal.component("stream_bulk")
+try:
+    writer = hal.stream(c, hal.streamer_base, 10, "ffff")
+    print "record_size", writer.record_size
+    data = array.array('d', range(48))
+    print "write_many", writer.write_many(data), writer.num_overruns
+    print "write_many", writer.write_many(data[36:], 0.01)
+    print "wait_writable", writer.wait_writable(0.01)
+
+    # see stream_test.py in halmodule.1 for why the writer goes first
+    del writer
+
+    reader = hal.stream(c, hal.streamer_base, "ffff")
+    buf = array.array('d', [0] * 20)
+    print "readinto", reader.readinto(buf), list(buf), reader.sampleno
+    print "read", reader.read()
+    buf = array.array('d', [0] * 20)
+    print "readinto", reader.readinto(buf), list(buf[:12]), reader.sampleno
+    print "readinto", reader.readinto(buf, 0.01), reader.num_underruns
+    print "wait_readable", reader.wait_readable(0.01)
+    try:
+        reader.readinto(array.array('d', [0] * 3))
+        print "readinto", "partial", "ok"
+    except ValueError:
+        print "readinto", "partial", "fail"
+
+    # a stream of mixed types, written both ways and read with NumPy
+    writer = hal.stream(c, hal.streamer_base + 1, 10, "fbsu")
+    print "dtype", writer.dtype.names, writer.dtype.itemsize
+    samples = numpy.zeros(2, writer.dtype)
+    samples['f0'] = [.5, 1.5]
+    samples['f1'] = [True, False]
+    samples['f2'] = [-1, 7]
+    samples['f3'] = [1, 4000000000]
+    print "write_many", writer.write_many(samples)
+    writer.write((2.5, True, -2, 5))
+    del writer
+
+    reader = hal.stream(c, hal.streamer_base + 1, "fbsu")
+    got = reader.read_many(5)
+    print "read_many", len(got), got.dtype == reader.dtype
+    for name in got.dtype.names:
+        print name, got[name].tolist()
+    print "read_many", len(reader.read_many(5, 0.01))
+except:
+    import traceback
+    print "Exception:", traceback.format_exc()
+    raise
+finally:
+    c.exit()
+EOF
+realtime stop
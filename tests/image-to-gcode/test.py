@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+import imp, sys, numpy
+
+# the script has no .py extension once built
+i2g = imp.load_source("image_to_gcode", sys.argv[1])
+
+def read_pgm(filename):
+    """A plain (P2) PGM file as a float array, like main() makes of an
+    image: 0 is white and -depth is black"""
+    words = []
+    for line in open(filename):
+        words.extend(line.split("#")[0].split())
+    assert words[0] == "P2"
+    w, h, maxval = [int(v) for v in words[1:4]]
+    im = numpy.array(words[4:4+w*h], dtype=numpy.float32).reshape((h, w))
+    return im / maxval
+
+def run(title, tool_type, tool_diameter, pattern, converter, bounded=0,
+        roughing_offset=0, roughing_depth=0):
+    print "(%s)" % title
+    sys.stdout.flush()
+    depth = .1
+    step = 2
+    pixel_size = .05
+    nim = read_pgm("depth.pgm") * depth - depth
+    tool = i2g.make_tool_shape(i2g.tool_makers[tool_type], tool_diameter,
+        pixel_size)
+    rows = pattern != 1
+    columns = pattern != 0
+    columns_first = pattern == 3
+    convert_rows = convert_cols = None
+    if rows: convert_rows = i2g.convert_makers[converter]()
+    if columns: convert_cols = i2g.convert_makers[converter]()
+    if bounded and rows and columns:
+        slope = numpy.tan(45 * numpy.pi / 180)
+        if columns_first:
+            convert_rows = i2g.Reduce_Scan_Lace(convert_rows, slope, step+1)
+        else:
+            convert_cols = i2g.Reduce_Scan_Lace(convert_cols, slope, step+1)
+        if bounded > 1:
+            if columns_first:
+                convert_cols = i2g.Reduce_Scan_Lace(convert_cols, slope,
+                    step+1)
+            else:
+                convert_rows = i2g.Reduce_Scan_Lace(convert_rows, slope,
+                    step+1)
+    i2g.convert(nim, "G20", tool, pixel_size, step, .05, .001, 10,
+        convert_rows, convert_cols, columns_first,
+        i2g.ArcEntryCut(5, .125), 1000, roughing_offset, roughing_depth, 20)
+    sys.stdout.flush()
+
+# ball end mill, rows, alternating
+run("ball rows", 0, .2, 0, 2)
+# 45 degree vee, rows and columns bounded by the contact angle, upmill
+run("vee lace", 3, .15, 2, 3, bounded=2)
+# end mill, columns then rows, with roughing passes
+run("endmill roughing", 1, .1, 3, 0, bounded=1, roughing_offset=.05,
+    roughing_depth=.04)
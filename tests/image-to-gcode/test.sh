@@ -0,0 +1,2 @@
+#!/bin/sh
+python test.py $EMC2_HOME/bin/image-to-gcode
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# A fake Mitsubishi inverter for testing mitsub_vfd without the hardware.
+#
+# It opens a pty and answers computer link requests on it for the given
+# station numbers.  Run alone, it prints the name of the pty to give to
+# mitsub_vfd --port, and the commands it receives:
+#
+#     python fake_inverter.py 01 02
+
+import os, pty, select, sys, threading, tty
+
+ENQ, STX, ETX, ACK, NAK = '\x05', '\x02', '\x03', '\x06', '\x15'
+
+# data characters sent with each write command
+WRITES = {'FA': 2, 'ED': 4}
+
+def checksum(data):
+    return "%02X" % (sum(ord(c) for c in data) & 0xff)
+
+class FakeInverter:
+    def __init__(self, stations):
+        self.master, slave = pty.openpty()
+        tty.setraw(slave)
+        self.slave = slave
+        self.name = os.ttyname(slave)
+        self.running = dict((s, False) for s in stations)
+        self.freq = dict((s, 0) for s in stations)
+        # (station, command, data) of the writes received
+        self.log = []
+        self.buf = ''
+
+    def reply(self, station, command, data):
+        """Return the response to a request, or None to ignore it"""
+        if station not in self.running: return None
+        if command in WRITES:
+            if command == 'FA': self.running[station] = data != '00'
+            elif command == 'ED': self.freq[station] = int(data, 16)
+            self.log.append((station, command, data))
+            return ACK + station
+        running = self.running[station]
+        if command == '7A':
+            # bit 0 running, bit 3 up to speed
+            value = "%02X" % (running and 9 or 0)
+        elif command == '6F':
+            value = "%04X" % (running and self.freq[station] or 0)
+        elif command == '70':
+            value = "%04X" % (running and 150 or 0)
+        else:
+            return NAK + station + '1'
+        return STX + station + value + ETX + checksum(station + value)
+
+    def feed(self, data):
+        self.buf += data
+        while self.buf:
+            start = self.buf.find(ENQ)
+            if start < 0:
+                self.buf = ''
+                break
+            buf = self.buf = self.buf[start:]
+            if len(buf) < 6: break
+            n = 6 + WRITES.get(buf[3:5], 0) + 2
+            if len(buf) < n: break
+            request, self.buf = buf[:n], buf[n:]
+            if checksum(request[1:-2]) != request[-2:]:
+                os.write(self.master, NAK + request[1:3] + '7')
+                continue
+            response = self.reply(request[1:3], request[3:5], request[6:-2])
+            if response is not None:
+                os.write(self.master, response)
+
+    def serve(self):
+        while 1:
+            select.select([self.master], [], [])
+            try:
+                data = os.read(self.master, 1024)
+            except OSError:
+                return
+            self.feed(data)
+
+    def start(self):
+        t = threading.Thread(target=self.serve)
+        t.daemon = True
+        t.start()
+
+if __name__ == '__main__':
+    inverter = FakeInverter(sys.argv[1:] or ['00'])
+    print inverter.name
+    sys.stdout.flush()
+    shown = 0
+    inverter.start()
+    try:
+        while 1:
+            select.select([], [], [], .1)
+            for entry in inverter.log[shown:]:
+                print ' '.join(entry)
+            shown = len(inverter.log)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
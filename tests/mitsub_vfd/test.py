@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+import os, subprocess, time
+from fake_inverter import FakeInverter
+
+def halcmd(*args):
+    return subprocess.check_output(("halcmd",) + args).strip()
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition():
+        if time.time() > end: return False
+        time.sleep(.01)
+    return True
+
+inverter = FakeInverter(['01'])
+inverter.start()
+# the messages of mitsub_vfd are not part of the expected output
+subprocess.check_call(("halcmd", "loadusr", "-Wn", "spindle", "mitsub_vfd",
+    "--port", inverter.name, "spindle=01"), stdout=open(os.devnull, "w"))
+try:
+    # the estop pin is left false: only its falling edge stops the motor
+    halcmd("setp", "spindle.monitor", "1")
+    halcmd("setp", "spindle.motor-cmd", "50")
+    print "frequency sent", wait_for(lambda: inverter.freq['01'] == 5000)
+    halcmd("setp", "spindle.run", "1")
+    print "up to speed", wait_for(
+        lambda: halcmd("getp", "spindle.up-to-speed") == "TRUE")
+    print "feedback", wait_for(
+        lambda: float(halcmd("getp", "spindle.motor-fb")) == 50)
+    print "amps", wait_for(
+        lambda: float(halcmd("getp", "spindle.motor-amps")) == 1.5)
+    print "cycle time", float(halcmd("getp", "spindle.cycle-time")) > 0
+    halcmd("setp", "spindle.estop", "1")
+    time.sleep(.1)
+    halcmd("setp", "spindle.estop", "0")
+    print "stopped", wait_for(lambda: not inverter.running['01'])
+    print "errors", halcmd("getp", "spindle.error-count"), \
+        halcmd("getp", "spindle.timeout-count")
+finally:
+    halcmd("unload", "spindle")
+
+for entry in inverter.log:
+    print ' '.join(entry)
@@ -0,0 +1,4 @@
+#!/bin/sh
+realtime start
+python test.py
+realtime stop
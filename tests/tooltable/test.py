@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+import os, shutil, tempfile
+import tooltable
+
+KEYWORDS = ['S','T', 'P', 'X', 'Y', 'Z', 'A', 'B', 'C', 'U', 'V', 'W', 'D', 'I', 'J', 'Q', ';']
+
+def old_rows(lines):
+    """The liststore rows of the tooledit widget before it used
+    tooltable, from its reload(); the error messages are left out"""
+    rows = []
+    for rawline in lines:
+        index = rawline.find(";")
+        comment =''
+        if not index == -1:
+            comment = (rawline[index+1:])
+            comment = comment.rstrip("\n")
+            line = rawline.rstrip(comment)
+        else:
+            line = rawline
+        array = [0,0,0,'0','0','0','0','0','0','0','0','0','0','0','0','0',comment]
+        for offset,i in enumerate(KEYWORDS):
+            if offset == 0 or i == ';': continue
+            for word in line.split():
+                if word.startswith(';'): break
+                if word.startswith(i):
+                    if offset in(1,2):
+                        try:
+                            array[offset]= int(word.lstrip(i))
+                        except:
+                            pass
+                    else:
+                        try:
+                            array[offset]= "%10.4f" % float(word.lstrip(i))
+                        except:
+                            pass
+                    break
+        rows.append(array)
+    return rows
+
+def new_row(tool):
+    # tool_row in gladevcp/tooledit_widget.py, in the C locale
+    values = ['0'] * len(tool.values)
+    for i, v in enumerate(tool.values):
+        if v is not None:
+            values[i] = "%10.4f" % v
+    return [0, tool.tool or 0, tool.pocket or 0] + values + [tool.comment]
+
+SAMPLE = """\
+T1 P1 D0.125 Z+1.0 ;1/8 end mill
+T2 P2 X0.5 Z-0.25 Q3 I10 J80 ;lathe tool; with a semicolon
+T3 P3 Z1.5 Z2.5 X1 X2 ;repeated letters, the first counts
+T4 P4 Zfoo D0.5 ;bad number
+T5 Pbar Z0.1
+T6 P6 A1 B2 C3 U4 V5 W6 D7;no space before the comment
+T1 P7 Z9 ;duplicate tool 1, this line wins
+
+   ; only a comment
+t8 p8 z1 ;lower case letters are not read
+T9 P9 Z0.3
+"""
+
+d = tempfile.mkdtemp()
+try:
+    filename = os.path.join(d, "tool.tbl")
+    def write(text):
+        f = open(filename, "w")
+        f.write(text)
+        f.close()
+    write(SAMPLE)
+
+    table = tooltable.ToolTable(filename)
+    lines = SAMPLE.splitlines(True)
+    old = old_rows(lines)
+    new = [new_row(t) for t in table.tools]
+    print "rows", len(old), len(new)
+    for o, n in zip(old, new):
+        if o != n: print "differ", o, n
+    print "same rows", old == new
+    print "tool 1", table.by_tool[1].pocket, table.by_tool[1].value('Z')
+    print "pocket 1", table.by_pocket[1].tool
+    print "tool 3", table.by_tool[3].value('Z'), table.by_tool[3].value('X')
+    print "tool 4", table.by_tool[4].value('Z'), table.by_tool[4].value('D')
+    print "tool 5", table.by_tool[5].pocket
+    print "tool 8", 8 in table.by_tool
+    print "comment", repr(table.by_tool[2].comment)
+
+    def changed(t, tools):
+        print "changed", sorted(tools)
+    table.subscribe(changed)
+
+    # nothing changed: no call
+    table.reload()
+    # one value changed, a line added and a line removed
+    write(SAMPLE.replace("T2 P2 X0.5", "T2 P2 X0.75")
+        .replace("T6 P6 A1 B2 C3 U4 V5 W6 D7;no space before the comment\n",
+            "") + "T10 P10 Z2\n")
+    table.reload()
+    print "tool 2", table.by_tool[2].value('X'), 6 in table.by_tool, \
+        table.by_tool[10].value('Z')
+    # the later line of tool 1 goes, so the earlier one counts again
+    write(SAMPLE.replace("T1 P7 Z9 ;duplicate tool 1, this line wins\n", ""))
+    table.reload()
+    print "tool 1", table.by_tool[1].pocket, table.by_tool[1].value('Z')
+    # a line moved: the order changed, but no tool did
+    lines = SAMPLE.splitlines(True)
+    write("".join(lines[1:] + lines[:1]))
+    table.reload()
+    # a file that cannot be read is an empty table
+    os.unlink(filename)
+    table.reload()
+    print "tools", len(table.tools)
+finally:
+    shutil.rmtree(d)
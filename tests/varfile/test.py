@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+import os, shutil, tempfile
+import varfile
+
+# G54 X, G59.3 X and G92 X, and the numbers after each for Y..W
+G54, G59_3, G92 = 5221, 5381, 5211
+
+def offsets(base, scale):
+    return "".join("%d\t%f\n" % (base + i, scale * (i + 1)) for i in range(9))
+
+SAMPLE = ("5161\t1.5\n"
+    + offsets(G92, .1)
+    + "5220\t2.000000\n"
+    + offsets(G54, 1)
+    + offsets(G59_3, 100)
+    + "not a parameter\n"
+    + "5300\tnan?\n"
+    + "  5400   -3\n"
+    + "9999\t1\n"
+    + "0\t1\n"
+    + "5401\n")
+
+d = tempfile.mkdtemp()
+try:
+    filename = os.path.join(d, "linuxcnc.var")
+    def write(text):
+        f = open(filename, "w")
+        f.write(text)
+        f.close()
+    write(SAMPLE)
+
+    params = varfile.VarFile(filename)
+    print "G54", params.g5x(1)
+    print "G59.3", params.g5x(9)
+    print "G55", params.g5x(2)
+    print "G92", params.g92()
+    print "system", params[5220], params.get(5220)
+    print "5400", params.get(5400)
+    print "not in file", params.get(5300), params.get(5401, 'none'), \
+        params.get(9999), params.get(0), params[5230]
+
+    def changed(p, numbers):
+        print "changed", numbers
+    params.subscribe(changed)
+
+    # nothing changed: no call
+    params.reload()
+    # G54 Y changes, G59.3 W goes, 5390 is new, and so is 5230 although
+    # its value is the 0 it was read as before
+    write(SAMPLE.replace("5222\t2.000000\n", "5222\t2.500000\n")
+        .replace("5389\t900.000000\n", "")
+        + "5390\t0\n5230\t0\n")
+    params.reload()
+    print "G54", params.g5x(1)
+    print "G59.3", params.g5x(9)
+    print "5230", params.get(5230)
+    # a file that cannot be read has no parameters
+    os.unlink(filename)
+    params.reload()
+finally:
+    shutil.rmtree(d)